@@ -7,11 +7,27 @@ import requests
 import traceback
 import jwt
 import json 
+import time
+import base64
+import uuid
+import math
+import hashlib
+import threading
+import queue
+import httpx
+import redis
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
-from flask import Flask, request, jsonify, g, send_from_directory
+from flask import Flask, request, jsonify, g, send_from_directory, Response
 from flask_cors import CORS
-from tasks import run_nmap_scan, celery_app, generate_report
-from supabase import create_client, Client
+from tasks import (run_nmap_scan, celery_app, generate_report, get_redis,
+                   invalidate_workspace_cache, cache_generation_key, RESPONSE_CACHE_PREFIX,
+                   REDIS_URL, TASK_EVENTS_PREFIX)
+from supabase import create_client, Client, ClientOptions
+import networkx as nx
+from scanner.compact_graph import to_compact, load_graph, load_tree, decompress, is_compact
+from scanner.mapper import shortest_path_tree, rank_attack_paths
 
 app = Flask(__name__)
 CORS(app)
@@ -37,14 +53,163 @@ except Exception as e:
     print(f"[!!!] Failed to initialize Service Role Client: {e}")
     service_client = None
 
+# --- Per-user (RLS) client cache ---
+# Building a Supabase client per request creates fresh HTTP clients and
+# connection pools. Clients are cached per token until min(TTL, JWT exp),
+# evicted LRU, and all of them share one HTTP connection pool.
+USER_CLIENT_CACHE_SIZE = int(os.environ.get("USER_CLIENT_CACHE_SIZE", "512"))
+USER_CLIENT_CACHE_TTL = int(os.environ.get("USER_CLIENT_CACHE_TTL", "300"))
+
+shared_http_client = httpx.Client(timeout=30, follow_redirects=True)
+_user_clients = OrderedDict()  # token -> (client, expires_at)
+_user_clients_lock = threading.Lock()
+
+
+def get_user_client(token, exp=None):
+    """Return a cached RLS-scoped client for this token, creating it on a miss."""
+    now = time.time()
+    with _user_clients_lock:
+        entry = _user_clients.get(token)
+        if entry and entry[1] > now:
+            _user_clients.move_to_end(token)
+            return entry[0]
+        _user_clients.pop(token, None)
+
+    # postgrest-py sends the Authorization header per request, so sharing
+    # the underlying httpx client between users is safe.
+    client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY, options=ClientOptions(
+        httpx_client=shared_http_client,
+        auto_refresh_token=False,
+        persist_session=False
+    ))
+    client.postgrest.auth(token)
+
+    expires_at = now + USER_CLIENT_CACHE_TTL
+    if exp:
+        expires_at = min(expires_at, exp)
+    with _user_clients_lock:
+        _user_clients[token] = (client, expires_at)
+        while len(_user_clients) > USER_CLIENT_CACHE_SIZE:
+            _user_clients.popitem(last=False)
+    return client
+
 # ============================================================================
 # 🔐 AUTHENTICATION
 # ============================================================================
 
+# --- Local JWT verification ---
+# Tokens are verified in-process: HS256 tokens against SUPABASE_JWT_SECRET
+# (the local Supabase stack and legacy projects sign this way), asymmetric
+# ones against the project's JWKS, which is cached and refreshed every
+# JWKS_REFRESH_SECONDS. The accepted algorithm always comes from the key,
+# never from the token header. Verified payloads are memoized until the
+# token expires, so repeat requests skip the signature check entirely.
+SUPABASE_JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET")
+SUPABASE_JWT_AUDIENCE = os.environ.get("SUPABASE_JWT_AUDIENCE", "authenticated")
+JWKS_URL = f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
+JWKS_REFRESH_SECONDS = int(os.environ.get("JWKS_REFRESH_SECONDS", "600"))
+JWKS_MIN_REFRESH_SECONDS = 30  # Unknown kids can't force a refetch more often than this
+JWKS_ALGORITHMS = ("RS256", "ES256")  # Asymmetric algorithms accepted from JWKS keys
+VERIFIED_TOKEN_CACHE_SIZE = int(os.environ.get("VERIFIED_TOKEN_CACHE_SIZE", "4096"))
+
+_jwks = {"keys": {}, "fetched_at": 0.0}
+_jwks_lock = threading.Lock()
+_verified_tokens = OrderedDict()  # token -> payload
+_verified_tokens_lock = threading.Lock()
+
+if SUPABASE_JWT_SECRET:
+    print(f"[*] Auth: Verifying HS256 JWTs with SUPABASE_JWT_SECRET, others against JWKS at {JWKS_URL}")
+else:
+    print(f"[*] Auth: Verifying JWTs against JWKS at {JWKS_URL} "
+          f"(set SUPABASE_JWT_SECRET to accept HS256 tokens, e.g. from a local Supabase)")
+
+
+def jwk_algorithm(jwk_data):
+    """The JWK's own 'alg', else the one its kty/crv implies (as PyJWK does); None if unknown."""
+    if jwk_data.get("alg"):
+        return jwk_data["alg"]
+    if jwk_data.get("kty") == "RSA":
+        return "RS256"
+    if jwk_data.get("kty") == "EC" and jwk_data.get("crv", "P-256") == "P-256":
+        return "ES256"
+    return None
+
+
+def load_jwks(jwks_data):
+    """kid -> (key, algorithm) for the usable RS256/ES256 keys of a JWKS document"""
+    keys = {}
+    for jwk_data in jwks_data.get("keys", []):
+        algorithm = jwk_algorithm(jwk_data)
+        if algorithm not in JWKS_ALGORITHMS:
+            continue
+        try:
+            keys[jwk_data.get("kid")] = (jwt.PyJWK(jwk_data, algorithm).key, algorithm)
+        except jwt.PyJWTError as e:
+            print(f"[WARN] Auth: Skipping JWKS key {jwk_data.get('kid')}: {e}")
+    return keys
+
+
+def refresh_jwks(force=False):
+    """Fetch the signing keys if the cached set is stale. Returns the kid -> (key, algorithm) map."""
+    with _jwks_lock:
+        age = time.time() - _jwks["fetched_at"]
+        if age < (JWKS_MIN_REFRESH_SECONDS if force else JWKS_REFRESH_SECONDS):
+            return _jwks["keys"]
+        try:
+            response = shared_http_client.get(JWKS_URL, headers={"apikey": SUPABASE_ANON_KEY}, timeout=5)
+            response.raise_for_status()
+            _jwks["keys"] = load_jwks(response.json())
+            print(f"[✓] Auth: Loaded {len(_jwks['keys'])} signing key(s) from JWKS")
+        except Exception as e:
+            # Keep serving with the previous keys; try again after the back-off
+            print(f"[WARN] Auth: JWKS refresh failed: {e}")
+        _jwks["fetched_at"] = time.time()
+        return _jwks["keys"]
+
+
+def get_signing_key(token):
+    """(key, [algorithm]) for the token. The header only selects the key."""
+    header = jwt.get_unverified_header(token)
+    if header.get("alg") == "HS256":
+        if not SUPABASE_JWT_SECRET:
+            raise jwt.InvalidTokenError("HS256 token, but SUPABASE_JWT_SECRET is not set")
+        return SUPABASE_JWT_SECRET, ["HS256"]
+    kid = header.get("kid")
+    entry = refresh_jwks().get(kid) or refresh_jwks(force=True).get(kid)
+    if entry is None:
+        raise jwt.InvalidTokenError(f"Unknown signing key: {kid}")
+    key, algorithm = entry
+    return key, [algorithm]
+
+
+def verify_token(token):
+    """
+    Verify the token's signature, expiry and audience locally.
+    Returns the payload; raises jwt.InvalidTokenError (or a subclass) otherwise.
+    """
+    with _verified_tokens_lock:
+        payload = _verified_tokens.get(token)
+        if payload is not None:
+            if payload["exp"] > time.time():
+                _verified_tokens.move_to_end(token)
+                return payload
+            del _verified_tokens[token]
+
+    key, algorithms = get_signing_key(token)
+    payload = jwt.decode(token, key, algorithms=algorithms, audience=SUPABASE_JWT_AUDIENCE,
+                         options={"require": ["exp", "sub"]})
+
+    with _verified_tokens_lock:
+        _verified_tokens[token] = payload
+        while len(_verified_tokens) > VERIFIED_TOKEN_CACHE_SIZE:
+            _verified_tokens.popitem(last=False)
+    return payload
+
+
 def auth_required(f):
     """
     Authentication decorator.
-    Validates JWT and creates a user-specific client (g.user_client)
+    Verifies the JWT locally and creates a user-specific client (g.user_client)
     that respects RLS policies for all decorated routes.
     """
     @wraps(f)
@@ -56,27 +221,26 @@ def auth_required(f):
         token = auth_header.split("Bearer ")[1]
         
         try:
-            # Decode JWT to get user ID ('sub')
-            # We don't verify signature here; Supabase PostgREST will do that.
-            payload = jwt.decode(token, options={"verify_signature": False})
+            # Verify JWT and get user ID ('sub'); bad tokens never reach PostgREST
+            payload = verify_token(token)
             g.user_id = payload.get("sub")
             
             if not g.user_id:
                 return jsonify({"error": "Invalid token: Missing 'sub' (user ID)"}), 401
             
             # --- SECURE CLIENT CREATION ---
-            # Create a new client instance for this specific user.
-            # This client is authenticated *as the user* and will
-            # automatically enforce all database-level RLS policies.
-            g.user_client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-            g.user_client.postgrest.auth(token)
+            # Client is authenticated *as the user* and will automatically
+            # enforce all database-level RLS policies. Reused across requests
+            # carrying the same token.
+            g.user_client = get_user_client(token, payload.get("exp"))
             # --- END SECURE CLIENT CREATION ---
 
-            print(f"[✓] Auth: User {g.user_id} authenticated. RLS-client created.")
+            print(f"[✓] Auth: User {g.user_id} authenticated. RLS-client ready.")
         
         except jwt.ExpiredSignatureError:
             return jsonify({"error": "Token has expired"}), 401
-        except jwt.InvalidTokenError:
+        except jwt.PyJWTError:
+            # Includes key/algorithm mismatches, not only InvalidTokenError
             return jsonify({"error": "Invalid token"}), 401
         except Exception as e:
             print(f"[!!!] Auth error: {str(e)}")
@@ -85,6 +249,95 @@ def auth_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# ============================================================================
+# 🗄️ DASHBOARD RESPONSE CACHE
+# Dashboard widgets only change when a scan finishes, so their responses are
+# cached in Redis per (workspace, role) and invalidated by the scan tasks.
+# Every response carries an ETag; a matching If-None-Match gets a 304.
+# ============================================================================
+
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", "300"))
+# How long a user's role in a workspace is trusted before it is looked up again
+ROLE_CACHE_TTL = int(os.environ.get("ROLE_CACHE_TTL", "60"))
+
+
+def get_workspace_role(workspace_id):
+    """
+    The caller's role in a workspace ('owner' or workspace_users.role), or None
+    if they have no access. Cached in Redis for ROLE_CACHE_TTL seconds.
+    """
+    role_key = f"{RESPONSE_CACHE_PREFIX}:role:{g.user_id}:{workspace_id}"
+    cached_role = get_redis().get(role_key)
+    if cached_role is not None:
+        return cached_role.decode() or None
+
+    # RLS only returns the workspace to its owner and members
+    response = g.user_client.table("workspaces") \
+        .select("owner_id, workspace_users(role)") \
+        .eq("id", workspace_id) \
+        .eq("workspace_users.user_id", g.user_id) \
+        .execute()
+    role = None
+    if response.data:
+        workspace = response.data[0]
+        members = workspace.get("workspace_users") or []
+        if workspace.get("owner_id") == g.user_id:
+            role = "owner"
+        elif members:
+            role = members[0].get("role") or "viewer"
+
+    # Non-members are cached too (as ""), so probing doesn't reach Postgres
+    get_redis().setex(role_key, ROLE_CACHE_TTL, role or "")
+    return role
+
+
+def cached_response(f):
+    """
+    Serve a read endpoint from the dashboard cache. Apply below @auth_required.
+    The workspace comes from the URL or the workspace_id query param; only
+    200 responses are cached, and a view can opt out by setting
+    g.skip_response_cache.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        workspace_id = kwargs.get("workspace_id") or request.args.get("workspace_id")
+        if not workspace_id:
+            return f(*args, **kwargs)
+
+        try:
+            role = get_workspace_role(workspace_id)
+            if role is None:
+                return f(*args, **kwargs)
+            generation = int(get_redis().get(cache_generation_key(workspace_id)) or 0)
+            query = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+            cache_key = f"{RESPONSE_CACHE_PREFIX}:{workspace_id}:{generation}:{role}:{request.path}?{query}"
+            body = get_redis().get(cache_key)
+        except Exception as e:
+            print(f"[WARN] Response cache unavailable, serving uncached: {e}")
+            return f(*args, **kwargs)
+
+        if body is None:
+            result = f(*args, **kwargs)
+            response, status = result if isinstance(result, tuple) else (result, 200)
+            if status != 200 or g.get("skip_response_cache"):
+                return result
+            body = response.get_data()
+            try:
+                get_redis().setex(cache_key, RESPONSE_CACHE_TTL, body)
+            except Exception as e:
+                print(f"[WARN] Could not store cached response: {e}")
+
+        etag = hashlib.sha1(body).hexdigest()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, status=200, mimetype="application/json")
+        response.set_etag(etag)
+        # Browsers may keep the body but must revalidate it every time
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+    return decorated_function
+
 # ============================================================================
 # 🚀 CORE SCANNING ENDPOINTS
 # ============================================================================
@@ -130,10 +383,17 @@ def start_scan():
             created_scan = response.data[0]
             scan_id = created_scan['id']
             print(f"[*] /scan: Scan record created. Scan ID: {scan_id}")
+            # Recent scans and the active scan count just changed
+            invalidate_workspace_cache(workspace_id)
             
             # 2. Queue Celery task
             print(f"[*] /scan: Queuing Celery task...")
-            task = run_nmap_scan.delay(scan_id, target, workspace_id, scan_type)
+            # incremental=False forces a full vuln scan of every host.
+            # crown_jewels (list) or crown_jewel (one host) rank the attack paths.
+            crown_jewels = payload.get('crown_jewels') or [payload.get('crown_jewel')]
+            crown_jewels = [str(h) for h in crown_jewels if h]
+            task = run_nmap_scan.delay(scan_id, target, workspace_id, scan_type,
+                                       bool(payload.get('incremental', True)), crown_jewels)
             print(f"[*] /scan: Celery task '{task.id}' queued for scan '{scan_id}'")
             
             return jsonify({"scan_id": scan_id, "task_id": task.id}), 202
@@ -146,30 +406,318 @@ def start_scan():
         traceback.print_exc()
         return jsonify({"error": f"Internal server error: {e}"}), 500
 
+def task_status(task_id):
+    """Current state of a task as reported by /results (follows chord hand-offs)"""
+    task = celery_app.AsyncResult(task_id)
+    print(f"[*] /results/{task_id}: Task state: {task.state}")
+
+    # Large scans hand off to a chord; report the aggregation task instead
+    if task.state == 'SUCCESS' and isinstance(task.result, dict) and task.result.get('aggregate_task_id'):
+        dispatch_info = task.result
+        task = celery_app.AsyncResult(dispatch_info['aggregate_task_id'])
+        print(f"[*] /results/{task_id}: Following aggregate task {task.id} ({task.state})")
+        if task.state not in ('SUCCESS', 'FAILURE'):
+            return {
+                'state': 'PROGRESS',
+                'status': f"Scanning {dispatch_info.get('hosts')} hosts in {dispatch_info.get('chunks')} chunks...",
+                'scan_id': dispatch_info.get('scan_id')
+            }
+    
+    if task.state == 'PENDING':
+        return {'state': task.state, 'status': 'Pending...'}
+    elif task.state == 'SUCCESS':
+        return {'state': task.state, 'result': task.result}
+    elif task.state == 'FAILURE':
+        print(f"[!!!] /results/{task_id}: Task failed. Info: {task.info}")
+        status_info = str(task.info) if isinstance(task.info, Exception) else task.info
+        return {'state': task.state, 'status': status_info}
+    else:
+        return {'state': task.state, 'status': f'In progress ({task.state})...'}
+
+
 @app.route('/results/<task_id>', methods=['GET'])
 def get_results(task_id):
     """Check Celery task status"""
     try:
-        task = celery_app.AsyncResult(task_id)
-        print(f"[*] /results/{task_id}: Task state: {task.state}")
-        
-        if task.state == 'PENDING':
-            response = {'state': task.state, 'status': 'Pending...'}
-        elif task.state == 'SUCCESS':
-            response = {'state': task.state, 'result': task.result}
-        elif task.state == 'FAILURE':
-            print(f"[!!!] /results/{task_id}: Task failed. Info: {task.info}")
-            status_info = str(task.info) if isinstance(task.info, Exception) else task.info
-            response = {'state': task.state, 'status': status_info}
-        else:
-            response = {'state': task.state, 'status': f'In progress ({task.state})...'}
-        
-        return jsonify(response)
+        return jsonify(task_status(task_id))
     
     except Exception as e:
         print(f"[!!!] Error in /results/{task_id}: {e}")
         return jsonify({"error": str(e)}), 500
 
+# ============================================================================
+# 📡 TASK PROGRESS STREAM (Server-Sent Events)
+# Workers publish task events to Redis (tasks.publish_task_event). Each API
+# process holds ONE pattern subscription and fans events out to in-memory
+# queues, so an idle stream costs a queue and a parked greenlet, not a Redis
+# connection or a backend lookup per poll.
+# ============================================================================
+
+SSE_KEEPALIVE_SECONDS = 15
+# Streams are closed after this long; EventSource reconnects on its own
+SSE_MAX_SECONDS = int(os.environ.get("SSE_MAX_SECONDS", "3600"))
+SSE_QUEUE_SIZE = 256
+TERMINAL_STATES = ('SUCCESS', 'FAILURE')
+
+
+class TaskEventHub:
+    """Fans Redis task events out to per-subscriber queues in this process."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)  # task_id -> {queue.Queue}
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def subscribe(self, task_id):
+        subscription = queue.Queue(maxsize=SSE_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[task_id].add(subscription)
+            # Started lazily so the gunicorn master never owns the connection
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="task-events", daemon=True)
+                self._listener.start()
+        return subscription
+
+    def unsubscribe(self, task_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(task_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[task_id]
+
+    def _dispatch(self, task_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(task_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait(event)
+            except queue.Full:
+                pass  # A stalled client only misses intermediate progress
+
+    def _listen(self):
+        while True:
+            try:
+                # Own connection without a read timeout: it blocks between events
+                pubsub = redis.Redis.from_url(REDIS_URL, health_check_interval=30).pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f"{TASK_EVENTS_PREFIX}:*")
+                print("[✓] Task event listener subscribed")
+                for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    task_id = message["channel"].decode().rsplit(":", 1)[-1]
+                    try:
+                        self._dispatch(task_id, json.loads(message["data"]))
+                    except ValueError:
+                        print(f"[WARN] Dropped malformed event for task {task_id}")
+            except Exception as e:
+                print(f"[WARN] Task event listener lost Redis ({e}); reconnecting...")
+                time.sleep(1)
+
+
+task_event_hub = TaskEventHub()
+
+
+def sse_message(data):
+    return f"data: {json.dumps(data, default=str)}\n\n"
+
+
+@app.route('/results/<task_id>/stream', methods=['GET'])
+def stream_results(task_id):
+    """
+    Server-Sent Events stream of a task's state and per-host progress.
+    The first event is the /results snapshot; the stream ends after a
+    SUCCESS or FAILURE event. Event data has the same shape as /results.
+    """
+    # Subscribe before the snapshot so no event can fall between the two
+    subscription = task_event_hub.subscribe(task_id)
+    try:
+        snapshot = task_status(task_id)
+    except Exception as e:
+        task_event_hub.unsubscribe(task_id, subscription)
+        print(f"[!!!] Error in /results/{task_id}/stream: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    def events():
+        try:
+            yield f"retry: 3000\n{sse_message(snapshot)}"
+            if snapshot['state'] in TERMINAL_STATES:
+                return
+            deadline = time.monotonic() + SSE_MAX_SECONDS
+            while time.monotonic() < deadline:
+                try:
+                    event = subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    # Comment line; also how a disconnected client gets noticed
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse_message(event)
+                if event.get('state') in TERMINAL_STATES:
+                    return
+        finally:
+            task_event_hub.unsubscribe(task_id, subscription)
+
+    return Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+# ============================================================================
+# 📄 KEYSET PAGINATION
+# List endpoints page on (sort_column DESC NULLS LAST, id DESC) so every page
+# is an index range scan, no matter how deep the client pages.
+# ============================================================================
+
+PAGE_SIZE_DEFAULT = 100
+PAGE_SIZE_MAX = 1000
+
+ASSET_FIELDS = {
+    "id", "workspace_id", "hostname", "ip_address", "asset_type", "operating_system",
+    "os_version", "mac_address", "open_ports", "risk_score", "is_active", "last_scan_at",
+    "created_at", "updated_at", "vulnerabilities(count)"
+}
+VULNERABILITY_FIELDS = {
+    "id", "workspace_id", "asset_id", "scan_id", "cve_id", "title", "description", "severity",
+    "cvss_score", "cvss_vector", "status", "port", "service", "proof_of_concept",
+    "remediation_steps", "references", "discovered_at", "updated_at", "is_kev",
+    "assets(hostname, ip_address)"
+}
+
+
+def encode_cursor(row, sort_column):
+    raw = json.dumps([row.get(sort_column), row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if isinstance(sort_value, bool) or not isinstance(row_id, str):
+        raise ValueError("Invalid cursor")
+    if not (sort_value is None or isinstance(sort_value, (int, float)) and math.isfinite(sort_value)):
+        raise ValueError("Invalid cursor")
+    # Both values are interpolated into a PostgREST or_() filter
+    try:
+        row_id = str(uuid.UUID(row_id))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    return sort_value, row_id
+
+
+def parse_page_args(allowed_fields, default_select, sort_column):
+    """Read ?limit, ?cursor and ?fields. Raises ValueError for bad input."""
+    try:
+        limit = int(request.args.get("limit", PAGE_SIZE_DEFAULT))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    limit = max(1, min(limit, PAGE_SIZE_MAX))
+
+    after = decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+
+    fields = request.args.get("fields")
+    if not fields:
+        return default_select, limit, after
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    # Relation embeds can be requested by their table name
+    by_name = {f.split("(")[0]: f for f in allowed_fields}
+    unknown = [f for f in requested if f not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    # The keyset columns are always needed to build the next cursor
+    selected = list(dict.fromkeys(requested + [sort_column, "id"]))
+    return ",".join(by_name[f] for f in selected), limit, after
+
+
+def apply_keyset(query, sort_column, after, limit):
+    """Order by (sort_column DESC NULLS LAST, id DESC) and start after the cursor row."""
+    if after:
+        sort_value, row_id = after
+        if sort_value is None:
+            query = query.is_(sort_column, "null").lt("id", row_id)
+        else:
+            query = query.or_(
+                f"{sort_column}.lt.{sort_value},{sort_column}.is.null,"
+                f"and({sort_column}.eq.{sort_value},id.lt.{row_id})"
+            )
+    # One extra row tells us whether there is a next page
+    return query.order(sort_column, desc=True, nullsfirst=False) \
+        .order("id", desc=True) \
+        .limit(limit + 1)
+
+
+def page_response(rows, sort_column, limit):
+    next_cursor = encode_cursor(rows[limit - 1], sort_column) if len(rows) > limit else None
+    return {"data": rows[:limit], "next_cursor": next_cursor}
+
+
+# ============================================================================
+# 📊 DASHBOARD WIDGET QUERIES
+# Shared by the single-widget endpoints and the batch dashboard endpoint.
+# Each takes the caller's RLS client explicitly so it can run off-thread.
+# ============================================================================
+
+def fetch_workspace_stats(client, workspace_id):
+    # One round trip to the workspace_stats summary row (kept up to date by triggers)
+    stats_response = client.rpc("get_workspace_stats", {"p_workspace_id": workspace_id}).execute()
+    row = stats_response.data or {}
+    return {
+        "totalAssets": row.get("totalAssets") or 0,
+        "totalVulnerabilities": row.get("totalVulnerabilities") or 0,
+        "criticalVulns": row.get("criticalVulns") or 0,
+        "openBySeverity": row.get("openBySeverity") or {},
+        "activeScans": row.get("activeScans") or 0,
+        "riskScore": float(row.get("riskScore") or 0.0)
+    }
+
+
+def fetch_top_vulnerabilities(client, workspace_id):
+    # Top 5 "open" critical/high vulnerabilities
+    response = client.table("vulnerabilities") \
+        .select("*, assets(hostname, ip_address)") \
+        .eq("workspace_id", workspace_id) \
+        .in_("severity", ["Critical", "High"]) \
+        .eq("status", "open") \
+        .order("cvss_score", desc=True) \
+        .limit(5) \
+        .execute()
+    return response.data or []
+
+
+def fetch_vulnerable_assets(client, workspace_id):
+    # Assets with at least one 'open' vulnerability, ordered by their risk_score
+    response = client.table("assets") \
+        .select("*, vulnerabilities!inner(status, severity)") \
+        .eq("workspace_id", workspace_id) \
+        .eq("vulnerabilities.status", "open") \
+        .order("risk_score", desc=True) \
+        .limit(5) \
+        .execute()
+    return response.data or []
+
+
+def fetch_recent_scans(client, workspace_id):
+    response = client.table("scans") \
+        .select("*") \
+        .eq("workspace_id", workspace_id) \
+        .order("created_at", desc=True) \
+        .limit(5) \
+        .execute()
+    return response.data or []
+
+
+DASHBOARD_WIDGETS = {
+    "stats": fetch_workspace_stats,
+    "topVulnerabilities": fetch_top_vulnerabilities,
+    "vulnerableAssets": fetch_vulnerable_assets,
+    "recentScans": fetch_recent_scans
+}
+
+# Shared across requests; each dashboard load uses one thread per widget
+DASHBOARD_WORKERS = int(os.environ.get("DASHBOARD_WORKERS", "16"))
+dashboard_executor = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS, thread_name_prefix="dashboard")
+
 # ============================================================================
 # 📊 MVP READ ENDPOINTS (New & Refactored)
 # All endpoints below use g.user_client to enforce RLS automatically.
@@ -199,59 +747,18 @@ def get_workspaces():
 
 @app.route('/api/workspaces/<workspace_id>/stats', methods=['GET'])
 @auth_required
+@cached_response
 def get_workspace_stats(workspace_id):
     """
     GET /api/workspaces/<workspace_id>/stats
     Returns aggregated stats for a *single* workspace.
-    RLS is enforced on every query by g.user_client.
+    Read in one round trip from the workspace_stats summary row (kept up to
+    date by triggers) through the get_workspace_stats RPC.
+    RLS is enforced inside the function (SECURITY INVOKER) via g.user_client.
     If the user cannot access the workspace, all counts will be 0.
     """
     try:
-        # Total assets
-        assets_response = g.user_client.table("assets") \
-            .select("id", count="exact") \
-            .eq("workspace_id", workspace_id) \
-            .execute()
-        
-        # Total vulnerabilities
-        vulns_response = g.user_client.table("vulnerabilities") \
-            .select("id", count="exact") \
-            .eq("workspace_id", workspace_id) \
-            .execute()
-        
-        # Critical vulnerabilities
-        critical_response = g.user_client.table("vulnerabilities") \
-            .select("id", count="exact") \
-            .eq("workspace_id", workspace_id) \
-            .eq("severity", "Critical") \
-            .eq("status", "open") \
-            .execute()
-        
-        # Active scans
-        scans_response = g.user_client.table("scans") \
-            .select("id", count="exact") \
-            .eq("workspace_id", workspace_id) \
-            .in_("status", ["running", "scheduled"]) \
-            .execute()
-        
-        # Average risk score from assets
-        assets_risk_response = g.user_client.table("assets") \
-            .select("risk_score") \
-            .eq("workspace_id", workspace_id) \
-            .execute()
-        
-        avg_risk_score = 0.0
-        if assets_risk_response.data:
-            scores = [a.get("risk_score", 0.0) or 0.0 for a in assets_risk_response.data]
-            avg_risk_score = sum(scores) / len(scores) if scores else 0.0
-        
-        stats = {
-            "totalAssets": assets_response.count or 0,
-            "totalVulnerabilities": vulns_response.count or 0,
-            "criticalVulns": critical_response.count or 0,
-            "activeScans": scans_response.count or 0,
-            "riskScore": round(avg_risk_score, 1)
-        }
+        stats = fetch_workspace_stats(g.user_client, workspace_id)
         
         print(f"[✓] /api/workspaces/{workspace_id}/stats: {stats}")
         return jsonify(stats), 200
@@ -262,29 +769,79 @@ def get_workspace_stats(workspace_id):
         return jsonify({"error": "Failed to fetch stats", "detail": str(e)}), 500
 
 
+@app.route('/api/workspaces/<workspace_id>/dashboard', methods=['GET'])
+@auth_required
+@cached_response
+def get_workspace_dashboard(workspace_id):
+    """
+    GET /api/workspaces/<workspace_id>/dashboard
+    Returns every dashboard widget in one payload:
+    {"stats", "topVulnerabilities", "vulnerableAssets", "recentScans"}.
+    The widget queries run concurrently, so latency is that of the slowest one.
+    A failed widget is returned as null with its message under "errors".
+    """
+    try:
+        futures = {
+            name: dashboard_executor.submit(fetch, g.user_client, workspace_id)
+            for name, fetch in DASHBOARD_WIDGETS.items()
+        }
+        
+        dashboard, errors = {}, {}
+        for name, future in futures.items():
+            try:
+                dashboard[name] = future.result()
+            except Exception as e:
+                print(f"[ERROR] /api/workspaces/{workspace_id}/dashboard: {name} failed: {e}")
+                dashboard[name] = None
+                errors[name] = str(e)
+        
+        if len(errors) == len(futures):
+            return jsonify({"error": "Failed to fetch dashboard", "detail": errors}), 500
+        if errors:
+            dashboard["errors"] = errors
+            # Don't pin a partial dashboard in the cache
+            g.skip_response_cache = True
+        
+        print(f"[✓] /api/workspaces/{workspace_id}/dashboard: Returned {len(futures) - len(errors)}/{len(futures)} widgets")
+        return jsonify(dashboard), 200
+        
+    except Exception as e:
+        print(f"[ERROR] /api/workspaces/{workspace_id}/dashboard: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": "Failed to fetch dashboard", "detail": str(e)}), 500
+
+
 @app.route('/api/assets', methods=['GET'])
 @auth_required
 def get_assets():
     """
-    GET /api/assets?workspace_id=<id>
-    Returns all assets for a workspace, respecting RLS.
+    GET /api/assets?workspace_id=<id>[&limit=&cursor=&fields=&port=]
+    Returns one page of assets for a workspace ordered by risk, respecting RLS.
+    Response: {"data": [...], "next_cursor": <opaque string or null>}
     """
     try:
         workspace_id = request.args.get('workspace_id')
         if not workspace_id:
             return jsonify({"error": "workspace_id query param required"}), 400
+
+        try:
+            select, limit, after = parse_page_args(ASSET_FIELDS, "*, vulnerabilities(count)", "risk_score")
+            port = int(request.args["port"]) if request.args.get("port") else None
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
         
         # RLS is enforced by g.user_client
-        assets_response = g.user_client.table("assets") \
-            .select("*, vulnerabilities(count)") \
-            .eq("workspace_id", workspace_id) \
-            .order("risk_score", desc=True) \
-            .execute()
+        query = g.user_client.table("assets") \
+            .select(select) \
+            .eq("workspace_id", workspace_id)
+        if port is not None:
+            query = query.contains("open_ports", [port])
+        assets_response = apply_keyset(query, "risk_score", after, limit).execute()
         
-        assets = assets_response.data or []
+        page = page_response(assets_response.data or [], "risk_score", limit)
         
-        print(f"[✓] /api/assets: Returned {len(assets)} assets for workspace {workspace_id}")
-        return jsonify(assets), 200
+        print(f"[✓] /api/assets: Returned {len(page['data'])} assets for workspace {workspace_id}")
+        return jsonify(page), 200
         
     except Exception as e:
         print(f"[ERROR] /api/assets: {str(e)}")
@@ -296,25 +853,40 @@ def get_assets():
 @auth_required
 def get_vulnerabilities():
     """
-    GET /api/vulnerabilities?workspace_id=<id>
-    Returns all vulnerabilities for a workspace, respecting RLS.
+    GET /api/vulnerabilities?workspace_id=<id>[&limit=&cursor=&fields=&severity=&status=&port=]
+    Returns one page of vulnerabilities for a workspace ordered by CVSS, respecting RLS.
+    severity and status accept comma-separated lists.
+    Response: {"data": [...], "next_cursor": <opaque string or null>}
     """
     try:
         workspace_id = request.args.get('workspace_id')
         if not workspace_id:
             return jsonify({"error": "workspace_id query param required"}), 400
+
+        try:
+            select, limit, after = parse_page_args(VULNERABILITY_FIELDS, "*, assets(hostname, ip_address)", "cvss_score")
+            port = int(request.args["port"]) if request.args.get("port") else None
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
+        severities = [v for v in request.args.get("severity", "").split(",") if v]
+        statuses = [v for v in request.args.get("status", "").split(",") if v]
         
         # RLS is enforced by g.user_client
-        vulns_response = g.user_client.table("vulnerabilities") \
-            .select("*, assets(hostname, ip_address)") \
-            .eq("workspace_id", workspace_id) \
-            .order("cvss_score", desc=True) \
-            .execute()
+        query = g.user_client.table("vulnerabilities") \
+            .select(select) \
+            .eq("workspace_id", workspace_id)
+        if severities:
+            query = query.in_("severity", severities)
+        if statuses:
+            query = query.in_("status", statuses)
+        if port is not None:
+            query = query.eq("port", port)
+        vulns_response = apply_keyset(query, "cvss_score", after, limit).execute()
         
-        vulns = vulns_response.data or []
+        page = page_response(vulns_response.data or [], "cvss_score", limit)
         
-        print(f"[✓] /api/vulnerabilities: Returned {len(vulns)} vulnerabilities for workspace {workspace_id}")
-        return jsonify(vulns), 200
+        print(f"[✓] /api/vulnerabilities: Returned {len(page['data'])} vulnerabilities for workspace {workspace_id}")
+        return jsonify(page), 200
         
     except Exception as e:
         print(f"[ERROR] /api/vulnerabilities: {str(e)}")
@@ -324,6 +896,7 @@ def get_vulnerabilities():
 
 @app.route('/api/vulnerabilities/top', methods=['GET'])
 @auth_required
+@cached_response
 def get_top_vulnerabilities():
     """
     GET /api/vulnerabilities/top?workspace_id=<id>
@@ -335,16 +908,7 @@ def get_top_vulnerabilities():
             return jsonify({"error": "workspace_id query param required"}), 400
         
         # RLS is enforced by g.user_client
-        vulns_response = g.user_client.table("vulnerabilities") \
-            .select("*, assets(hostname, ip_address)") \
-            .eq("workspace_id", workspace_id) \
-            .in_("severity", ["Critical", "High"]) \
-            .eq("status", "open") \
-            .order("cvss_score", desc=True) \
-            .limit(5) \
-            .execute()
-        
-        vulns = vulns_response.data or []
+        vulns = fetch_top_vulnerabilities(g.user_client, workspace_id)
         
         print(f"[✓] /api/vulnerabilities/top: Returned {len(vulns)} top vulnerabilities for workspace {workspace_id}")
         return jsonify(vulns), 200
@@ -357,6 +921,7 @@ def get_top_vulnerabilities():
 
 @app.route('/api/assets/vulnerable', methods=['GET'])
 @auth_required
+@cached_response
 def get_vulnerable_assets():
     """
     GET /api/assets/vulnerable?workspace_id=<id>
@@ -368,17 +933,7 @@ def get_vulnerable_assets():
             return jsonify({"error": "workspace_id query param required"}), 400
         
         # RLS is enforced by g.user_client
-        # This query fetches assets that have at least one 'open' vulnerability
-        # and orders them by their risk_score.
-        assets_response = g.user_client.table("assets") \
-            .select("*, vulnerabilities!inner(status, severity)") \
-            .eq("workspace_id", workspace_id) \
-            .eq("vulnerabilities.status", "open") \
-            .order("risk_score", desc=True) \
-            .limit(5) \
-            .execute()
-
-        assets = assets_response.data or []
+        assets = fetch_vulnerable_assets(g.user_client, workspace_id)
         
         print(f"[✓] /api/assets/vulnerable: Returned {len(assets)} vulnerable assets for workspace {workspace_id}")
         return jsonify(assets), 200
@@ -391,6 +946,7 @@ def get_vulnerable_assets():
 
 @app.route('/api/scans/recent', methods=['GET'])
 @auth_required
+@cached_response
 def get_recent_scans():
     """
     GET /api/scans/recent?workspace_id=<id>
@@ -402,14 +958,7 @@ def get_recent_scans():
             return jsonify({"error": "workspace_id query param required"}), 400
         
         # RLS is enforced by g.user_client
-        scans_response = g.user_client.table("scans") \
-            .select("*") \
-            .eq("workspace_id", workspace_id) \
-            .order("created_at", desc=True) \
-            .limit(5) \
-            .execute()
-        
-        scans = scans_response.data or []
+        scans = fetch_recent_scans(g.user_client, workspace_id)
         
         print(f"[✓] /api/scans/recent: Returned {len(scans)} recent scans for workspace {workspace_id}")
         return jsonify(scans), 200
@@ -492,9 +1041,10 @@ def download_report():
 @auth_required
 def get_scan_attack_path(scan_id):
     """
-    GET /api/scans/<scan_id>/attack-path
-    Returns the serialized attack path graph (JSON) for a specific scan.
-    RLS is enforced by g.user_client.
+    GET /api/scans/<scan_id>/attack-path[?format=node_link]
+    Returns the attack path graph for a specific scan in the compact format
+    (see scanner/compact_graph.py); format=node_link expands it to
+    networkx node-link JSON. RLS is enforced by g.user_client.
     """
     try:
         if not scan_id:
@@ -517,19 +1067,19 @@ def get_scan_attack_path(scan_id):
             print(f"[✓] /api/scans/{scan_id}/attack-path: Scan found, but no graph data available.")
             return jsonify({"error": "Attack path data not yet available for this scan."}), 404
 
-        # --- ADD THIS TYPE SAFETY CHECK ---
-        # Ensure graph_data is a dict, not a string (defensive programming)
-        if isinstance(graph_data, str):
-            try:
-                graph_data = json.loads(graph_data)
-                print(f"[WARN] /api/scans/{scan_id}/attack-path: Had to parse graph_data from string")
-            except json.JSONDecodeError as parse_err:
-                print(f"[ERROR] /api/scans/{scan_id}/attack-path: Invalid JSON in graph_data: {parse_err}")
-                return jsonify({"error": "Corrupted graph data"}), 500
-        # --- END TYPE SAFETY CHECK ---
+        # Strings, compressed documents and legacy node-link rows are all accepted
+        try:
+            graph_data = decompress(graph_data)
+            if request.args.get("format") == "node_link":
+                graph_data = nx.node_link_data(load_graph(graph_data)[0])
+            elif not is_compact(graph_data):
+                graph, _ = load_graph(graph_data)
+                graph_data = to_compact(graph)
+        except Exception as parse_err:
+            print(f"[ERROR] /api/scans/{scan_id}/attack-path: Invalid graph_data: {parse_err}")
+            return jsonify({"error": "Corrupted graph data"}), 500
 
         print(f"[✓] /api/scans/{scan_id}/attack-path: Returned graph data for user {g.user_id}")
-        # The data is already stored as JSON, so just return it
         return jsonify(graph_data), 200
         
     except Exception as e:
@@ -537,6 +1087,80 @@ def get_scan_attack_path(scan_id):
         traceback.print_exc()
         return jsonify({"error": "Failed to fetch attack path", "detail": str(e)}), 500
 
+# --- VULCAN PERF: Decoded attack-path trees, keyed by graph version ---
+ATTACK_PATH_CACHE_SIZE = int(os.environ.get("ATTACK_PATH_CACHE_SIZE", "16"))
+_attack_paths = OrderedDict()  # graph version -> (graph, tree)
+_attack_paths_lock = threading.Lock()
+
+
+def load_attack_paths(graph_data):
+    """
+    (graph, tree) for a scan's graph_data. Compact rows carry their
+    shortest-path tree and are decoded once per graph version; legacy rows get
+    the tree computed (scanner.mapper caches it by version too).
+    """
+    data = decompress(graph_data)
+    version = (data.get("tree") or {}).get("version") if is_compact(data) else None
+    if version:
+        with _attack_paths_lock:
+            cached = _attack_paths.get(version)
+            if cached is not None:
+                _attack_paths.move_to_end(version)
+                return cached
+
+    graph, _ = load_graph(data)
+    tree = load_tree(data) or shortest_path_tree(graph)
+    with _attack_paths_lock:
+        _attack_paths[tree[0]] = (graph, tree)
+        while len(_attack_paths) > ATTACK_PATH_CACHE_SIZE:
+            _attack_paths.popitem(last=False)
+    return graph, tree
+
+
+@app.route('/api/scans/<scan_id>/attack-paths', methods=['GET'])
+@auth_required
+def get_scan_attack_paths(scan_id):
+    """
+    GET /api/scans/<scan_id>/attack-paths[?target=<host>[,<host>...]][&limit=N]
+    Ranked attack paths, cheapest first, read from the scan's shortest-path
+    tree: to the given targets, else to the scan's crown jewels, else to every
+    asset. Unreachable or unknown targets are omitted. RLS is enforced by
+    g.user_client.
+    """
+    try:
+        try:
+            limit = max(1, min(int(request.args.get("limit", PAGE_SIZE_DEFAULT)), PAGE_SIZE_MAX))
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        targets = [t.strip() for t in request.args.get("target", "").split(",") if t.strip()]
+
+        graph_response = g.user_client.table("scans") \
+            .select("graph_data") \
+            .eq("id", scan_id) \
+            .maybe_single() \
+            .execute()
+
+        if not graph_response or not graph_response.data:
+            return jsonify({"error": "Scan not found or access denied"}), 404
+        if not graph_response.data.get("graph_data"):
+            return jsonify({"error": "Attack path data not yet available for this scan."}), 404
+
+        try:
+            graph, tree = load_attack_paths(graph_response.data["graph_data"])
+        except Exception as parse_err:
+            print(f"[ERROR] /api/scans/{scan_id}/attack-paths: Invalid graph_data: {parse_err}")
+            return jsonify({"error": "Corrupted graph data"}), 500
+
+        crown_jewels = graph.graph.get("crown_jewels", [])
+        ranked = rank_attack_paths(graph, tree, targets or crown_jewels or None, limit)
+        print(f"[✓] /api/scans/{scan_id}/attack-paths: {len(ranked)} paths for user {g.user_id}")
+        return jsonify({"data": ranked, "crown_jewels": crown_jewels, "graph_version": tree[0]}), 200
+
+    except Exception as e:
+        print(f"[ERROR] /api/scans/{scan_id}/attack-paths: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": "Failed to fetch attack paths", "detail": str(e)}), 500
+
 # ============================================================================
 # 🚀 DEPRECATED ENDPOINTS (To be removed)
 # ============================================================================
@@ -0,0 +1,88 @@
+"""
+Benchmark: scans.graph_data size, node-link JSON vs the compact format
+
+Builds an N-host attack-path graph three ways:
+  - legacy: node-link with full vulnerability dicts on every node, like
+    graph_output.json (each host gets that file's findings)
+  - node-link summaries: what finalize_scan stored before the compact format
+  - compact / compact+zlib: scanner.compact_graph.to_compact
+and reports the serialized JSON size of each, plus round-trip fidelity.
+
+Usage: python benchmarks/bench_graph_size.py [hosts]
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import networkx as nx
+from scanner.mapper import NetworkMapper
+from scanner.compact_graph import to_compact, load_graph
+
+GRAPH_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'graph_output.json')
+
+
+def build(host_count, embed_vulns):
+    with open(GRAPH_FILE) as f:
+        sample = next(n for n in json.load(f)['nodes'] if n.get('vulnerabilities'))['vulnerabilities']
+    hosts = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(host_count)]
+    mapper = NetworkMapper('bench-range')
+    mapper.load_host_results([{
+        "host": h,
+        "ip_address": h,
+        "vulnerabilities": sample if embed_vulns else [],
+        "max_cvss": max(v['cvss_score'] for v in sample),
+        "is_kev": False,
+        "vuln_count": len(sample),
+        "asset_id": str(uuid.UUID(int=i))
+    } for i, h in enumerate(hosts)])
+    result = mapper.find_attack_path_for_api(hosts[0])
+    return mapper.graph, result.get("path", [])
+
+
+def size(doc):
+    return len(json.dumps(doc, separators=(',', ':')))
+
+
+if __name__ == '__main__':
+    host_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    # Silence the mapper's per-host logging while building
+    real_stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        legacy_graph, _ = build(host_count, embed_vulns=True)
+        graph, path = build(host_count, embed_vulns=False)
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+
+    legacy = size(nx.node_link_data(legacy_graph))
+    summary = size(nx.node_link_data(graph))
+    start = time.perf_counter()
+    compact_doc = to_compact(graph, path=path)
+    encode_ms = (time.perf_counter() - start) * 1000
+    compact = size(compact_doc)
+    zipped = size(to_compact(graph, path=path, compress=True))
+
+    restored, restored_path = load_graph(to_compact(graph, path=path, compress=True))
+    identical = (
+        restored_path == path
+        and set(restored.nodes) == set(graph.nodes)
+        and all(restored.edges[u, v]['weight'] == d['weight'] for u, v, d in graph.edges(data=True))
+        and all(restored.nodes[n].get(k) == graph.nodes[n].get(k)
+                for n in graph.nodes if n != 'attacker'
+                for k in ('ip_address', 'asset_id', 'is_kev', 'vuln_count'))
+    )
+
+    print(f"[*] Hosts: {host_count}")
+    print(f"    -> Node-link + embedded vulns: {legacy / 1024:10.1f} KiB")
+    print(f"    -> Node-link summaries:        {summary / 1024:10.1f} KiB ({legacy / summary:.0f}x smaller)")
+    print(f"    -> Compact:                    {compact / 1024:10.1f} KiB ({legacy / compact:.0f}x) | encode {encode_ms:.1f}ms")
+    print(f"    -> Compact + zlib:             {zipped / 1024:10.1f} KiB ({legacy / zipped:.0f}x)")
+    print(f"[✓] Compact vs node-link summaries: {summary / compact:.1f}x, with zlib {summary / zipped:.1f}x")
+    print(f"[{'✓' if identical else '!'}] Round trip identical: {identical}")
@@ -0,0 +1,52 @@
+"""
+Benchmark: KEV lookups, Python list scan vs scanner.kev.KevCatalog
+
+The legacy check was `cve_id in KEV_MOCK_LIST` for every finding, a linear
+scan over the list. KevCatalog keeps encoded CVE ids in a sorted int64 array
+and answers all of a host's findings with one vectorized search.
+
+Usage: python benchmarks/bench_kev_lookup.py [catalog_size] [hosts] [findings_per_host]
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.kev import KevCatalog
+
+
+def cve(rng):
+    return f"CVE-{rng.randint(1999, 2026)}-{rng.randint(1, 60000):04d}"
+
+
+if __name__ == '__main__':
+    catalog_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1500
+    host_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    per_host = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    rng = random.Random(7)
+    kev_list = list(dict.fromkeys(cve(rng) for _ in range(catalog_size)))
+    hosts = [[cve(rng) if rng.random() > 0.05 else rng.choice(kev_list) for _ in range(per_host)]
+             for _ in range(host_count)]
+
+    start = time.perf_counter()
+    legacy = [{c for c in findings if c in kev_list} for findings in hosts]
+    list_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    catalog = KevCatalog.from_ids(kev_list)
+    load_time = time.perf_counter() - start
+    start = time.perf_counter()
+    batched = [catalog.matches(findings) for findings in hosts]
+    batch_time = time.perf_counter() - start
+
+    list_bytes = sys.getsizeof(kev_list) + sum(sys.getsizeof(c) for c in kev_list)
+    print(f"[*] Catalog: {len(kev_list)} CVEs | {host_count} hosts x {per_host} findings")
+    print(f"    -> List scan per finding: {list_time * 1000:8.1f}ms | ~{list_bytes / 1024:.0f} KiB")
+    print(f"    -> KevCatalog per host:   {batch_time * 1000:8.1f}ms | {catalog.keys.nbytes / 1024:.0f} KiB "
+          f"(built in {load_time * 1000:.1f}ms)")
+    print(f"[✓] Speedup: {list_time / batch_time:.1f}x")
+    print(f"[{'✓' if legacy == batched else '!'}] Same KEV matches: {legacy == batched}")
@@ -0,0 +1,112 @@
+"""
+Benchmark: python-nmap's buffered XML parse vs scanner.nmap_stream
+
+Generates a synthetic `nmap -oX -` document for N hosts running
+`--script vuln` (a vulners block plus other NSE output per port), then:
+  - python-nmap: the whole document as one string, parsed into nested dicts
+    (what PortScanner.scan does after nmap exits)
+  - streaming: parse_hosts() over a file, each host processed and dropped
+Reports wall time, time until the first host is usable and peak Python
+memory (tracemalloc).
+
+Usage: python benchmarks/bench_nmap_xml_parse.py [hosts] [ports_per_host]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+from xml.sax.saxutils import quoteattr
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nmap
+from scanner.nmap_stream import parse_hosts
+from scanner.vulners import build_findings, parse_vulners_output
+
+VULNERS = "\n  cpe:/a:apache:http_server:2.4.49: \n" + "".join(
+    f"    \tCVE-2021-{41000 + i}\t{(i % 10) + 0.5}\thttps://vulners.com/cve/CVE-2021-{41000 + i}\n"
+    for i in range(40)
+)
+OTHER_SCRIPT = "  VULNERABLE:\n" + "    Possible CSRF vulnerability in form at /login\n" * 40
+
+
+def write_xml(f, host_count, ports):
+    f.write(b'<?xml version="1.0"?>\n<nmaprun scanner="nmap" args="nmap -sV --script vuln">'
+            b'<scaninfo type="syn" protocol="tcp" numservices="1000" services="1-1000"/>\n')
+    for i in range(host_count):
+        host = f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}"
+        port_xml = "".join(
+            f'<port protocol="tcp" portid="{port}"><state state="open" reason="syn-ack"/>'
+            f'<service name="http" product="Apache httpd" version="2.4.49" method="probed" conf="10">'
+            f'<cpe>cpe:/a:apache:http_server:2.4.49</cpe></service>'
+            f'<script id="vulners" output={quoteattr(VULNERS)}/>'
+            f'<script id="http-csrf" output={quoteattr(OTHER_SCRIPT)}/>'
+            f'<script id="http-enum" output={quoteattr(OTHER_SCRIPT)}/></port>'
+            for port in range(80, 80 + ports)
+        )
+        f.write(f'<host><status state="up" reason="user-set"/><address addr="{host}" addrtype="ipv4"/>'
+                f'<hostnames/><ports>{port_xml}</ports></host>\n'.encode())
+    f.write(f'<runstats><finished time="0" elapsed="1"/><hosts up="{host_count}" down="0" '
+            f'total="{host_count}"/></runstats></nmaprun>\n'.encode())
+
+
+def findings_of(record):
+    return sum(len(build_findings(parse_vulners_output(info['script']['vulners']), port, info['name']))
+               for port, info in record.get('tcp', {}).items() if 'vulners' in info.get('script', {}))
+
+
+def buffered(path):
+    start = time.perf_counter()
+    with open(path) as f:
+        xml = f.read()
+    scanner = nmap.PortScanner.__new__(nmap.PortScanner)
+    result = scanner.analyse_nmap_xml_scan(nmap_xml_output=xml)
+    first = time.perf_counter() - start
+    findings = sum(findings_of(record) for record in result['scan'].values())
+    return first, findings
+
+
+def streamed(path):
+    start = time.perf_counter()
+    first, findings = None, 0
+    with open(path, 'rb') as f:
+        for _, record in parse_hosts(f, keep_scripts={'vulners'}):
+            if first is None:
+                first = time.perf_counter() - start
+            findings += findings_of(record)
+    return first, findings
+
+
+def measure(fn, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    first, findings = fn(path)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, first, peak, findings
+
+
+if __name__ == '__main__':
+    host_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    ports = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    with tempfile.NamedTemporaryFile(suffix='.xml', delete=False) as f:
+        write_xml(f, host_count, ports)
+        path = f.name
+    try:
+        size_mb = os.path.getsize(path) / 2 ** 20
+        print(f"[*] {host_count} hosts x {ports} ports | XML: {size_mb:.1f} MiB")
+        results = {}
+        for label, fn in (("python-nmap (buffered)", buffered), ("Streaming (pull parser)", streamed)):
+            elapsed, first, peak, findings = measure(fn, path)
+            results[label] = (elapsed, peak, findings)
+            print(f"    -> {label:<24} {elapsed * 1000:8.1f}ms | first host after {first * 1000:8.1f}ms | "
+                  f"peak {peak / 2 ** 20:7.1f} MiB | {findings} findings")
+        (base_t, base_m, base_f), (fast_t, fast_m, fast_f) = results.values()
+        print(f"[✓] Peak memory {base_m / fast_m:.0f}x lower, {base_t / fast_t:.1f}x faster overall")
+        print(f"[{'✓' if base_f == fast_f else '!'}] Same findings: {base_f == fast_f}")
+    finally:
+        os.unlink(path)
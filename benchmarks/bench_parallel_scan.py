@@ -0,0 +1,87 @@
+"""
+Benchmark: sequential vs parallel NetworkMapper.find_vulnerabilities
+
+Replaces nmap.PortScanner with a stub that sleeps for a fixed per-host
+latency, so the numbers reflect scheduling overhead only (no real nmap).
+
+Usage: python benchmarks/bench_parallel_scan.py [hosts] [latency_seconds] [workers]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scanner.mapper as mapper_module
+from scanner.mapper import NetworkMapper
+
+VULNERS_OUTPUT = """
+  cpe:/a:apache:http_server:2.4.49:
+    CVE-2021-41773  7.5  https://vulners.com/cve/CVE-2021-41773
+    CVE-2021-44228  10.0  https://vulners.com/cve/CVE-2021-44228
+"""
+
+
+class StubPortScanner:
+    """Minimal stand-in for nmap.PortScanner with a fixed scan latency."""
+    latency = 0.05
+    discovered = []
+
+    def __init__(self):
+        self._result = {}
+
+    def scan(self, hosts=None, arguments='', timeout=0):
+        if '--script' not in arguments:
+            # Discovery sweeps: every host is up with port 80 open
+            self._result = {h: {'addresses': {'ipv4': h}, 'status': {'state': 'up'},
+                                'tcp': {80: {'state': 'open', 'name': 'http'}}} for h in self.discovered}
+            return self._result
+        time.sleep(self.latency)
+        self._result = {hosts: {
+            'addresses': {'ipv4': hosts},
+            'tcp': {80: {'name': 'http', 'script': {'vulners': VULNERS_OUTPUT}}},
+        }}
+        return self._result
+
+    def all_hosts(self):
+        return list(self._result)
+
+    def __getitem__(self, host):
+        return self._result[host]
+
+
+def run(hosts, workers):
+    mapper = NetworkMapper('bench-range', max_workers=workers)
+    mapper.discover_hosts()
+    start = time.perf_counter()
+    mapper.find_vulnerabilities()
+    elapsed = time.perf_counter() - start
+    snapshot = [(h, mapper.graph.nodes[h]['ip_address'], len(mapper.graph.nodes[h]['vulnerabilities']))
+                for h in mapper.hosts_list]
+    return elapsed, snapshot
+
+
+if __name__ == '__main__':
+    host_count = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    StubPortScanner.latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+
+    StubPortScanner.discovered = [f"10.0.{i // 256}.{i % 256}" for i in range(host_count)]
+    mapper_module.nmap.PortScanner = StubPortScanner
+    mapper_module.NMAP_BACKEND = 'python-nmap'
+
+    # Silence the mapper's per-host logging while timing
+    real_stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        seq_time, seq_graph = run(host_count, 1)
+        par_time, par_graph = run(host_count, workers)
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+
+    print(f"[*] Hosts: {host_count} | Stub latency: {StubPortScanner.latency:.3f}s | Workers: {workers}")
+    print(f"    -> Sequential: {seq_time:.3f}s")
+    print(f"    -> Parallel:   {par_time:.3f}s ({seq_time / par_time:.1f}x)")
+    print(f"[{'✓' if seq_graph == par_graph else '!'}] Graphs identical: {seq_graph == par_graph}")
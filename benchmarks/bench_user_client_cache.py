@@ -0,0 +1,67 @@
+"""
+Benchmark: per-request Supabase client creation vs the cached get_user_client
+
+No network is involved; this measures what auth_required spends building
+(or reusing) the RLS client for every dashboard request.
+
+Usage: python benchmarks/bench_user_client_cache.py [requests] [distinct_users]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench-anon-key")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "bench-service-key")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "bench-secret-" * 4)
+
+import jwt
+import api
+
+
+def make_tokens(count):
+    exp = int(time.time()) + 3600
+    return [jwt.encode({"sub": f"00000000-0000-0000-0000-{i:012d}", "exp": exp, "aud": "authenticated"},
+                       api.SUPABASE_JWT_SECRET, algorithm="HS256")
+            for i in range(count)]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(label, fn, tokens, request_count):
+    samples = []
+    for i in range(request_count):
+        token = tokens[i % len(tokens)]
+        start = time.perf_counter()
+        fn(token)
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"    -> {label:<14} p50 {percentile(samples, 50):.3f}ms | p99 {percentile(samples, 99):.3f}ms | "
+          f"total {sum(samples):.1f}ms")
+    return sum(samples)
+
+
+def uncached(token):
+    # What auth_required did before the cache
+    client = api.create_client(api.SUPABASE_URL, api.SUPABASE_ANON_KEY)
+    client.postgrest.auth(token)
+
+
+def cached(token):
+    api.get_user_client(token, api.verify_token(token)["exp"])
+
+
+if __name__ == '__main__':
+    request_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    user_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    tokens = make_tokens(user_count)
+
+    print(f"[*] Requests: {request_count} | Distinct users: {user_count}")
+    base = run("Per request", uncached, tokens, request_count)
+    fast = run("Cached", cached, tokens, request_count)
+    print(f"[✓] Speedup: {base / fast:.1f}x")
@@ -0,0 +1,127 @@
+"""
+Benchmark: legacy per-port vulners parsing vs scanner.vulners (precompiled + cached)
+
+The corpus is rebuilt from graph_output.json: each (host, port) group of
+findings is turned back into the raw `vulners` script text nmap produced.
+A fleet is simulated by repeating those outputs across many hosts, with a
+share of hosts running a unique banner (cache misses).
+
+Usage: python benchmarks/bench_vulners_parser.py [hosts] [unique_pct]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner import vulners
+from scanner.kev import KEV_MOCK_LIST
+
+GRAPH_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'graph_output.json')
+
+
+def load_corpus():
+    """[(raw_output, port, service, expected_findings)] from graph_output.json"""
+    with open(GRAPH_FILE) as f:
+        graph = json.load(f)
+    by_port = defaultdict(list)
+    for node in graph['nodes']:
+        for vuln in node.get('vulnerabilities', []):
+            by_port[(node['id'], vuln['port'], vuln['service'])].append(vuln)
+
+    corpus = []
+    for (_, port, service), vulns in by_port.items():
+        lines = [f"  cpe:/a:{service}:{service}: "]
+        lines += [f"    \t{v['id_from_source']}\t{v['cvss_score']}\t{v['name']}" for v in vulns]
+        corpus.append(("\n".join(lines) + "\n", port, service, vulns))
+    return corpus
+
+
+def legacy_parse(vulners_output, port, service):
+    """The loop body NetworkMapper._scan_host used before scanner.vulners"""
+    vulnerabilities = []
+    vuln_pattern = re.compile(r'^\s*([^\s]+)\s+([0-9.]+)\s+(.+)$', re.MULTILINE)
+    for match in vuln_pattern.findall(vulners_output):
+        cve_id = match[0]
+        try:
+            cvss_score = float(match[1])
+        except ValueError:
+            cvss_score = 0.0
+        details_line = match[2]
+        severity = "Info"
+        if cvss_score >= 9.0: severity = "Critical"
+        elif cvss_score >= 7.0: severity = "High"
+        elif cvss_score >= 4.0: severity = "Medium"
+        elif cvss_score > 0: severity = "Low"
+        is_kev = cve_id in KEV_MOCK_LIST
+        vulnerabilities.append({
+            'cve': cve_id if cve_id.startswith('CVE-') else None,
+            'id_from_source': cve_id,
+            'cvss_score': cvss_score,
+            'severity': severity,
+            'name': details_line,
+            'details': f"{cve_id} (CVSS: {cvss_score}, KEV: {is_kev}) - {details_line}",
+            'port': int(port),
+            'service': service,
+            'is_kev': is_kev
+        })
+    return vulnerabilities
+
+
+def production_parse(output, port, service):
+    """What NetworkMapper._scan_host does per port"""
+    return vulners.build_findings(vulners.parse_vulners_output(output), port, service, KEV_MOCK_LIST)
+
+
+def fleet(corpus, host_count, unique_pct):
+    """Per-host script outputs; unique hosts get a banner no other host shares"""
+    outputs = []
+    unique_every = max(1, round(100 / unique_pct)) if unique_pct else 0
+    for i in range(host_count):
+        for output, port, service, _ in corpus:
+            if unique_every and i % unique_every == 0:
+                output = output.replace("cpe:/a:", f"cpe:/a:host{i}-", 1)
+            outputs.append((output, port, service))
+    return outputs
+
+
+def run(label, parse, outputs):
+    start = time.perf_counter()
+    findings = sum(len(parse(o, p, s)) for o, p, s in outputs)
+    elapsed = time.perf_counter() - start
+    print(f"    -> {label:<22} {elapsed * 1000:8.1f}ms | {findings} findings")
+    return elapsed
+
+
+if __name__ == '__main__':
+    host_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    unique_pct = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    corpus = load_corpus()
+    outputs = fleet(corpus, host_count, unique_pct)
+
+    # Same findings as graph_output.json and as the legacy parser
+    identical = all(
+        production_parse(o, p, s) == legacy_parse(o, p, s) == expected
+        for o, p, s, expected in corpus
+    )
+
+    print(f"[*] Corpus: {len(corpus)} port outputs, {sum(len(c[3]) for c in corpus)} findings | "
+          f"Fleet: {host_count} hosts, {unique_pct:g}% unique banners")
+    base = run("Legacy (regex per port)", legacy_parse, outputs)
+    vulners.VULNERS_CACHE_SIZE = 0
+    vulners.clear_cache()
+    uncached = run("Precompiled, no cache", production_parse, outputs)
+    vulners.VULNERS_CACHE_SIZE = 4096
+    vulners.clear_cache()
+    cached = run("Precompiled + LRU", production_parse, outputs)
+    info = vulners.cache_info()
+    print(f"    -> Cache: {info['hits']} hits / {info['misses']} misses")
+    faster = base > uncached and base > cached
+    print(f"[{'✓' if faster else '!'}] {'Speedup' if faster else 'Relative speed'}: "
+          f"{base / uncached:.2f}x uncached, {base / cached:.2f}x cached")
+    print(f"[{'✓' if identical else '!'}] Findings identical to graph_output.json and legacy parser: {identical}")
@@ -0,0 +1,135 @@
+"""
+Scan checkpoint store: what a scan task has already done, keyed by scan id.
+
+With task_acks_late, a worker that dies mid-scan gets run_nmap_scan
+redelivered from the start. The checkpoint lets the new attempt pick up
+where the old one stopped:
+
+- discovery: the discovered hosts, their open ports, service fingerprints,
+  phase timings, scheduler state and the scan's deadline, saved once host
+  discovery (and the fingerprint pass) is done. A resumed task skips
+  discovery entirely and keeps the original time budget. Once the scan is
+  handed to a chord of chunk tasks, the state also records the aggregate
+  task id ('dispatched'), and a redelivered task stops there.
+- hosts: {host: (status, scan_seconds)} for every host the scan has
+  finished with, marked right after the host's results are committed.
+
+Two backends share one interface: Redis (a hash per scan, expiring after
+SCAN_CHECKPOINT_TTL) and a local append-only JSON-lines file per scan for
+single-node deployments. A checkpoint is a cache of durable state, never
+the only copy: findings live in Postgres, and per-host completion also
+lives in public.scan_host_results.
+"""
+
+import os
+import json
+
+SCAN_CHECKPOINT_BACKEND = os.environ.get("SCAN_CHECKPOINT_BACKEND", "redis")
+SCAN_CHECKPOINT_DIR = os.environ.get("SCAN_CHECKPOINT_DIR", "/tmp/scan-checkpoints")
+SCAN_CHECKPOINT_TTL = int(os.environ.get("SCAN_CHECKPOINT_TTL", str(7 * 24 * 3600)))
+
+_DISCOVERY = "discovery"
+_HOST_PREFIX = "host:"
+
+
+class RedisCheckpointStore:
+    """One Redis hash per scan: a 'discovery' field plus one 'host:<host>' field per finished host."""
+    prefix = "vappler:checkpoint"
+
+    def __init__(self, client, ttl=SCAN_CHECKPOINT_TTL):
+        self.client = client
+        self.ttl = ttl
+
+    def key(self, scan_id):
+        return f"{self.prefix}:{scan_id}"
+
+    def _write(self, scan_id, fields):
+        pipe = self.client.pipeline()
+        pipe.hset(self.key(scan_id), mapping=fields)
+        pipe.expire(self.key(scan_id), self.ttl)
+        pipe.execute()
+
+    def save_discovery(self, scan_id, state):
+        self._write(scan_id, {_DISCOVERY: json.dumps(state)})
+
+    def mark_hosts(self, scan_id, rows):
+        """rows: [(host, status, scan_seconds)]"""
+        if rows:
+            self._write(scan_id, {f"{_HOST_PREFIX}{host}": json.dumps([status, seconds])
+                                  for host, status, seconds in rows})
+
+    def load(self, scan_id):
+        """(discovery state or None, {host: (status, scan_seconds)})"""
+        discovery, hosts = None, {}
+        for field, value in self.client.hgetall(self.key(scan_id)).items():
+            field = field.decode() if isinstance(field, bytes) else field
+            if field == _DISCOVERY:
+                discovery = json.loads(value)
+            elif field.startswith(_HOST_PREFIX):
+                hosts[field[len(_HOST_PREFIX):]] = tuple(json.loads(value))
+        return discovery, hosts
+
+    def clear(self, scan_id):
+        self.client.delete(self.key(scan_id))
+
+
+class FileCheckpointStore:
+    """
+    One append-only JSON-lines file per scan. Each record is a single
+    write(); a torn last line (the worker died mid-write) is ignored on load,
+    and later records win over earlier ones.
+    """
+
+    def __init__(self, directory=SCAN_CHECKPOINT_DIR):
+        self.directory = directory
+
+    def path(self, scan_id):
+        return os.path.join(self.directory, f"{scan_id}.jsonl")
+
+    def _append(self, scan_id, records):
+        os.makedirs(self.directory, exist_ok=True)
+        data = "".join(json.dumps(r, separators=(',', ':')) + "\n" for r in records).encode()
+        fd = os.open(self.path(scan_id), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def save_discovery(self, scan_id, state):
+        self._append(scan_id, [{_DISCOVERY: state}])
+
+    def mark_hosts(self, scan_id, rows):
+        if rows:
+            self._append(scan_id, [{"host": host, "status": status, "seconds": seconds}
+                                   for host, status, seconds in rows])
+
+    def load(self, scan_id):
+        discovery, hosts = None, {}
+        try:
+            with open(self.path(scan_id), 'rb') as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return discovery, hosts
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if _DISCOVERY in record:
+                discovery = record[_DISCOVERY]
+            elif "host" in record:
+                hosts[record["host"]] = (record.get("status"), record.get("seconds"))
+        return discovery, hosts
+
+    def clear(self, scan_id):
+        try:
+            os.unlink(self.path(scan_id))
+        except FileNotFoundError:
+            pass
+
+
+def checkpoint_store(redis_client=None):
+    """The configured store; redis_client is required for the Redis backend."""
+    if SCAN_CHECKPOINT_BACKEND == 'file':
+        return FileCheckpointStore()
+    return RedisCheckpointStore(redis_client)
@@ -0,0 +1,157 @@
+"""
+Compact serialization for attack-path graphs (scans.graph_data).
+
+nx.node_link_data repeats every attribute name on every node and link and, for
+older scans, embeds full vulnerability dicts. The compact format stores each
+distinct string once and refers to it by index, keeps node attributes as
+fixed-order rows, and references findings by asset id instead of embedding
+them:
+
+    {
+      "format": "compact-v1",
+      "strings": ["attacker", "10.0.0.5", "<asset uuid>", ...],
+      "node_fields": ["id", "ip_address", "asset_id", "max_cvss", "is_kev", "vuln_count"],
+      "nodes": [[0, null, null, 0, 0, 0], [1, 1, 2, 9.8, 1, 12], ...],
+      "edges": [[0, 1, 0.5], ...],
+      "path": [0, 1],
+      "crown_jewels": [1],
+      "tree": {"version": "<sha1>", "pred": [null, 0, ...], "dist": [0, 0.5, ...]}
+    }
+
+"tree" is the shortest-path tree from the attacker (one previous-hop node
+index and one path cost per row of "nodes", null if unreachable), so the path
+to any asset can be read back without running Dijkstra again.
+
+With compression, the same document is zlib-compressed and stored as
+{"format": "compact-v1", "encoding": "zlib+base64", "data": "..."}.
+"""
+
+import json
+import zlib
+import base64
+import networkx as nx
+
+FORMAT = "compact-v1"
+ENCODING_ZLIB = "zlib+base64"
+# String-valued fields are stored as indexes into "strings"
+NODE_FIELDS = ["id", "ip_address", "asset_id", "max_cvss", "is_kev", "vuln_count"]
+STRING_FIELDS = {"id", "ip_address", "asset_id"}
+
+
+def _summary(node):
+    """max_cvss / is_kev / vuln_count from a node, with or without embedded findings"""
+    vulnerabilities = node.get('vulnerabilities') or []
+    return (
+        max((v.get('cvss_score') or 0 for v in vulnerabilities), default=node.get('max_cvss', 0)) or 0,
+        bool(node.get('is_kev')) or any(v.get('is_kev') for v in vulnerabilities),
+        node.get('vuln_count', len(vulnerabilities))
+    )
+
+
+def to_compact(graph, path=None, compress=False, tree=None, crown_jewels=None):
+    """
+    Serialize an attack-path graph (NetworkMapper.graph) to the compact format.
+    tree is a scanner.mapper.shortest_path_tree() result for this graph.
+    """
+    strings, index = [], {}
+
+    def intern(value):
+        if value is None:
+            return None
+        value = str(value)
+        if value not in index:
+            index[value] = len(strings)
+            strings.append(value)
+        return index[value]
+
+    nodes = []
+    for node_id, node in graph.nodes(data=True):
+        max_cvss, is_kev, vuln_count = _summary(node)
+        nodes.append([
+            intern(node_id),
+            intern(node.get('ip_address')),
+            intern(node.get('asset_id')),
+            round(float(max_cvss), 1),
+            int(is_kev),
+            int(vuln_count)
+        ])
+    edges = [[index[str(u)], index[str(v)], data.get('weight')] for u, v, data in graph.edges(data=True)]
+
+    compact = {
+        "format": FORMAT,
+        "strings": strings,
+        "node_fields": NODE_FIELDS,
+        "nodes": nodes,
+        "edges": edges,
+        "path": [index[str(n)] for n in path or [] if str(n) in index]
+    }
+    if crown_jewels:
+        compact["crown_jewels"] = [index[str(n)] for n in crown_jewels if str(n) in index]
+    if tree is not None:
+        version, predecessors, distances = tree
+        compact["tree"] = {
+            "version": version,
+            "pred": [index[str(predecessors[n])] if n in predecessors else None for n in graph.nodes],
+            "dist": [round(distances[n], 4) if n in distances else None for n in graph.nodes]
+        }
+    if not compress:
+        return compact
+    raw = json.dumps(compact, separators=(',', ':')).encode()
+    return {"format": FORMAT, "encoding": ENCODING_ZLIB,
+            "data": base64.b64encode(zlib.compress(raw, 9)).decode()}
+
+
+def decompress(data):
+    """Plain compact dict from a possibly compressed one (other formats pass through)."""
+    if isinstance(data, str):
+        data = json.loads(data)
+    if isinstance(data, dict) and data.get("encoding") == ENCODING_ZLIB:
+        data = json.loads(zlib.decompress(base64.b64decode(data["data"])))
+    return data
+
+
+def is_compact(data):
+    return isinstance(data, dict) and data.get("format") == FORMAT
+
+
+def load_graph(data):
+    """
+    nx.Graph from stored graph_data: compact (optionally compressed) or the
+    legacy node_link_data format. Returns (graph, path).
+    """
+    data = decompress(data)
+    if not is_compact(data):
+        graph = nx.node_link_graph(data)
+        return graph, []
+
+    strings = data["strings"]
+    fields = data.get("node_fields", NODE_FIELDS)
+    graph = nx.Graph()
+    for row in data["nodes"]:
+        attrs = {
+            field: (strings[value] if field in STRING_FIELDS else value)
+            for field, value in zip(fields, row) if value is not None
+        }
+        node_id = attrs.pop("id")
+        attrs["is_kev"] = bool(attrs.get("is_kev"))
+        attrs["label"] = "Attacker" if node_id == "attacker" else node_id
+        graph.add_node(node_id, **attrs)
+    for u, v, weight in data["edges"]:
+        graph.add_edge(strings[u], strings[v], weight=weight)
+    graph.graph["crown_jewels"] = [strings[i] for i in data.get("crown_jewels", [])]
+    return graph, [strings[i] for i in data.get("path", [])]
+
+
+def load_tree(data):
+    """
+    The stored shortest-path tree as (version, predecessors, distances), in
+    scanner.mapper.shortest_path_tree() form, or None if the row has none.
+    """
+    data = decompress(data)
+    if not is_compact(data) or "tree" not in data:
+        return None
+    strings, tree = data["strings"], data["tree"]
+    node_ids = [strings[row[0]] for row in data["nodes"]]
+    predecessors = {node: strings[p] for node, p in zip(node_ids, tree["pred"]) if p is not None}
+    distances = {node: d for node, d in zip(node_ids, tree["dist"]) if d is not None}
+    return tree["version"], predecessors, distances
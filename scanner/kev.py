@@ -0,0 +1,193 @@
+"""
+CISA Known Exploited Vulnerabilities (KEV) catalog, loaded from a local file.
+
+CVE ids are encoded as int64 (year * 10**10 + sequence number) and kept in a
+sorted numpy array: ~8 bytes per entry, O(log n) single lookups and one
+vectorized np.searchsorted for all of a host's findings at once. Very large
+feeds can be prebuilt into a .npy index (build_index) and memory-mapped, so
+every worker process shares the same pages.
+
+The catalog file is re-checked at most every KEV_RELOAD_SECONDS; a changed
+file is parsed in full and then swapped in with a single reference
+assignment, so lookups never see a half-loaded catalog and workers don't need
+a restart. Writers should replace the file atomically (see write_catalog).
+"""
+
+import os
+import re
+import json
+import time
+import tempfile
+import threading
+import numpy as np
+
+# --- VULCAN ENHANCEMENT: KEV Mock List ---
+# Used when no catalog file has been synced yet (dev / test-target scans).
+KEV_MOCK_LIST = [
+    'CVE-2024-0001', # Mock Critical RCE from mock data in migrations
+    'CVE-2021-44228', # Log4Shell
+    'CVE-2020-0796',  # SMBGhost
+    'CVE-2022-26134', # Confluence RCE
+    'CVE-2024-5678'   # Mock High SQLi from mock data
+]
+# ----------------------------------------
+
+KEV_CATALOG_PATH = os.environ.get("KEV_CATALOG_PATH", "/tmp/kev/known_exploited_vulnerabilities.json")
+KEV_FEED_URL = os.environ.get(
+    "KEV_FEED_URL",
+    "https://www.cisa.gov/sites/default/files/feeds/known_exploited_vulnerabilities.json"
+)
+KEV_RELOAD_SECONDS = float(os.environ.get("KEV_RELOAD_SECONDS", "60"))
+
+CVE_ID = re.compile(r'^CVE-(\d{4})-(\d{4,10})$', re.IGNORECASE)
+_YEAR_FACTOR = 10 ** 10
+
+
+def encode_cve(cve_id):
+    """CVE-2021-44228 -> 20210000044228; -1 for anything that isn't a CVE id."""
+    match = CVE_ID.match(cve_id.strip()) if isinstance(cve_id, str) else None
+    if not match:
+        return -1
+    return int(match.group(1)) * _YEAR_FACTOR + int(match.group(2))
+
+
+def decode_cve(key):
+    year, number = divmod(int(key), _YEAR_FACTOR)
+    return f"CVE-{year}-{number:04d}"
+
+
+class KevCatalog:
+    """Immutable KEV snapshot: a sorted, de-duplicated int64 array of encoded CVE ids."""
+
+    def __init__(self, keys, version=None, source=None):
+        self.keys = keys
+        self.version = version
+        self.source = source
+
+    @classmethod
+    def from_ids(cls, cve_ids, version=None, source=None):
+        keys = np.fromiter((encode_cve(c) for c in cve_ids), dtype=np.int64)
+        return cls(np.unique(keys[keys >= 0]), version, source)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, cve_id):
+        return bool(self.lookup([cve_id])[0])
+
+    def lookup(self, cve_ids):
+        """Boolean array: which of cve_ids are in the catalog (one vectorized search)."""
+        wanted = np.fromiter((encode_cve(c) for c in cve_ids), dtype=np.int64)
+        if not len(self.keys) or not len(wanted):
+            return np.zeros(len(wanted), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.keys, wanted), len(self.keys) - 1)
+        return (self.keys[positions] == wanted) & (wanted >= 0)
+
+    def matches(self, cve_ids):
+        """The subset of cve_ids that are KEVs, as a set (batch lookup for one host)."""
+        cve_ids = list(cve_ids)
+        return {c for c, hit in zip(cve_ids, self.lookup(cve_ids).tolist()) if hit}
+
+
+def parse_catalog(raw):
+    """CVE ids and version from CISA's JSON feed or a plain list (one CVE per line)."""
+    text = raw.decode('utf-8') if isinstance(raw, bytes) else raw
+    if text.lstrip().startswith('{'):
+        feed = json.loads(text)
+        return [v['cveID'] for v in feed.get('vulnerabilities', []) if v.get('cveID')], feed.get('catalogVersion')
+    return [line.split('#', 1)[0].strip() for line in text.splitlines() if line.split('#', 1)[0].strip()], None
+
+
+def load_catalog(path):
+    """KevCatalog from a feed file, or from a build_index() .npy index (memory-mapped)."""
+    if path.endswith('.npy'):
+        return KevCatalog(np.load(path, mmap_mode='r'), version=str(os.stat(path).st_mtime_ns), source=path)
+    with open(path, 'rb') as f:
+        cve_ids, version = parse_catalog(f.read())
+    return KevCatalog.from_ids(cve_ids, version=version or str(os.stat(path).st_mtime_ns), source=path)
+
+
+def _replace_atomically(path, write):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.kev-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def write_catalog(raw, path=KEV_CATALOG_PATH):
+    """Validate a downloaded feed and swap it in atomically. Returns the entry count."""
+    cve_ids, _ = parse_catalog(raw)
+    if not cve_ids:
+        raise ValueError("KEV feed contains no CVE ids")
+    _replace_atomically(path, lambda f: f.write(raw if isinstance(raw, bytes) else raw.encode()))
+    return len(cve_ids)
+
+
+def build_index(feed_path, index_path):
+    """Prebuild a sorted .npy index for very large feeds; point KEV_CATALOG_PATH at it."""
+    catalog = load_catalog(feed_path)
+    _replace_atomically(index_path, lambda f: np.save(f, catalog.keys))
+    return len(catalog)
+
+
+# --- Process-wide catalog with mtime-based hot reload ---
+_catalog = None
+_catalog_mtime = None
+_checked_at = 0.0
+_reload_lock = threading.Lock()
+
+
+def get_catalog(path=None):
+    """
+    The current catalog. Reloads when the file changed (checked at most every
+    KEV_RELOAD_SECONDS); falls back to KEV_MOCK_LIST until a catalog exists.
+    A bad file keeps the previous catalog.
+    """
+    global _catalog, _catalog_mtime, _checked_at
+    path = path or KEV_CATALOG_PATH
+    catalog = _catalog
+    if catalog is not None and time.monotonic() - _checked_at < KEV_RELOAD_SECONDS:
+        return catalog
+
+    with _reload_lock:
+        if _catalog is not None and time.monotonic() - _checked_at < KEV_RELOAD_SECONDS:
+            return _catalog
+        _checked_at = time.monotonic()
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if _catalog is not None and mtime == _catalog_mtime:
+            return _catalog
+
+        if mtime is None:
+            if _catalog is None:
+                print(f"[WARN] KEV catalog {path} not found; using the built-in mock list")
+                _catalog = KevCatalog.from_ids(KEV_MOCK_LIST, version="mock")
+            _catalog_mtime = None
+            return _catalog
+        try:
+            fresh = load_catalog(path)
+        except Exception as e:
+            print(f"[WARN] Could not load KEV catalog {path}: {e}")
+            if _catalog is None:
+                _catalog = KevCatalog.from_ids(KEV_MOCK_LIST, version="mock")
+            return _catalog
+        _catalog, _catalog_mtime = fresh, mtime
+        print(f"[*] Loaded KEV catalog {path}: {len(fresh)} CVEs (version {fresh.version})")
+        return fresh
+
+
+def reload_catalog(path=None):
+    """Force a re-check of the catalog file on the next get_catalog()."""
+    global _checked_at, _catalog_mtime
+    with _reload_lock:
+        _checked_at = 0.0
+        _catalog_mtime = None
+    return get_catalog(path)
@@ -1,162 +1,541 @@
+import os
 import nmap
 import networkx as nx
 import json
-import re
-
-# --- VULCAN ENHANCEMENT: KEV Mock List ---
-# In production, this would be dynamically fetched from the CISA API and stored in Supabase.
-KEV_MOCK_LIST = [
-    'CVE-2024-0001', # Mock Critical RCE from mock data in migrations
-    'CVE-2021-44228', # Log4Shell
-    'CVE-2020-0796',  # SMBGhost
-    'CVE-2022-26134', # Confluence RCE
-    'CVE-2024-5678'   # Mock High SQLi from mock data
-]
-# ----------------------------------------
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from scanner.vulners import build_findings, parse_vulners_output
+from scanner.kev import get_catalog
+from scanner.risk import score_graph
+from scanner.nmap_stream import StreamingPortScanner
+from scanner.profiles import get_profile, discovery_port_args, ScanBudgetExceeded
+from scanner.scheduler import AdaptiveScheduler
+
+# --- VULCAN PERF: nmap backend ---
+# "stream" parses nmap's XML incrementally (scanner.nmap_stream);
+# "python-nmap" buffers the whole run in nmap.PortScanner.
+NMAP_BACKEND = os.environ.get("NMAP_BACKEND", "stream")
+# The only NSE output NetworkMapper reads; the streaming backend drops the rest
+KEPT_SCRIPTS = ('vulners',)
+
+
+# --- VULCAN PERF: Tiered discovery ---
+# A liveness sweep (no port scan) runs first, then a top-ports sweep of the
+# live hosts only (sized by the scan profile, scanner.profiles); the vuln
+# scan is pinned (-p) to the ports found open.
+# DISCOVERY_LIVENESS=false goes back to treating every address as up (-Pn),
+# for networks that drop all probes.
+DISCOVERY_LIVENESS = os.environ.get("DISCOVERY_LIVENESS", "true").lower() in ("1", "true", "yes")
+LIVENESS_ARGS = os.environ.get("LIVENESS_ARGS", "-sn -T4 -PE -PP -PS21,22,23,25,80,443,445,3389,8080 -PA80,443")
+
+# --- VULCAN PERF: Per-host timeouts ---
+# Each host's vuln scan runs with nmap's --host-timeout (the profile's, capped
+# by the time left); if nmap itself doesn't return within this many seconds
+# more, the process is killed and the host is recorded as timed out.
+HOST_TIMEOUT_GRACE = int(os.environ.get("HOST_TIMEOUT_GRACE", "30"))
+
+
+def new_port_scanner():
+    if NMAP_BACKEND == 'stream':
+        return StreamingPortScanner(keep_scripts=KEPT_SCRIPTS)
+    return nmap.PortScanner()
+
+
+def iter_host_records(scanner, hosts, arguments, timeout=None):
+    """(host, record) pairs from either backend, as nmap finishes them where the backend can stream."""
+    if hasattr(scanner, 'iter_scan'):
+        yield from scanner.iter_scan(hosts, arguments, timeout=timeout)
+        return
+    scanner.scan(hosts=hosts, arguments=arguments, timeout=timeout or 0)
+    for host in scanner.all_hosts():
+        yield host, scanner[host]
+
+
+# Summary/bookkeeping attributes that travel with a host instead of its full findings
+HOST_SUMMARY_KEYS = ('max_cvss', 'is_kev', 'vuln_count', 'fingerprint', 'scan_seconds', 'asset_id')
+
+
+def service_fingerprint(tcp_ports):
+    """
+    Stable hash of a host's open TCP ports and detected service versions,
+    from python-nmap's scanner[host]['tcp'] dict. Unchanged fingerprint =
+    nothing new for the vuln scripts to look at.
+    """
+    services = sorted(
+        f"{port}/{info.get('name', '')}/{info.get('product', '')}/{info.get('version', '')}/{info.get('extrainfo', '')}"
+        for port, info in tcp_ports.items() if info.get('state', 'open') == 'open'
+    )
+    return hashlib.sha256("\n".join(services).encode()).hexdigest()
+
+
+# --- VULCAN PERF: Shortest-path trees, cached by graph version ---
+ATTACK_PATH_TREE_CACHE_SIZE = 64
+_trees = OrderedDict()  # graph version -> (predecessors, distances)
+_trees_lock = threading.Lock()
+
+
+def _edge_weight(u, v, data):
+    # Edges without a risk weight yet (e.g. legacy graph_data) count as one hop
+    return data.get('weight') or 1
+
+
+def graph_version(graph):
+    """Digest of the weighted edge set; changes whenever the graph or any risk weight does."""
+    edges = sorted(
+        (min(str(u), str(v)), max(str(u), str(v)), data.get('weight'))
+        for u, v, data in graph.edges(data=True)
+    )
+    return hashlib.sha1(json.dumps(edges, separators=(',', ':')).encode()).hexdigest()
+
+
+def shortest_path_tree(graph, source='attacker'):
+    """
+    One single-source Dijkstra from source, cached by graph_version().
+    Returns (version, predecessors, distances): predecessors maps every
+    reachable node to its previous hop, so any path is a walk back to source.
+    """
+    version = graph_version(graph)
+    with _trees_lock:
+        tree = _trees.get(version)
+        if tree is not None:
+            _trees.move_to_end(version)
+            return (version,) + tree
+
+    pred, dist = nx.dijkstra_predecessor_and_distance(graph, source, weight=_edge_weight)
+    tree = ({node: hops[0] for node, hops in pred.items() if hops}, dist)
+    with _trees_lock:
+        _trees[version] = tree
+        while len(_trees) > ATTACK_PATH_TREE_CACHE_SIZE:
+            _trees.popitem(last=False)
+    return (version,) + tree
+
+
+def tree_path(predecessors, target, source='attacker'):
+    """source -> ... -> target from a shortest_path_tree(); [] if target is unreachable."""
+    if target != source and target not in predecessors:
+        return []
+    path = [target]
+    while path[-1] != source:
+        path.append(predecessors[path[-1]])
+    return path[::-1]
+
+
+def rank_attack_paths(graph, tree, targets=None, limit=None, source='attacker'):
+    """
+    Cheapest (most likely) attack paths first, to targets or to every asset.
+    Unknown or unreachable targets are left out.
+    """
+    _, predecessors, distances = tree
+    targets = graph.nodes if targets is None else targets
+    reachable = [t for t in dict.fromkeys(targets) if t != source and t in distances]
+    reachable.sort(key=lambda t: (distances[t], str(t)))
+    ranked = []
+    for target in reachable[:limit]:
+        node = graph.nodes[target]
+        ranked.append({
+            "target": target,
+            "ip_address": node.get('ip_address', target),
+            "asset_id": node.get('asset_id'),
+            "cost": round(distances[target], 2),
+            "path": tree_path(predecessors, target, source)
+        })
+    return ranked
+
 
 class NetworkMapper:
-    def __init__(self, target_range):
+    def __init__(self, target_range, max_workers=1, profile=None, deadline=None, scheduler_state=None):
         self.target_range = target_range
-        self.scanner = nmap.PortScanner()
+        self.max_workers = max(1, int(max_workers or 1))
+        # scanner.profiles.ScanProfile: ports, scripts and timing; the scheduler tunes the latter
+        self.profile = profile or get_profile()
+        self.scheduler = AdaptiveScheduler(self.profile, self.max_workers, scheduler_state)
+        self.deadline = deadline  # time.time() after which no new host scan starts
+        self.unscanned_hosts = []  # hosts left out because the deadline passed
+        self._scanner = None
         self.graph = nx.Graph()
         self.hosts_list = []
+        self.open_ports = {}    # host -> TCP ports open at discovery (vuln scans are pinned to these)
+        self.phase_timings = {} # phase -> seconds (liveness, ports, fingerprint, vuln)
+        self.fingerprints = {}  # host -> service_fingerprint()
+        self.failed_hosts = set()
+        self.timed_out_hosts = set()  # subset of failed_hosts: killed after their per-host timeout
+        self.risk_scores = None  # scanner.risk.RiskScores from the last calculate_risk_weights()
+
+    @property
+    def scanner(self):
+        # Created on first use so analysis-only mappers never shell out to nmap
+        if self._scanner is None:
+            self._scanner = new_port_scanner()
+        return self._scanner
+
+    def remaining_budget(self):
+        """Seconds left before the deadline (None = no deadline)."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.time())
+
+    def _discovery_timeout(self, phase):
+        remaining = self.remaining_budget()
+        if remaining is not None and remaining <= 0:
+            raise ScanBudgetExceeded(f"'{self.profile.name}' time budget of {self.profile.time_budget}s "
+                                     f"exhausted before the {phase} phase")
+        return remaining
+
+    def _discovery_records(self, phase, targets, arguments):
+        try:
+            yield from iter_host_records(self.scanner, targets, arguments, timeout=self._discovery_timeout(phase))
+        except nmap.PortScannerTimeout:
+            raise ScanBudgetExceeded(f"'{self.profile.name}' time budget of {self.profile.time_budget}s "
+                                     f"exhausted during the {phase} phase")
 
     def discover_hosts(self):
-        print(f"[*] Discovering hosts in {self.target_range}...")
-        self.scanner.scan(hosts=self.target_range, arguments='-Pn -T4 -F')
-        self.hosts_list = self.scanner.all_hosts()
+        print(f"[*] Discovering hosts in {self.target_range} ('{self.profile.name}' profile)...")
+        targets = self.target_range
+        if DISCOVERY_LIVENESS:
+            # Phase 1: which addresses are up at all
+            start = time.perf_counter()
+            live = [host for host, record in self._discovery_records('liveness', self.target_range, LIVENESS_ARGS)
+                    if record.get('status', {}).get('state', 'up') == 'up']
+            self.phase_timings['liveness'] = round(time.perf_counter() - start, 3)
+            print(f"[*] Liveness sweep: {len(live)} hosts up ({self.phase_timings['liveness']:.1f}s)")
+            if not live:
+                self.hosts_list = []
+                print("[!] No hosts found.")
+                return
+            targets = " ".join(live)
+
+        # Phase 2: the profile's port sweep on live hosts only. Only each host's open ports
+        # are kept, so discovery memory stays flat.
+        start = time.perf_counter()
+        times = []
+        arguments = f'-Pn -T{self.profile.timing} {discovery_port_args(self.profile)}'
+        for host, record in self._discovery_records('ports', targets, arguments):
+            tcp = record.get('tcp', {})
+            self.open_ports[host] = sorted(p for p, info in tcp.items() if info.get('state') == 'open')
+            times.append(record.get('times'))
+        self.phase_timings['ports'] = round(time.perf_counter() - start, 3)
+        # RTTs seen by the sweep set the vuln scans' probe timeouts
+        self.scheduler.observe_rtt(times)
+        self.hosts_list = sorted(self.open_ports)
         
         if not self.hosts_list:
             print("[!] No hosts found.")
             return
             
         print(f"[+] Found {len(self.hosts_list)} hosts: {self.hosts_list}")
+        self.add_hosts(self.hosts_list)
+
+    def discovery_state(self):
+        """Discovery results as a JSON-serializable dict (for scanner.checkpoint); see restore_discovery()."""
+        return {
+            "hosts": self.hosts_list,
+            "open_ports": self.open_ports,
+            "fingerprints": self.fingerprints,
+            "phase_timings": self.phase_timings,
+            "scheduler": self.scheduler.state()
+        }
+
+    def restore_discovery(self, state):
+        """Pick up a checkpointed discovery_state() instead of running discover_hosts() again."""
+        self.add_hosts(state.get("hosts") or [])
+        self.open_ports = {host: list(ports) for host, ports in (state.get("open_ports") or {}).items()}
+        self.fingerprints = dict(state.get("fingerprints") or {})
+        self.phase_timings = dict(state.get("phase_timings") or {})
+        self.scheduler = AdaptiveScheduler(self.profile, self.max_workers, state.get("scheduler"))
+
+    def fingerprint_hosts(self):
+        """
+        Cheap service-version pass (-sV --version-light) over the ports found
+        at discovery, without any scripts. Fills self.fingerprints.
+        """
+        ports = sorted({p for host in self.hosts_list for p in self.open_ports.get(host, ())})
+        if not ports:
+            # Nothing open anywhere: every host has the empty fingerprint
+            self.fingerprints = {host: service_fingerprint({}) for host in self.hosts_list}
+            return self.fingerprints
+
+        print(f"[*] Fingerprinting services on {len(self.hosts_list)} hosts ({len(ports)} ports)...")
+        known = set(self.hosts_list)
+        start = time.perf_counter()
+        try:
+            arguments = f'-sV --version-light -Pn {self.scheduler.timing_args()} -p {",".join(map(str, ports))}'
+            remaining = self.remaining_budget()
+            for host, record in iter_host_records(self.scanner, " ".join(self.hosts_list), arguments,
+                                                  timeout=None if remaining is None else max(1, remaining)):
+                if host in known:
+                    self.fingerprints[host] = service_fingerprint(record.get('tcp', {}))
+        except Exception as scan_err:
+            # Hosts fingerprinted before the failure keep their fingerprint
+            print(f"[!] Fingerprint pass failed, unfingerprinted hosts will be fully scanned: {scan_err}")
+        self.phase_timings['fingerprint'] = round(time.perf_counter() - start, 3)
+        return self.fingerprints
+
+    def add_hosts(self, hosts):
+        """Register already-discovered hosts (e.g. a chunk handed to a Celery subtask)."""
         self.graph.add_node('attacker', label='Attacker')
-        for host in self.hosts_list:
+        known = set(self.hosts_list)
+        for host in hosts:
+            if host not in known:
+                known.add(host)
+                self.hosts_list.append(host)
             self.graph.add_node(host, label=host, vulnerabilities=[])
             self.graph.add_edge('attacker', host)
 
-    def find_vulnerabilities(self):
-        if not self.hosts_list: return
+    def host_results(self):
+        """Per-host scan results in discovery order, as JSON-serializable dicts."""
+        results = []
+        for host in self.hosts_list:
+            node = self.graph.nodes[host]
+            result = {
+                "host": host,
+                "ip_address": node.get('ip_address', host),
+                "vulnerabilities": node.get('vulnerabilities', [])
+            }
+            # Streamed hosts only keep the risk summary in the graph
+            for key in HOST_SUMMARY_KEYS:
+                if key in node:
+                    result[key] = node[key]
+            results.append(result)
+        return results
+
+    def load_host_results(self, host_results):
+        """Rebuild the graph from host_results() output of one or more mappers."""
+        self.add_hosts([r['host'] for r in host_results])
+        for r in host_results:
+            node = self.graph.nodes[r['host']]
+            node['ip_address'] = r.get('ip_address', r['host'])
+            node['vulnerabilities'].extend(r.get('vulnerabilities', []))
+            for key in HOST_SUMMARY_KEYS:
+                if key in r:
+                    node[key] = r[key]
+
+    def find_vulnerabilities(self, on_host_complete=None, skip_hosts=()):
+        """
+        Vulnerability-scan every discovered host not in skip_hosts.
+        With on_host_complete, each host's result dict is handed to the callback
+        as soon as it finishes (in completion order) and the graph keeps only a
+        risk summary per host, so memory does not grow with the findings.
+        """
+        hosts = [h for h in self.hosts_list if h not in skip_hosts]
+        if not hosts: return
         print("\n[*] Performing service version detection and vulnerability scan...")
+        start = time.perf_counter()
+        if self.max_workers > 1 and len(hosts) > 1:
+            # --- VULCAN PERF: Bounded worker pool, one PortScanner per host ---
+            # python-nmap keeps the last scan result on the scanner instance, so
+            # every in-flight host gets its own scanner instead of self.scanner.
+            print(f"    [*] Parallel mode: up to {min(self.max_workers, len(hosts))} hosts in flight")
+            completed = self._scan_parallel(self._within_budget(hosts))
+        else:
+            completed = ((host, self._timed_scan_host(host, self.scanner)) for host in self._within_budget(hosts))
+
+        results = {}
+        for host, (ip_address, vulnerabilities, seconds) in completed:
+            node = self.graph.nodes[host]
+            node['scan_seconds'] = round(seconds, 3)
+            # A fingerprint is only worth storing once its findings are complete
+            if host in self.fingerprints and host not in self.failed_hosts:
+                node['fingerprint'] = self.fingerprints[host]
+            if on_host_complete is None:
+                results[host] = (ip_address, vulnerabilities)
+                continue
+            node['ip_address'] = ip_address
+            node['max_cvss'] = max((v.get('cvss_score', 0) for v in vulnerabilities), default=0)
+            node['is_kev'] = any(v.get('is_kev', False) for v in vulnerabilities)
+            node['vuln_count'] = len(vulnerabilities)
+            host_data = {"host": host, "ip_address": ip_address, "vulnerabilities": vulnerabilities,
+                         "scan_seconds": node['scan_seconds'], "status": self.host_status(host)}
+            if 'fingerprint' in node:
+                host_data['fingerprint'] = node['fingerprint']
+            if host in self.open_ports:
+                host_data['open_ports'] = self.open_ports[host]
+            on_host_complete(host_data)
+
+        # Merge in discovery order so the graph is identical in both modes
         for host in self.hosts_list:
-            print(f"    -> Scanning {host}...")
+            if host not in results: continue
+            ip_address, vulnerabilities = results[host]
+            self.graph.nodes[host]['ip_address'] = ip_address
+            self.graph.nodes[host]['vulnerabilities'].extend(vulnerabilities)
+        self.phase_timings['vuln'] = round(time.perf_counter() - start, 3)
+
+    def _within_budget(self, hosts):
+        """hosts, stopping (and recording the rest in unscanned_hosts) once the deadline has passed."""
+        for i, host in enumerate(hosts):
+            if self.deadline is not None and time.time() >= self.deadline:
+                self.unscanned_hosts = hosts[i:]
+                print(f"[WARN] '{self.profile.name}' time budget exhausted: "
+                      f"{len(self.unscanned_hosts)} hosts left without a vulnerability scan")
+                return
+            yield host
+
+    def _scan_parallel(self, hosts):
+        """
+        Yield (host, result) as hosts finish. The pool is sized for max_workers;
+        how many hosts are actually in flight follows the scheduler's concurrency.
+        """
+        hosts = iter(hosts)
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while True:
+                while len(pending) < self.scheduler.concurrency:
+                    host = next(hosts, None)
+                    if host is None:
+                        break
+                    pending[pool.submit(self._timed_scan_host, host)] = host
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+
+    def _timed_scan_host(self, host, scanner=None):
+        """_scan_host plus its wall time: (ip_address, vulnerabilities, seconds). Feeds the scheduler."""
+        start = time.perf_counter()
+        ip_address, vulnerabilities = self._scan_host(host, scanner)
+        self.scheduler.record(host not in self.failed_hosts)
+        return ip_address, vulnerabilities, time.perf_counter() - start
+
+    def host_status(self, host):
+        """'completed', 'failed' or 'timed_out' for a host whose vuln scan has run."""
+        if host in self.timed_out_hosts:
+            return 'timed_out'
+        return 'failed' if host in self.failed_hosts else 'completed'
+
+    def host_timeout(self):
+        """Seconds one host's vuln scan may take: the profile's limit, capped by the time left."""
+        remaining = self.remaining_budget()
+        if remaining is None:
+            return self.profile.host_timeout
+        # A host started just before the deadline can't run far past it
+        return max(1, min(self.profile.host_timeout, int(remaining)))
+
+    def vuln_scan_args(self, ports=None, host_timeout=None):
+        """nmap arguments for one host's vuln scan: the profile's detection and scripts, the scheduler's timing."""
+        arguments = ' '.join(filter(None, [
+            '-sV', self.profile.version_args, '-Pn', self.scheduler.timing_args(),
+            f'--host-timeout {host_timeout or self.host_timeout()}s', f'--script "{self.profile.scripts}"'
+        ]))
+        if ports:
+            arguments += f' -p {",".join(map(str, ports))}'
+        return arguments
+
+    def _scan_host(self, host, scanner=None):
+        """Run the vuln scan for one host and return (ip_address, vulnerabilities)."""
+        print(f"    -> Scanning {host}...")
+        ip_address = host
+        vulnerabilities = []
+        # Pinned to the ports discovery found open; unknown (None) = nmap's defaults
+        ports = self.open_ports.get(host)
+        if ports is not None and not ports:
+            print(f"    [*] {host}: no open ports found at discovery, skipping vulnerability scripts.")
+            return ip_address, vulnerabilities
+        host_timeout = self.host_timeout()
+        arguments = self.vuln_scan_args(ports, host_timeout)
+        try:
+            if scanner is None:
+                scanner = new_port_scanner()
+            # --- VULCAN CHANGE (pre-existing) ---
             try:
-                # --- VULCAN CHANGE (pre-existing) ---
-                try:
-                    scan_result = self.scanner.scan(host, arguments='-sV -Pn -T4 --script "vuln"')
-                    ip_address = self.scanner[host]['addresses'].get('ipv4', host)
-                    self.graph.nodes[host]['ip_address'] = ip_address
-                    print(f"    [*] Resolved {host} to IP: {ip_address}")
-                except KeyError as ke:
-                     print(f"    [!] Warning: Could not reliably determine IP for {host}. KeyError: {ke}. Using '{host}' as fallback.")
-                     self.graph.nodes[host]['ip_address'] = host
-                except Exception as scan_err:
-                     print(f"    [!] Nmap scan execution failed for {host}: {scan_err}")
-                     self.graph.nodes[host]['ip_address'] = host
+                scan_result = scanner.scan(host, arguments=arguments, timeout=host_timeout + HOST_TIMEOUT_GRACE)
+                ip_address = scanner[host]['addresses'].get('ipv4', host)
+                print(f"    [*] Resolved {host} to IP: {ip_address}")
+            except nmap.PortScannerTimeout:
+                 print(f"    [!] Nmap scan for {host} timed out after {host_timeout + HOST_TIMEOUT_GRACE}s, killed.")
+                 self.timed_out_hosts.add(host)
+                 self.failed_hosts.add(host)
+                 return ip_address, vulnerabilities
+            except KeyError as ke:
+                 print(f"    [!] Warning: Could not reliably determine IP for {host}. KeyError: {ke}. Using '{host}' as fallback.")
+            except Exception as scan_err:
+                 print(f"    [!] Nmap scan execution failed for {host}: {scan_err}")
+                 self.failed_hosts.add(host)
+                 return ip_address, vulnerabilities
+
+            if host not in scanner.all_hosts() or 'tcp' not in scanner[host]:
+                print(f"    [!] No TCP ports found for {host}.")
+                if ports:
+                    # Ports seen open at discovery went missing: dropped probes or --host-timeout
+                    self.failed_hosts.add(host)
+                return ip_address, vulnerabilities
+
+            # --- VULCAN PERF: Cached parser, each port's output parsed once ---
+            vulners_ports = [(port, port_info, parse_vulners_output(port_info['script']['vulners']))
+                             for port, port_info in scanner[host]['tcp'].items()
+                             if 'script' in port_info and 'vulners' in port_info['script']]
+            # --- VULCAN PERF: One batch KEV lookup for every finding on the host ---
+            kev_ids = get_catalog().matches(
+                finding[0] for _, _, parsed in vulners_ports for finding in parsed
+            )
+
+            for port, port_info, parsed in vulners_ports:
+                vulners_output = port_info['script']['vulners']
+                findings = build_findings(parsed, int(port), port_info.get('name', 'unknown'), kev_ids)
+
+                if not findings:
+                     print(f"    [!] Could not parse 'vulners' output for {host}:{port}. Raw:\n{vulners_output}")
                      continue
 
-                if host not in self.scanner.all_hosts() or 'tcp' not in self.scanner[host]:
-                    print(f"    [!] No TCP ports found for {host}.")
-                    continue
-
-                for port in self.scanner[host]['tcp']:
-                    port_info = self.scanner[host]['tcp'][port]
-                    
-                    if 'script' in port_info and 'vulners' in port_info['script']:
-                        vulners_output = port_info['script']['vulners']
-                        vuln_pattern = re.compile(r'^\s*([^\s]+)\s+([0-9.]+)\s+(.+)$', re.MULTILINE)
-                        matches = vuln_pattern.findall(vulners_output)
-
-                        if not matches:
-                             print(f"    [!] Could not parse 'vulners' output for {host}:{port}. Raw:\n{vulners_output}")
-                             continue
-
-                        for match in matches:
-                            cve_id = match[0] 
-                            try:
-                                cvss_score = float(match[1])
-                            except ValueError:
-                                cvss_score = 0.0
-
-                            details_line = match[2]
-                            
-                            severity = "Info"
-                            if cvss_score >= 9.0: severity = "Critical"
-                            elif cvss_score >= 7.0: severity = "High"
-                            elif cvss_score >= 4.0: severity = "Medium"
-                            elif cvss_score > 0: severity = "Low"
-                            
-                            # --- VULCAN ENHANCEMENT: Check against KEV list ---
-                            is_kev = cve_id in KEV_MOCK_LIST
-                            
-                            self.graph.nodes[host]['vulnerabilities'].append({
-                                'cve': cve_id if cve_id.startswith('CVE-') else None, 
-                                'id_from_source': cve_id, 
-                                'cvss_score': cvss_score,
-                                'severity': severity,
-                                'name': details_line,
-                                'details': f"{cve_id} (CVSS: {cvss_score}, KEV: {is_kev}) - {details_line}",
-                                'port': int(port),
-                                'service': port_info.get('name', 'unknown'),
-                                'is_kev': is_kev # Store KEV status
-                            })
-                    # --- END VULNERS CHANGE ---
-                
-                # --- VULCAN FIX: Inject a hypothetical vulnerability for testing ---
-                if self.target_range == 'test-target' and not self.graph.nodes[host]['vulnerabilities']:
-                    print("[*] Injecting a hypothetical vulnerability for testing purposes...")
-                    # Inject a KEV to test the new logic
-                    self.graph.nodes[host]['vulnerabilities'].append({
-                         'cve': 'CVE-2021-44228', # Log4Shell is a real KEV
-                         'id_from_source': 'CVE-2021-44228',
-                         'cvss_score': 10.0,
-                         'severity': 'Critical',
-                         'name': 'Hypothetical KEV RCE Vulnerability (Log4Shell Mock)',
-                         'details': 'This is a simulated critical KEV vulnerability.',
-                         'port': 8080, 
-                         'service': 'http',
-                         'is_kev': True
-                    })
-
-            except Exception as e:
-                print(f"    [!] An error occurred while processing vulnerabilities for {host}: {e}")
-                if 'ip_address' not in self.graph.nodes[host]:
-                    self.graph.nodes[host]['ip_address'] = host 
+                vulnerabilities.extend(findings)
+                # --- END VULNERS CHANGE ---
+            
+            # --- VULCAN FIX: Inject a hypothetical vulnerability for testing ---
+            if self.target_range == 'test-target' and not vulnerabilities:
+                print("[*] Injecting a hypothetical vulnerability for testing purposes...")
+                # Inject a KEV to test the new logic
+                vulnerabilities.append({
+                     'cve': 'CVE-2021-44228', # Log4Shell is a real KEV
+                     'id_from_source': 'CVE-2021-44228',
+                     'cvss_score': 10.0,
+                     'severity': 'Critical',
+                     'name': 'Hypothetical KEV RCE Vulnerability (Log4Shell Mock)',
+                     'details': 'This is a simulated critical KEV vulnerability.',
+                     'port': 8080, 
+                     'service': 'http',
+                     'is_kev': True
+                })
+
+        except Exception as e:
+            print(f"    [!] An error occurred while processing vulnerabilities for {host}: {e}")
+            self.failed_hosts.add(host)
+
+        return ip_address, vulnerabilities
 
     def calculate_risk_weights(self):
+        """
+        Risk-weight every attacker -> host edge in one vectorized pass
+        (scanner.risk). The scores are kept in self.risk_scores.
+        """
         print("\n[*] Calculating risk weights based on CVSS scores and KEV status...")
-        for node in self.graph.nodes():
-            if node == 'attacker': continue
-
-            vulnerabilities = self.graph.nodes[node]['vulnerabilities']
-            highest_cvss = max((vuln.get('cvss_score', 0) for vuln in vulnerabilities), default=0)
-            
-            # --- VULCAN ENHANCEMENT: KEV Criticality Multiplier ---
-            is_kev_present = any(v.get('is_kev', False) for v in vulnerabilities)
-            
-            effective_cvss = highest_cvss
-            
-            if is_kev_present:
-                # If it's a KEV, we dramatically increase its effective CVSS score, 
-                # ensuring the calculated weight (11 - effective_cvss) is minimal.
-                effective_cvss = min(10.5, highest_cvss * 1.2)
-                print(f"    [!] KEV Alert: {node} has exploited vulnerability. Effective CVSS boosted to {effective_cvss:.2f}")
-
-            # Weight calculation: Low score = High Risk/Priority
-            # CVSS 10.0 -> Weight 1.0 (Standard)
-            # KEV+CVSS 9.8 -> Effective CVSS 10.5 -> Weight 0.5 (KEV Priority)
-            # The lowest possible path weight is 0.5
-            weight = max(0.5, 11 - effective_cvss) 
-            self.graph.edges['attacker', node]['weight'] = weight
-            
-            print(f"    -> Host {node} | Highest CVSS: {highest_cvss:.1f} | Risk Weight: {weight:.2f}")
+        scores = score_graph(self.graph)
+        self.risk_scores = scores
+        kev_hosts = int(scores.is_kev.sum())
+        if kev_hosts:
+            print(f"    [!] KEV Alert: {kev_hosts} hosts have exploited vulnerabilities. Effective CVSS boosted.")
+        if scores.hosts:
+            print(f"    -> {len(scores.hosts)} hosts | Highest CVSS: {scores.max_cvss.max():.1f} | "
+                  f"Lowest Risk Weight: {scores.weights.min():.2f}")
+        return scores
     
     # ... (find_attack_path_for_api remains unchanged as the core logic is sound) ...
     # ... (rest of the class implementation from mapper.py) ...
 # ... (rest of the class implementation from mapper.py) ...
 
-    def find_attack_path_for_api(self, crown_jewel):
+    def attack_path_tree(self):
+        """Risk weights, then the shortest-path tree from the attacker (one Dijkstra, cached)."""
+        self.calculate_risk_weights()
+        return shortest_path_tree(self.graph)
+
+    def find_attack_paths(self, targets=None, limit=None, tree=None):
+        """Ranked attack paths to targets (default: every host) from a single Dijkstra run."""
+        if not self.hosts_list:
+            return []
+        return rank_attack_paths(self.graph, tree or self.attack_path_tree(), targets, limit)
+
+    def find_attack_path_for_api(self, crown_jewel, tree=None):
         if not self.hosts_list:
             return {"error": "No hosts were discovered during the scan."}
 
@@ -178,10 +557,12 @@ class NetworkMapper:
                   return {"error": f"Could not determine IP address for crown jewel '{crown_jewel}'. Cannot generate report."}
 
 
-        self.calculate_risk_weights() # Weights are calculated on edges, not directly needing IP here
-
         try:
-            path = nx.shortest_path(self.graph, source='attacker', target=crown_jewel, weight='weight')
+            # Every target's path comes from the same tree; pass it in to reuse it
+            _, predecessors, _ = tree or self.attack_path_tree()
+            path = tree_path(predecessors, crown_jewel)
+            if not path:
+                raise nx.NetworkXNoPath(f"Node {crown_jewel} not reachable from attacker")
 
             report = {
                 "message": "The most likely attack path is: " + " -> ".join(path),
@@ -0,0 +1,161 @@
+"""
+Streaming nmap backend: runs nmap with `-oX -` and parses its XML
+incrementally (ElementTree's pull parser) while the scan is still running.
+
+python-nmap's PortScanner buffers the whole XML document, then builds nested
+dicts for every host before anything can be read. Here each <host> element is
+turned into a compact record as soon as nmap closes it, and the parsed tree is
+cleared right after, so memory is bounded by one host no matter how large the
+range or how much script output it produces.
+
+Records use python-nmap's per-host layout (addresses / status / tcp ->
+port -> state, name, product, version, extrainfo, conf, cpe, script) plus
+nmap's per-host RTT estimate under 'times', minus
+the parts NetworkMapper never reads (hostnames, vendor, uptime, OS matches),
+so either backend can sit behind NetworkMapper.
+"""
+
+import os
+import shlex
+import shutil
+import tempfile
+import threading
+import subprocess
+import xml.etree.ElementTree as ET
+from nmap import PortScannerError, PortScannerTimeout
+
+NMAP_PATH = os.environ.get("NMAP_PATH")
+
+
+def host_record(host_elem, keep_scripts=None):
+    """(host, record) for one parsed <host> element; only scripts in keep_scripts are kept (None = all)."""
+    addresses = {a.get('addrtype'): a.get('addr') for a in host_elem.iterfind('address')}
+    host = addresses.get('ipv4') or next(iter(addresses.values()), None)
+    status = host_elem.find('status')
+    record = {
+        'addresses': addresses,
+        'status': {'state': status.get('state'), 'reason': status.get('reason')} if status is not None else {}
+    }
+    times = host_elem.find('times')
+    if times is not None:
+        # nmap's smoothed RTT, its variance and the probe timeout, in microseconds
+        record['times'] = {k: int(v) for k, v in times.attrib.items() if v.lstrip('-').isdigit()}
+    for port in host_elem.iterfind('ports/port'):
+        state = port.find('state')
+        service = port.find('service')
+        attrs = service.attrib if service is not None else {}
+        info = {
+            'state': state.get('state') if state is not None else '',
+            'reason': state.get('reason') if state is not None else '',
+            'name': attrs.get('name') or '',
+            'product': attrs.get('product') or '',
+            'version': attrs.get('version') or '',
+            'extrainfo': attrs.get('extrainfo') or '',
+            'conf': attrs.get('conf') or '',
+            'cpe': (service.findtext('cpe') if service is not None else None) or ''
+        }
+        scripts = {s.get('id'): s.get('output') for s in port.iterfind('script')
+                   if keep_scripts is None or s.get('id') in keep_scripts}
+        if scripts:
+            info['script'] = scripts
+        record.setdefault(port.get('protocol'), {})[int(port.get('portid'))] = info
+    return host, record
+
+
+def parse_hosts(source, keep_scripts=None, chunk_size=65536):
+    """
+    Yield (host, record) per <host> from nmap XML read incrementally from a
+    binary file object. read1() is used where available, so on a pipe each
+    host is parsed as soon as nmap writes it rather than once a full chunk
+    has arrived. Raises ET.ParseError if the document is cut short.
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    read = getattr(source, 'read1', source.read)
+    root = None
+    while True:
+        chunk = read(chunk_size)
+        if chunk:
+            parser.feed(chunk)
+        else:
+            parser.close()
+        for event, elem in parser.read_events():
+            if root is None:
+                root = elem  # <nmaprun>
+            elif event == 'end' and elem.tag == 'host':
+                host, record = host_record(elem, keep_scripts)
+                # Drop everything parsed so far; only the next host is ever in memory
+                root.clear()
+                if host is not None:
+                    yield host, record
+        if not chunk:
+            return
+
+
+class StreamingPortScanner:
+    """
+    Drop-in for the parts of nmap.PortScanner that NetworkMapper uses
+    (scan / all_hosts / [host]), plus iter_scan() to consume hosts as nmap
+    finishes them. keep_scripts limits which NSE outputs are retained.
+    """
+
+    def __init__(self, nmap_path=None, keep_scripts=None):
+        self.nmap_path = nmap_path or NMAP_PATH or shutil.which('nmap')
+        if not self.nmap_path:
+            raise PortScannerError("nmap program was not found in path")
+        self.keep_scripts = set(keep_scripts) if keep_scripts else None
+        self._hosts = {}
+
+    def iter_scan(self, hosts, arguments='', timeout=None):
+        """
+        Yield (host, record) while nmap runs. Closing the generator early
+        kills nmap. Raises PortScannerTimeout after timeout seconds and
+        PortScannerError if nmap fails.
+        """
+        args = [self.nmap_path, '-oX', '-'] + shlex.split(hosts) + shlex.split(arguments)
+        timed_out = threading.Event()
+        # stderr goes to a file so a chatty nmap can never block on a full pipe
+        with tempfile.TemporaryFile() as stderr:
+            proc = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=stderr)
+            timer = None
+            if timeout:
+                timer = threading.Timer(timeout, lambda: (timed_out.set(), proc.kill()))
+                timer.daemon = True
+                timer.start()
+            finished = False
+            try:
+                yield from parse_hosts(proc.stdout, self.keep_scripts)
+                finished = True
+            except ET.ParseError as parse_err:
+                if timed_out.is_set():
+                    raise PortScannerTimeout("Timeout from nmap process")
+                proc.wait()
+                stderr.seek(0)
+                raise PortScannerError(stderr.read().decode(errors='replace').strip() or str(parse_err))
+            finally:
+                if timer is not None:
+                    timer.cancel()
+                # Stopped early (consumer closed us, or an error): don't leave nmap running
+                if not finished and proc.poll() is None:
+                    proc.kill()
+                proc.wait()
+                proc.stdout.close()
+            if timed_out.is_set():
+                raise PortScannerTimeout("Timeout from nmap process")
+            if proc.returncode != 0:
+                stderr.seek(0)
+                raise PortScannerError(stderr.read().decode(errors='replace').strip()
+                                       or f"nmap exited with status {proc.returncode}")
+
+    def scan(self, hosts='127.0.0.1', arguments='', timeout=None):
+        """Blocking scan; results are kept (compactly) for all_hosts() / [host]."""
+        self._hosts = dict(self.iter_scan(hosts, arguments, timeout))
+        return {'scan': self._hosts}
+
+    def all_hosts(self):
+        return sorted(self._hosts)
+
+    def has_host(self, host):
+        return host in self._hosts
+
+    def __getitem__(self, host):
+        return self._hosts[host]
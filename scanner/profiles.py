@@ -0,0 +1,62 @@
+"""
+Scan profiles: what each scan_type means in concrete nmap terms.
+
+A profile fixes the discovery port set, the service-detection intensity, the
+NSE scripts run per host, the starting timing template, the host
+concurrency ceiling and a time budget the scan task enforces. The adaptive
+scheduler (scanner.scheduler) starts from these values and backs off when a
+network can't keep up.
+"""
+
+import os
+from collections import namedtuple
+
+# Discovery sweep size of the default profile (the old fixed -F / top-100 sweep)
+DISCOVERY_TOP_PORTS = int(os.environ.get("DISCOVERY_TOP_PORTS", "100"))
+
+ScanProfile = namedtuple('ScanProfile', [
+    'name',
+    'top_ports',      # discovery sweep: --top-ports N, or None for every port (-p-)
+    'version_args',   # service detection intensity for the vuln scan
+    'scripts',        # --script expression for the vuln scan
+    'timing',         # starting -T template; the scheduler may lower it
+    'max_workers',    # hosts vuln-scanned at once, at most
+    'host_timeout',   # seconds one host's vuln scan may take (--host-timeout)
+    'time_budget',    # seconds the whole scan may take
+])
+
+PROFILES = {
+    # vulners is the only script whose output NetworkMapper reads
+    'quick': ScanProfile('quick', top_ports=100, version_args='--version-light', scripts='vulners',
+                         timing=4, max_workers=16, host_timeout=180, time_budget=15 * 60),
+    # What every scan did before profiles existed
+    'standard': ScanProfile('standard', top_ports=DISCOVERY_TOP_PORTS, version_args='', scripts='vuln',
+                            timing=4, max_workers=8, host_timeout=900, time_budget=60 * 60),
+    'deep': ScanProfile('deep', top_ports=None, version_args='--version-all', scripts='vuln',
+                        timing=3, max_workers=4, host_timeout=3600, time_budget=4 * 60 * 60),
+}
+DEFAULT_PROFILE = 'standard'
+
+# scan_type values already stored on scans rows or sent by the frontend
+PROFILE_ALIASES = {
+    'local': DEFAULT_PROFILE,
+    'vulnerability_scan': DEFAULT_PROFILE,
+    'full': 'deep',
+}
+
+
+class ScanBudgetExceeded(Exception):
+    """The profile's time budget ran out before host discovery finished."""
+
+
+def get_profile(scan_type=None):
+    """The profile for a scan_type; unknown or missing types get the default profile."""
+    name = PROFILE_ALIASES.get(scan_type, scan_type) or DEFAULT_PROFILE
+    if name not in PROFILES:
+        print(f"[WARN] Unknown scan type '{scan_type}', using the '{DEFAULT_PROFILE}' profile")
+        name = DEFAULT_PROFILE
+    return PROFILES[name]
+
+
+def discovery_port_args(profile):
+    return f'--top-ports {profile.top_ports}' if profile.top_ports else '-p-'
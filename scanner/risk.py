@@ -0,0 +1,67 @@
+"""
+Vectorized risk scoring for attack-path graphs.
+
+Hosts are laid out as flat arrays (highest CVSS, KEV flag) and the KEV boost,
+edge weights and 0-10 risk scores are computed for the whole graph in one
+numpy pass instead of a Python loop per host. Hosts that still embed their
+findings are reduced to a per-host maximum with one segmented max over a
+flat array of every finding's CVSS.
+"""
+
+from collections import namedtuple
+import numpy as np
+
+# --- VULCAN ENHANCEMENT: KEV Criticality Multiplier ---
+# A KEV's effective CVSS is boosted so its path weight (11 - effective_cvss)
+# becomes minimal: KEV+CVSS 9.8 -> effective 10.5 -> weight 0.5.
+KEV_CVSS_MULTIPLIER = 1.2
+KEV_MAX_EFFECTIVE_CVSS = 10.5
+MIN_EDGE_WEIGHT = 0.5
+MAX_RISK_SCORE = 10.0
+
+RiskScores = namedtuple('RiskScores', 'hosts max_cvss is_kev effective_cvss weights risk_score')
+
+
+def host_arrays(attrs):
+    """(max_cvss, is_kev) arrays from a list of host node attribute dicts, from embedded findings or the summary."""
+    count = len(attrs)
+    max_cvss = np.fromiter((a.get('max_cvss') or 0 for a in attrs), dtype=np.float64, count=count)
+    is_kev = np.fromiter((bool(a.get('is_kev')) for a in attrs), dtype=bool, count=count)
+
+    findings = [a.get('vulnerabilities') or () for a in attrs]
+    per_host = np.fromiter(map(len, findings), dtype=np.int64, count=count)
+    if per_host.any():
+        cvss = np.fromiter((v.get('cvss_score') or 0 for f in findings for v in f), dtype=np.float64)
+        kev = np.fromiter((bool(v.get('is_kev')) for f in findings for v in f), dtype=bool)
+        has_findings = per_host > 0
+        starts = np.concatenate(([0], np.cumsum(per_host)[:-1]))[has_findings]
+        # Embedded findings replace the summary's max, as the per-node loop did
+        max_cvss[has_findings] = np.maximum.reduceat(cvss, starts)
+        is_kev[has_findings] |= np.logical_or.reduceat(kev, starts)
+    return max_cvss, is_kev
+
+
+def score(max_cvss, is_kev):
+    """(effective_cvss, edge weights, risk_score) for flat host arrays."""
+    effective = np.where(is_kev, np.minimum(KEV_MAX_EFFECTIVE_CVSS, max_cvss * KEV_CVSS_MULTIPLIER), max_cvss)
+    # Low weight = high risk; the lowest possible path weight is 0.5
+    weights = np.maximum(MIN_EDGE_WEIGHT, 11 - effective)
+    risk_score = np.round(np.minimum(MAX_RISK_SCORE, effective), 1)
+    return effective, weights, risk_score
+
+
+def score_graph(graph, source='attacker'):
+    """Score every host adjacent to source and set the source -> host edge weights."""
+    # Plain dicts: networkx's views cost more per lookup than the scoring itself
+    edges = dict(graph.adj[source]) if source in graph else {}
+    hosts, attrs = [], []
+    for node, data in graph.nodes(data=True):
+        if node != source and node in edges:
+            hosts.append(node)
+            attrs.append(data)
+    max_cvss, is_kev = host_arrays(attrs)
+    effective, weights, risk_score = score(max_cvss, is_kev)
+    # Undirected edges share one data dict, so this sets both directions
+    for host, weight in zip(hosts, weights.tolist()):
+        edges[host]['weight'] = weight
+    return RiskScores(hosts, max_cvss, is_kev, effective, weights, risk_score)
@@ -0,0 +1,90 @@
+"""
+Adaptive scheduler for per-host vulnerability scans.
+
+Starts from a scan profile's host concurrency and timing template and adjusts
+both from what the scan observes:
+
+- RTT: nmap reports a smoothed RTT and its variance per host (<times> in the
+  XML). The 95th percentile of srtt + 4 * rttvar across discovered hosts sets
+  --initial-rtt-timeout / --max-rtt-timeout, so probes to a fast LAN aren't
+  held to WAN timeouts and probes to a slow link aren't given up on early.
+- Errors: a host whose scan fails or comes back without its known-open ports
+  counts as an error. Past BACKOFF_ERROR_RATE over the recent window the
+  concurrency is halved, the timing template drops one level and the RTT
+  timeouts grow; each clean window adds one host back, up to the ceiling
+  (additive increase, multiplicative decrease).
+"""
+
+import threading
+from collections import deque
+
+ERROR_WINDOW = 20
+BACKOFF_ERROR_RATE = 0.2
+# Never back off below this many samples, nor below -T2 (polite)
+MIN_SAMPLES = 4
+MIN_TIMING = 2
+INITIAL_RTT_MS = (100, 1000)
+# Floors match -T5, nmap's most aggressive template
+MAX_RTT_MS = (300, 3000)
+RTT_BACKOFF = 1.5
+
+
+def _clamp(value, bounds):
+    return int(min(bounds[1], max(bounds[0], value)))
+
+
+class AdaptiveScheduler:
+    def __init__(self, profile, max_workers=None, state=None):
+        self.profile = profile
+        self.max_workers = max(1, int(max_workers or profile.max_workers))
+        self.concurrency = self.max_workers
+        self.timing = profile.timing
+        self.rtt_ms = None  # p95 of srtt + 4 * rttvar, once observed
+        self._window = deque(maxlen=ERROR_WINDOW)
+        self._lock = threading.Lock()
+        if state:
+            # Carried over from the task that ran discovery (e.g. into a chunk subtask)
+            self.concurrency = max(1, min(self.max_workers, int(state.get('concurrency', self.concurrency))))
+            self.timing = max(MIN_TIMING, min(profile.timing, int(state.get('timing', self.timing))))
+            self.rtt_ms = state.get('rtt_ms')
+
+    def observe_rtt(self, times):
+        """Set the RTT timeouts from nmap <times> dicts (microseconds), one per host."""
+        timeouts = sorted(t['srtt'] + 4 * t.get('rttvar', 0) for t in times if t and t.get('srtt', -1) > 0)
+        if not timeouts:
+            return
+        self.rtt_ms = timeouts[int(0.95 * (len(timeouts) - 1))] / 1000
+        print(f"    [*] Scheduler: p95 RTT timeout {self.rtt_ms:.0f}ms over {len(timeouts)} hosts")
+
+    def record(self, ok):
+        """Feed back one finished host; adjusts concurrency and timing."""
+        with self._lock:
+            self._window.append(not ok)
+            errors = sum(self._window)
+            if len(self._window) >= MIN_SAMPLES and errors / len(self._window) > BACKOFF_ERROR_RATE:
+                before = (self.concurrency, self.timing)
+                self.concurrency = max(1, self.concurrency // 2)
+                self.timing = max(MIN_TIMING, self.timing - 1)
+                if self.rtt_ms:
+                    self.rtt_ms *= RTT_BACKOFF
+                print(f"    [!] Scheduler: {errors}/{len(self._window)} recent hosts failed -> "
+                      f"concurrency {before[0]}->{self.concurrency}, -T{before[1]}->-T{self.timing}")
+                self._window.clear()
+            elif not errors and len(self._window) >= max(self.concurrency, MIN_SAMPLES) and (
+                    self.concurrency < self.max_workers or self.timing < self.profile.timing):
+                self.concurrency = min(self.max_workers, self.concurrency + 1)
+                self.timing = min(self.profile.timing, self.timing + 1)
+                print(f"    [*] Scheduler: clean window -> concurrency {self.concurrency}, -T{self.timing}")
+                self._window.clear()
+
+    def timing_args(self):
+        """-T template plus RTT timeouts; explicit timeouts come after -T so they take precedence."""
+        args = f'-T{self.timing}'
+        if self.rtt_ms:
+            args += (f' --initial-rtt-timeout {_clamp(self.rtt_ms, INITIAL_RTT_MS)}ms'
+                     f' --max-rtt-timeout {_clamp(self.rtt_ms * 3, MAX_RTT_MS)}ms')
+        return args
+
+    def state(self):
+        return {'concurrency': self.concurrency, 'timing': self.timing,
+                'rtt_ms': round(self.rtt_ms, 1) if self.rtt_ms else None}
@@ -0,0 +1,99 @@
+"""
+Parser for the output of nmap's `vulners` NSE script.
+
+Identical service banners across a fleet produce byte-identical script
+output, so parsed results are cached by the raw text. Only the
+banner-dependent part is cached, as plain tuples; port, service, KEV status
+and the details string are applied per call, so a cached entry is valid for
+any host that produced the same output. Outputs shorter than
+VULNERS_CACHE_MIN_CHARS are parsed directly: for a few lines the parse is
+as cheap as the lookup.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+# One finding per line: "<id> <cvss> <details...>". Whitespace is matched
+# with [ \t] so a match can never run across lines.
+VULNERS_LINE = re.compile(r'^[ \t]*([^\s]+)[ \t]+([0-9.]+)[ \t]+(.+)$', re.MULTILINE)
+
+VULNERS_CACHE_SIZE = 4096
+VULNERS_CACHE_MIN_CHARS = 512
+
+_parsed = OrderedDict()  # raw output -> tuple of (source_id, cvss_score, severity, cve, name)
+_parsed_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def severity_for(cvss_score):
+    if cvss_score >= 9.0: return "Critical"
+    if cvss_score >= 7.0: return "High"
+    if cvss_score >= 4.0: return "Medium"
+    if cvss_score > 0: return "Low"
+    return "Info"
+
+
+def _parse(output):
+    findings = []
+    for source_id, score, name in VULNERS_LINE.findall(output):
+        try:
+            cvss_score = float(score)
+        except ValueError:
+            cvss_score = 0.0
+        findings.append((source_id, cvss_score, severity_for(cvss_score),
+                         source_id if source_id.startswith('CVE-') else None, name))
+    return tuple(findings)
+
+
+def parse_vulners_output(output):
+    """
+    Parsed findings for one script output: a tuple of
+    (source_id, cvss_score, severity, cve, name). Cached unless the output is short.
+    """
+    if VULNERS_CACHE_SIZE <= 0 or len(output) < VULNERS_CACHE_MIN_CHARS:
+        return _parse(output)
+    with _parsed_lock:
+        findings = _parsed.get(output)
+        if findings is not None:
+            _parsed.move_to_end(output)
+            _stats["hits"] += 1
+            return findings
+        _stats["misses"] += 1
+
+    findings = _parse(output)
+    with _parsed_lock:
+        _parsed[output] = findings
+        while len(_parsed) > VULNERS_CACHE_SIZE:
+            _parsed.popitem(last=False)
+    return findings
+
+
+def build_findings(parsed, port, service, kev_ids=()):
+    """Vulnerability dicts (NetworkMapper's format) from parse_vulners_output()'s result."""
+    vulnerabilities = []
+    for source_id, cvss_score, severity, cve, name in parsed:
+        is_kev = source_id in kev_ids
+        vulnerabilities.append({
+            'cve': cve,
+            'id_from_source': source_id,
+            'cvss_score': cvss_score,
+            'severity': severity,
+            'name': name,
+            'details': f"{source_id} (CVSS: {cvss_score}, KEV: {is_kev}) - {name}",
+            'port': port,
+            'service': service,
+            'is_kev': is_kev
+        })
+    return vulnerabilities
+
+
+def cache_info():
+    with _parsed_lock:
+        return {"entries": len(_parsed), **_stats}
+
+
+def clear_cache():
+    with _parsed_lock:
+        _parsed.clear()
+        _stats.update(hits=0, misses=0)
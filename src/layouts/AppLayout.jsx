@@ -87,22 +87,15 @@ const AppLayout = () => {
   }, [user, navigate, userProfile]);  // ✅ Remove selectedWorkspace from dependencies
 
 
-  // Effect to poll for scan results
+  // Effect to follow scan progress (pushed by the server, no polling)
   useEffect(() => {
     if (!scanTaskId) return;
 
-    console.log(`[AppLayout] Starting polling for task ID: ${scanTaskId}`);
-
-    const pollInterval = setInterval(async () => {
-      console.log(`[AppLayout] Polling results for task ID: ${scanTaskId}`);
-
-      try {
-        const data = await scannerApiService.getScanResults(scanTaskId);
-        console.log(`[AppLayout] Poll response for ${scanTaskId}:`, data);
+    console.log(`[AppLayout] Subscribing to events for task ID: ${scanTaskId}`);
 
+    const source = scannerApiService.streamScanResults(scanTaskId, (data) => {
         if (data.state === 'SUCCESS') {
           console.log(`[AppLayout] Task ${scanTaskId} SUCCESS. Worker saved all data.`);
-          clearInterval(pollInterval);
           
           // Worker already saved all data via service role client (tasks.py lines 171-172)
           // No need to call /complete endpoint or save data manually
@@ -118,27 +111,20 @@ const AppLayout = () => {
           fetchWorkspaces();
         } else if (data.state === 'FAILURE') {
           console.error(`[AppLayout] Task ${scanTaskId} FAILURE. Info:`, data.status);
-          clearInterval(pollInterval);
           setScanStatusMessage('Scan failed.');
           setScanError(data.status || 'An unknown error occurred during the scan.');
           setIsScanning(false);
           setScanTaskId(null);
+        } else if (data.hosts_total) {
+          setScanStatusMessage(`Scan in progress... (${data.hosts_completed}/${data.hosts_total} hosts)`);
         } else {
           setScanStatusMessage(`Scan in progress... (State: ${data.state})`);
         }
-      } catch (err) {
-        console.error(`[AppLayout] Error polling results for task ${scanTaskId}:`, err);
-        clearInterval(pollInterval);
-        setScanError(`Failed to get scan results: ${err.message}`);
-        showToast('error', `Failed to get scan results: ${err.message}`);
-        setIsScanning(false);
-        setScanTaskId(null);
-      }
-    }, 5000);
+    });
 
     return () => {
-      console.log(`[AppLayout] Clearing poll interval for task ID: ${scanTaskId}`);
-      clearInterval(pollInterval);
+      console.log(`[AppLayout] Closing event stream for task ID: ${scanTaskId}`);
+      source.close();
     };
   }, [scanTaskId, scanId, selectedWorkspace, session]);
 
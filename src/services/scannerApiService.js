@@ -125,5 +125,33 @@ export const scannerApiService = {
         console.error(`[scannerApiService] Error during getScanResults fetch for task ${taskId}:`, error);
         throw error; // Re-throw
     }
+  },
+
+  /**
+   * Subscribes to live status/progress events for a task (Server-Sent Events).
+   * Each event has the same shape as getScanResults(); the stream closes
+   * itself after a SUCCESS or FAILURE event.
+   * @param {string} taskId The ID of the task to follow.
+   * @param {(data: object) => void} onEvent Called for every event.
+   * @returns {EventSource} Call close() to stop listening.
+   */
+  streamScanResults(taskId, onEvent) {
+    console.log(`[scannerApiService] Opening event stream for task ID: ${taskId}`);
+    const source = new EventSource(`${API_URL}/results/${taskId}/stream`);
+
+    source.onmessage = (message) => {
+      const data = JSON.parse(message.data);
+      console.log(`[scannerApiService] Event for task ${taskId}:`, data);
+      if (data.state === 'SUCCESS' || data.state === 'FAILURE') {
+        source.close();
+      }
+      onEvent(data);
+    };
+    source.onerror = () => {
+      // EventSource reconnects on its own; the first event after that is a fresh snapshot
+      console.warn(`[scannerApiService] Event stream for task ${taskId} interrupted, reconnecting...`);
+    };
+
+    return source;
   }
 };
\ No newline at end of file
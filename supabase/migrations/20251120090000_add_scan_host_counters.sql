@@ -0,0 +1,9 @@
+-- Migration: Add per-host progress counters to scans
+-- Location: supabase/migrations/20251120090000_add_scan_host_counters.sql
+
+ALTER TABLE public.scans
+ADD COLUMN IF NOT EXISTS hosts_total INTEGER DEFAULT 0,
+ADD COLUMN IF NOT EXISTS hosts_completed INTEGER DEFAULT 0;
+
+COMMENT ON COLUMN public.scans.hosts_total IS 'Number of hosts found during discovery.';
+COMMENT ON COLUMN public.scans.hosts_completed IS 'Number of hosts whose vulnerability scan has finished; drives scans.progress.';
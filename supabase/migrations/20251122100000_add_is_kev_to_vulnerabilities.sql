@@ -0,0 +1,10 @@
+-- Migration: Persist KEV status on vulnerabilities
+-- Location: supabase/migrations/20251122100000_add_is_kev_to_vulnerabilities.sql
+
+ALTER TABLE public.vulnerabilities
+ADD COLUMN IF NOT EXISTS is_kev BOOLEAN DEFAULT false;
+
+COMMENT ON COLUMN public.vulnerabilities.is_kev IS 'True when the CVE is in the CISA Known Exploited Vulnerabilities catalog; used for attack path weighting.';
+
+-- Attack path analysis aggregates open findings per asset
+CREATE INDEX IF NOT EXISTS idx_vulnerabilities_asset_open ON public.vulnerabilities(asset_id) WHERE status = 'open';
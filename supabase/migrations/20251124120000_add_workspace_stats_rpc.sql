@@ -0,0 +1,31 @@
+-- Migration: Single-round-trip workspace stats for the dashboard
+-- Location: supabase/migrations/20251124120000_add_workspace_stats_rpc.sql
+
+-- SECURITY INVOKER: runs as the calling user, so RLS still scopes every
+-- count. A user without access to the workspace gets all zeros.
+CREATE OR REPLACE FUNCTION public.get_workspace_stats(p_workspace_id UUID)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+SECURITY INVOKER
+AS $$
+  SELECT jsonb_build_object(
+    'totalAssets', a.total,
+    'totalVulnerabilities', v.total,
+    'criticalVulns', v.critical,
+    'activeScans', s.active,
+    'riskScore', ROUND(COALESCE(a.avg_risk, 0), 1)
+  )
+  FROM
+    (SELECT COUNT(*) AS total, AVG(COALESCE(risk_score, 0)) AS avg_risk
+       FROM public.assets WHERE workspace_id = p_workspace_id) a,
+    (SELECT COUNT(*) AS total,
+            COUNT(*) FILTER (WHERE severity = 'Critical' AND status = 'open') AS critical
+       FROM public.vulnerabilities WHERE workspace_id = p_workspace_id) v,
+    (SELECT COUNT(*) AS active
+       FROM public.scans WHERE workspace_id = p_workspace_id AND status IN ('running', 'scheduled')) s;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.get_workspace_stats(UUID) TO authenticated;
+
+COMMENT ON FUNCTION public.get_workspace_stats IS 'Dashboard stats for one workspace in a single query (RLS enforced)';
@@ -0,0 +1,266 @@
+-- Migration: Incrementally maintained per-workspace dashboard counters
+-- Location: supabase/migrations/20251126090000_add_workspace_stats_table.sql
+
+-- 1. Summary table (one row per workspace)
+CREATE TABLE IF NOT EXISTS public.workspace_stats (
+    workspace_id UUID PRIMARY KEY REFERENCES public.workspaces(id) ON DELETE CASCADE,
+    total_assets INTEGER NOT NULL DEFAULT 0,
+    total_vulnerabilities INTEGER NOT NULL DEFAULT 0,
+    open_critical INTEGER NOT NULL DEFAULT 0,
+    open_high INTEGER NOT NULL DEFAULT 0,
+    open_medium INTEGER NOT NULL DEFAULT 0,
+    open_low INTEGER NOT NULL DEFAULT 0,
+    open_info INTEGER NOT NULL DEFAULT 0,
+    active_scans INTEGER NOT NULL DEFAULT 0,
+    risk_score_sum NUMERIC NOT NULL DEFAULT 0,
+    risk_score_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE public.workspace_stats ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "workspace_members_view_stats" ON public.workspace_stats;
+CREATE POLICY "workspace_members_view_stats"
+ON public.workspace_stats
+FOR SELECT
+TO authenticated
+USING (public.is_workspace_member(workspace_id));
+
+-- 2. Statement-level delta triggers
+-- Each statement folds its transition tables into one signed delta per
+-- workspace, so a bulk ingest of N rows costs one upsert, not N.
+-- SECURITY DEFINER: users changing a vulnerability status through RLS
+-- have no write access to workspace_stats themselves.
+
+-- Returns the upsert that folds this statement's transition tables
+-- (new_rows with sign +1, old_rows with sign -1) into workspace_stats.
+-- p_projection maps a row r and its sign s onto the counter columns.
+-- The trigger must EXECUTE it itself: transition tables are only visible
+-- inside the trigger function.
+CREATE OR REPLACE FUNCTION public.workspace_stats_delta_sql(p_op TEXT, p_projection TEXT)
+RETURNS TEXT
+IMMUTABLE
+LANGUAGE sql
+AS $$
+  SELECT format($f$
+    INSERT INTO public.workspace_stats AS ws (
+        workspace_id, total_assets, total_vulnerabilities,
+        open_critical, open_high, open_medium, open_low, open_info,
+        active_scans, risk_score_sum, risk_score_count, updated_at
+    )
+    SELECT d.workspace_id,
+           SUM(d.total_assets), SUM(d.total_vulnerabilities),
+           SUM(d.open_critical), SUM(d.open_high), SUM(d.open_medium), SUM(d.open_low), SUM(d.open_info),
+           SUM(d.active_scans), SUM(d.risk_score_sum), SUM(d.risk_score_count), CURRENT_TIMESTAMP
+    FROM (%s) d
+    -- Workspaces deleted in this statement (cascade) are skipped
+    WHERE EXISTS (SELECT 1 FROM public.workspaces w WHERE w.id = d.workspace_id)
+    GROUP BY d.workspace_id
+    HAVING SUM(ABS(d.total_assets)) + SUM(ABS(d.total_vulnerabilities)) + SUM(ABS(d.active_scans)) <> 0
+        OR SUM(d.open_critical) <> 0 OR SUM(d.open_high) <> 0 OR SUM(d.open_medium) <> 0
+        OR SUM(d.open_low) <> 0 OR SUM(d.open_info) <> 0 OR SUM(d.risk_score_sum) <> 0
+    ON CONFLICT (workspace_id) DO UPDATE SET
+        total_assets = ws.total_assets + EXCLUDED.total_assets,
+        total_vulnerabilities = ws.total_vulnerabilities + EXCLUDED.total_vulnerabilities,
+        open_critical = ws.open_critical + EXCLUDED.open_critical,
+        open_high = ws.open_high + EXCLUDED.open_high,
+        open_medium = ws.open_medium + EXCLUDED.open_medium,
+        open_low = ws.open_low + EXCLUDED.open_low,
+        open_info = ws.open_info + EXCLUDED.open_info,
+        active_scans = ws.active_scans + EXCLUDED.active_scans,
+        risk_score_sum = ws.risk_score_sum + EXCLUDED.risk_score_sum,
+        risk_score_count = ws.risk_score_count + EXCLUDED.risk_score_count,
+        updated_at = EXCLUDED.updated_at;
+  $f$, CASE p_op
+    WHEN 'INSERT' THEN format('SELECT %s FROM new_rows r, (SELECT 1 AS sign) s', p_projection)
+    WHEN 'DELETE' THEN format('SELECT %s FROM old_rows r, (SELECT -1 AS sign) s', p_projection)
+    ELSE format('SELECT %1$s FROM new_rows r, (SELECT 1 AS sign) s UNION ALL SELECT %1$s FROM old_rows r, (SELECT -1 AS sign) s', p_projection)
+  END);
+$$;
+
+CREATE OR REPLACE FUNCTION public.workspace_stats_vulnerabilities_trigger()
+RETURNS TRIGGER
+SECURITY DEFINER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  EXECUTE public.workspace_stats_delta_sql(TG_OP, $p$
+    r.workspace_id,
+    0 AS total_assets,
+    s.sign AS total_vulnerabilities,
+    CASE WHEN r.status = 'open' AND r.severity = 'Critical' THEN s.sign ELSE 0 END AS open_critical,
+    CASE WHEN r.status = 'open' AND r.severity = 'High' THEN s.sign ELSE 0 END AS open_high,
+    CASE WHEN r.status = 'open' AND r.severity = 'Medium' THEN s.sign ELSE 0 END AS open_medium,
+    CASE WHEN r.status = 'open' AND r.severity = 'Low' THEN s.sign ELSE 0 END AS open_low,
+    CASE WHEN r.status = 'open' AND r.severity = 'Info' THEN s.sign ELSE 0 END AS open_info,
+    0 AS active_scans,
+    0::NUMERIC AS risk_score_sum,
+    0 AS risk_score_count
+  $p$);
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.workspace_stats_assets_trigger()
+RETURNS TRIGGER
+SECURITY DEFINER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  EXECUTE public.workspace_stats_delta_sql(TG_OP, $p$
+    r.workspace_id,
+    s.sign AS total_assets,
+    0 AS total_vulnerabilities,
+    0 AS open_critical, 0 AS open_high, 0 AS open_medium, 0 AS open_low, 0 AS open_info,
+    0 AS active_scans,
+    s.sign * COALESCE(r.risk_score, 0) AS risk_score_sum,
+    s.sign AS risk_score_count
+  $p$);
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.workspace_stats_scans_trigger()
+RETURNS TRIGGER
+SECURITY DEFINER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  EXECUTE public.workspace_stats_delta_sql(TG_OP, $p$
+    r.workspace_id,
+    0 AS total_assets,
+    0 AS total_vulnerabilities,
+    0 AS open_critical, 0 AS open_high, 0 AS open_medium, 0 AS open_low, 0 AS open_info,
+    CASE WHEN r.status IN ('running', 'scheduled') THEN s.sign ELSE 0 END AS active_scans,
+    0::NUMERIC AS risk_score_sum,
+    0 AS risk_score_count
+  $p$);
+  RETURN NULL;
+END;
+$$;
+
+-- Transition tables allow only one event per trigger, hence three per table
+DROP TRIGGER IF EXISTS workspace_stats_vulns_ins ON public.vulnerabilities;
+DROP TRIGGER IF EXISTS workspace_stats_vulns_upd ON public.vulnerabilities;
+DROP TRIGGER IF EXISTS workspace_stats_vulns_del ON public.vulnerabilities;
+CREATE TRIGGER workspace_stats_vulns_ins AFTER INSERT ON public.vulnerabilities
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.workspace_stats_vulnerabilities_trigger();
+CREATE TRIGGER workspace_stats_vulns_upd AFTER UPDATE ON public.vulnerabilities
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.workspace_stats_vulnerabilities_trigger();
+CREATE TRIGGER workspace_stats_vulns_del AFTER DELETE ON public.vulnerabilities
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.workspace_stats_vulnerabilities_trigger();
+
+DROP TRIGGER IF EXISTS workspace_stats_assets_ins ON public.assets;
+DROP TRIGGER IF EXISTS workspace_stats_assets_upd ON public.assets;
+DROP TRIGGER IF EXISTS workspace_stats_assets_del ON public.assets;
+CREATE TRIGGER workspace_stats_assets_ins AFTER INSERT ON public.assets
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.workspace_stats_assets_trigger();
+CREATE TRIGGER workspace_stats_assets_upd AFTER UPDATE ON public.assets
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.workspace_stats_assets_trigger();
+CREATE TRIGGER workspace_stats_assets_del AFTER DELETE ON public.assets
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.workspace_stats_assets_trigger();
+
+DROP TRIGGER IF EXISTS workspace_stats_scans_ins ON public.scans;
+DROP TRIGGER IF EXISTS workspace_stats_scans_upd ON public.scans;
+DROP TRIGGER IF EXISTS workspace_stats_scans_del ON public.scans;
+CREATE TRIGGER workspace_stats_scans_ins AFTER INSERT ON public.scans
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.workspace_stats_scans_trigger();
+CREATE TRIGGER workspace_stats_scans_upd AFTER UPDATE ON public.scans
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.workspace_stats_scans_trigger();
+CREATE TRIGGER workspace_stats_scans_del AFTER DELETE ON public.scans
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.workspace_stats_scans_trigger();
+
+-- 3. Reconciliation: rebuild from base tables (all workspaces when NULL)
+CREATE OR REPLACE FUNCTION public.rebuild_workspace_stats(p_workspace_id UUID DEFAULT NULL)
+RETURNS INTEGER
+SECURITY DEFINER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  rebuilt INTEGER;
+BEGIN
+  INSERT INTO public.workspace_stats AS ws (
+      workspace_id, total_assets, total_vulnerabilities,
+      open_critical, open_high, open_medium, open_low, open_info,
+      active_scans, risk_score_sum, risk_score_count, updated_at
+  )
+  SELECT w.id,
+         COALESCE(a.total, 0), COALESCE(v.total, 0),
+         COALESCE(v.critical, 0), COALESCE(v.high, 0), COALESCE(v.medium, 0), COALESCE(v.low, 0), COALESCE(v.info, 0),
+         COALESCE(s.active, 0), COALESCE(a.risk_sum, 0), COALESCE(a.total, 0), CURRENT_TIMESTAMP
+  FROM public.workspaces w
+  LEFT JOIN (
+    SELECT workspace_id, COUNT(*) AS total, SUM(COALESCE(risk_score, 0)) AS risk_sum
+    FROM public.assets GROUP BY workspace_id
+  ) a ON a.workspace_id = w.id
+  LEFT JOIN (
+    SELECT workspace_id, COUNT(*) AS total,
+           COUNT(*) FILTER (WHERE status = 'open' AND severity = 'Critical') AS critical,
+           COUNT(*) FILTER (WHERE status = 'open' AND severity = 'High') AS high,
+           COUNT(*) FILTER (WHERE status = 'open' AND severity = 'Medium') AS medium,
+           COUNT(*) FILTER (WHERE status = 'open' AND severity = 'Low') AS low,
+           COUNT(*) FILTER (WHERE status = 'open' AND severity = 'Info') AS info
+    FROM public.vulnerabilities GROUP BY workspace_id
+  ) v ON v.workspace_id = w.id
+  LEFT JOIN (
+    SELECT workspace_id, COUNT(*) AS active
+    FROM public.scans WHERE status IN ('running', 'scheduled') GROUP BY workspace_id
+  ) s ON s.workspace_id = w.id
+  WHERE p_workspace_id IS NULL OR w.id = p_workspace_id
+  ON CONFLICT (workspace_id) DO UPDATE SET
+      total_assets = EXCLUDED.total_assets,
+      total_vulnerabilities = EXCLUDED.total_vulnerabilities,
+      open_critical = EXCLUDED.open_critical,
+      open_high = EXCLUDED.open_high,
+      open_medium = EXCLUDED.open_medium,
+      open_low = EXCLUDED.open_low,
+      open_info = EXCLUDED.open_info,
+      active_scans = EXCLUDED.active_scans,
+      risk_score_sum = EXCLUDED.risk_score_sum,
+      risk_score_count = EXCLUDED.risk_score_count,
+      updated_at = EXCLUDED.updated_at;
+  GET DIAGNOSTICS rebuilt = ROW_COUNT;
+  RETURN rebuilt;
+END;
+$$;
+
+-- 4. Stats RPC now reads only the summary row
+CREATE OR REPLACE FUNCTION public.get_workspace_stats(p_workspace_id UUID)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+SECURITY INVOKER
+AS $$
+  SELECT jsonb_build_object(
+    'totalAssets', COALESCE(MAX(ws.total_assets), 0),
+    'totalVulnerabilities', COALESCE(MAX(ws.total_vulnerabilities), 0),
+    'criticalVulns', COALESCE(MAX(ws.open_critical), 0),
+    'openBySeverity', jsonb_build_object(
+      'Critical', COALESCE(MAX(ws.open_critical), 0),
+      'High', COALESCE(MAX(ws.open_high), 0),
+      'Medium', COALESCE(MAX(ws.open_medium), 0),
+      'Low', COALESCE(MAX(ws.open_low), 0),
+      'Info', COALESCE(MAX(ws.open_info), 0)
+    ),
+    'activeScans', COALESCE(MAX(ws.active_scans), 0),
+    'riskScore', ROUND(COALESCE(MAX(ws.risk_score_sum) / NULLIF(MAX(ws.risk_score_count), 0), 0), 1)
+  )
+  FROM public.workspace_stats ws
+  WHERE ws.workspace_id = p_workspace_id;
+$$;
+
+-- 5. Backfill existing workspaces
+SELECT public.rebuild_workspace_stats();
+
+GRANT SELECT ON public.workspace_stats TO authenticated;
+
+COMMENT ON TABLE public.workspace_stats IS 'Per-workspace dashboard counters, maintained by statement-level triggers; rebuild with rebuild_workspace_stats()';
@@ -0,0 +1,9 @@
+-- Migration: Indexes backing keyset pagination on /api/assets and /api/vulnerabilities
+-- Location: supabase/migrations/20251128100000_add_keyset_pagination_indexes.sql
+
+-- Match ORDER BY <sort> DESC NULLS LAST, id DESC within one workspace
+CREATE INDEX IF NOT EXISTS idx_vulnerabilities_workspace_cvss_keyset
+ON public.vulnerabilities (workspace_id, cvss_score DESC NULLS LAST, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_assets_workspace_risk_keyset
+ON public.assets (workspace_id, risk_score DESC NULLS LAST, id DESC);
@@ -0,0 +1,13 @@
+-- Migration: Service fingerprints for incremental rescans
+-- Location: supabase/migrations/20251130090000_add_incremental_rescan_columns.sql
+
+-- Hash of open ports + service versions as of the asset's last full vuln scan,
+-- and how long that scan took (used to report time saved by skipping it)
+ALTER TABLE public.assets
+ADD COLUMN IF NOT EXISTS service_fingerprint TEXT,
+ADD COLUMN IF NOT EXISTS vuln_scan_seconds REAL;
+
+-- Per-scan summary of hosts whose fingerprint was unchanged
+ALTER TABLE public.scans
+ADD COLUMN IF NOT EXISTS hosts_skipped INTEGER NOT NULL DEFAULT 0,
+ADD COLUMN IF NOT EXISTS seconds_saved REAL NOT NULL DEFAULT 0;
@@ -0,0 +1,8 @@
+-- Migration: Compact scans.graph_data format
+-- Location: supabase/migrations/20251202090000_compact_graph_data.sql
+
+COMMENT ON COLUMN public.scans.graph_data IS 'Attack path graph in the compact-v1 format (scanner/compact_graph.py), optionally zlib-compressed; older rows hold networkx node-link JSON.';
+
+-- Nothing queries inside graph_data, and a jsonb_ops GIN index re-indexes every
+-- key and value of the document on each write
+DROP INDEX IF EXISTS public.idx_scans_graph_data;
@@ -0,0 +1,9 @@
+-- Migration: Per-phase timings for tiered discovery
+-- Location: supabase/migrations/20251204090000_add_scan_phase_timings.sql
+
+-- Seconds spent in each scan phase, e.g.
+-- {"liveness": 2.1, "ports": 14.8, "fingerprint": 9.3, "vuln": 412.0, "analysis": 0.4}
+ALTER TABLE public.scans
+ADD COLUMN IF NOT EXISTS phase_timings JSONB NOT NULL DEFAULT '{}'::jsonb;
+
+COMMENT ON COLUMN public.scans.phase_timings IS 'Seconds per scan phase (liveness, ports, fingerprint, vuln, analysis); written by the worker.';
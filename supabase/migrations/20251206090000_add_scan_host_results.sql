@@ -0,0 +1,27 @@
+-- Migration: Per-host scan checkpoints
+-- Location: supabase/migrations/20251206090000_add_scan_host_results.sql
+
+-- One row per host a scan has finished with, written in the same transaction
+-- as the host's findings. A retried scan task skips the hosts recorded here
+-- ('completed' / 'unchanged') and only rescans the rest.
+CREATE TABLE IF NOT EXISTS public.scan_host_results (
+    scan_id UUID NOT NULL REFERENCES public.scans(id) ON DELETE CASCADE,
+    hostname TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'completed'
+        CHECK (status IN ('completed', 'unchanged', 'failed', 'timed_out')),
+    scan_seconds REAL,
+    finished_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (scan_id, hostname)
+);
+
+ALTER TABLE public.scan_host_results ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "workspace_members_view_scan_host_results" ON public.scan_host_results;
+CREATE POLICY "workspace_members_view_scan_host_results"
+ON public.scan_host_results
+FOR SELECT
+TO authenticated
+USING (EXISTS (
+    SELECT 1 FROM public.scans s
+    WHERE s.id = scan_host_results.scan_id AND public.is_workspace_member(s.workspace_id)
+));
@@ -0,0 +1,66 @@
+-- Migration: Lock down workspace_stats functions; skip net-zero trigger deltas
+-- Location: supabase/migrations/20251208090000_harden_workspace_stats_functions.sql
+
+-- 1. Only net changes touch workspace_stats
+-- An UPDATE folds its old rows (-1) and new rows (+1) into the delta; when
+-- nothing counted changed they cancel out, and the statement must not take
+-- the workspace_stats row lock for it. (Previously the absolute row counts
+-- were compared, which is nonzero for every UPDATE.)
+CREATE OR REPLACE FUNCTION public.workspace_stats_delta_sql(p_op TEXT, p_projection TEXT)
+RETURNS TEXT
+IMMUTABLE
+LANGUAGE sql
+AS $$
+  SELECT format($f$
+    INSERT INTO public.workspace_stats AS ws (
+        workspace_id, total_assets, total_vulnerabilities,
+        open_critical, open_high, open_medium, open_low, open_info,
+        active_scans, risk_score_sum, risk_score_count, updated_at
+    )
+    SELECT d.workspace_id,
+           SUM(d.total_assets), SUM(d.total_vulnerabilities),
+           SUM(d.open_critical), SUM(d.open_high), SUM(d.open_medium), SUM(d.open_low), SUM(d.open_info),
+           SUM(d.active_scans), SUM(d.risk_score_sum), SUM(d.risk_score_count), CURRENT_TIMESTAMP
+    FROM (%s) d
+    -- Workspaces deleted in this statement (cascade) are skipped
+    WHERE EXISTS (SELECT 1 FROM public.workspaces w WHERE w.id = d.workspace_id)
+    GROUP BY d.workspace_id
+    HAVING SUM(d.total_assets) <> 0 OR SUM(d.total_vulnerabilities) <> 0 OR SUM(d.active_scans) <> 0
+        OR SUM(d.open_critical) <> 0 OR SUM(d.open_high) <> 0 OR SUM(d.open_medium) <> 0
+        OR SUM(d.open_low) <> 0 OR SUM(d.open_info) <> 0
+        OR SUM(d.risk_score_sum) <> 0 OR SUM(d.risk_score_count) <> 0
+    ON CONFLICT (workspace_id) DO UPDATE SET
+        total_assets = ws.total_assets + EXCLUDED.total_assets,
+        total_vulnerabilities = ws.total_vulnerabilities + EXCLUDED.total_vulnerabilities,
+        open_critical = ws.open_critical + EXCLUDED.open_critical,
+        open_high = ws.open_high + EXCLUDED.open_high,
+        open_medium = ws.open_medium + EXCLUDED.open_medium,
+        open_low = ws.open_low + EXCLUDED.open_low,
+        open_info = ws.open_info + EXCLUDED.open_info,
+        active_scans = ws.active_scans + EXCLUDED.active_scans,
+        risk_score_sum = ws.risk_score_sum + EXCLUDED.risk_score_sum,
+        risk_score_count = ws.risk_score_count + EXCLUDED.risk_score_count,
+        updated_at = EXCLUDED.updated_at;
+  $f$, CASE p_op
+    WHEN 'INSERT' THEN format('SELECT %s FROM new_rows r, (SELECT 1 AS sign) s', p_projection)
+    WHEN 'DELETE' THEN format('SELECT %s FROM old_rows r, (SELECT -1 AS sign) s', p_projection)
+    ELSE format('SELECT %1$s FROM new_rows r, (SELECT 1 AS sign) s UNION ALL SELECT %1$s FROM old_rows r, (SELECT -1 AS sign) s', p_projection)
+  END);
+$$;
+
+-- 2. SECURITY DEFINER functions are not callable through the API
+-- Functions are executable by PUBLIC by default, which would let any
+-- anon/authenticated client rebuild every workspace's stats as the owner.
+-- Triggers still fire for everyone: EXECUTE is only checked when a trigger
+-- is created, not when it fires.
+REVOKE EXECUTE ON FUNCTION public.rebuild_workspace_stats(UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.rebuild_workspace_stats(UUID) TO service_role;
+
+REVOKE EXECUTE ON FUNCTION public.workspace_stats_delta_sql(TEXT, TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.workspace_stats_vulnerabilities_trigger() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.workspace_stats_assets_trigger() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.workspace_stats_scans_trigger() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.workspace_stats_delta_sql(TEXT, TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION public.workspace_stats_vulnerabilities_trigger() TO service_role;
+GRANT EXECUTE ON FUNCTION public.workspace_stats_assets_trigger() TO service_role;
+GRANT EXECUTE ON FUNCTION public.workspace_stats_scans_trigger() TO service_role;
@@ -4,11 +4,18 @@ Celery Tasks for Vappler Security Scanner
 Handles asynchronous vulnerability scanning and attack path analysis
 """
 
-import requests, os, traceback, psycopg2, json, datetime
+import requests, os, traceback, psycopg2, json, datetime, ipaddress, time, uuid
 import psycopg2.extras
+import psycopg2.pool
+import redis
+from contextlib import contextmanager
 import networkx as nx
-from celery import Celery
+from celery import Celery, chord, group
 from scanner.mapper import NetworkMapper
+from scanner.profiles import get_profile, ScanBudgetExceeded
+from scanner.checkpoint import checkpoint_store
+from scanner.compact_graph import to_compact, load_graph
+from scanner.kev import KEV_CATALOG_PATH, KEV_FEED_URL, write_catalog, reload_catalog
 from jinja2 import Environment, FileSystemLoader
 from weasyprint import HTML
 
@@ -29,28 +36,195 @@ celery_app.conf.update(
     task_acks_late=True,
     worker_prefetch_multiplier=1,
 )
+# Run with `celery ... worker -B` (or a separate beat) to keep the KEV catalog
+# fresh and to correct any drift in the trigger-maintained workspace_stats
+celery_app.conf.beat_schedule = {
+    'sync-kev-catalog': {
+        'task': 'tasks.sync_kev_catalog',
+        'schedule': float(os.environ.get("KEV_SYNC_SECONDS", "86400")),
+    },
+    'reconcile-workspace-stats': {
+        'task': 'tasks.reconcile_workspace_stats',
+        'schedule': float(os.environ.get("WORKSPACE_STATS_RECONCILE_SECONDS", "86400")),
+    },
+}
 
 DATABASE_URL = os.environ.get("DATABASE_URL")
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_KEY")
+REDIS_URL = os.environ.get("REDIS_URL", "redis://vappler-redis:6379/0")
+# Most hosts NetworkMapper scans concurrently (1 = sequential); a scan
+# profile's own max_workers can only lower it
+SCAN_HOST_CONCURRENCY = int(os.environ.get("SCAN_HOST_CONCURRENCY", "8"))
+# Targets with more discovered hosts than this are split into chunk subtasks
+SCAN_CHUNK_SIZE = int(os.environ.get("SCAN_CHUNK_SIZE", "32"))
+# Max vulnerability rows per multi-row INSERT during ingestion
+INGEST_PAGE_SIZE = int(os.environ.get("INGEST_PAGE_SIZE", "5000"))
+# ScanResultStream commits finished hosts in batches of up to this many hosts,
+# or sooner once STREAM_BATCH_SECONDS have passed since its last commit
+STREAM_BATCH_HOSTS = int(os.environ.get("STREAM_BATCH_HOSTS", "16"))
+STREAM_BATCH_SECONDS = float(os.environ.get("STREAM_BATCH_SECONDS", "2"))
+# Max pooled Postgres connections per worker process
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "4"))
+# Pooled connections idle for longer than this are pinged before reuse
+DB_POOL_PING_AFTER = float(os.environ.get("DB_POOL_PING_AFTER", "30"))
+# zlib-compress scans.graph_data (smaller rows, CPU to decode on read)
+GRAPH_DATA_COMPRESSION = os.environ.get("GRAPH_DATA_COMPRESSION", "false").lower() in ("1", "true", "yes")
+# Ranked attack paths returned in the scan result (the full tree is in graph_data)
+ATTACK_PATH_RANK_LIMIT = int(os.environ.get("ATTACK_PATH_RANK_LIMIT", "10"))
+# Seconds before a failed scan task is retried (resuming from its checkpoints)
+SCAN_RETRY_COUNTDOWN = int(os.environ.get("SCAN_RETRY_COUNTDOWN", "120"))
+# scan_host_results statuses a resumed scan does not scan again
+FINISHED_HOST_STATUSES = ('completed', 'unchanged')
 
 # --- Setup Jinja2 templating ---
 template_env = Environment(loader=FileSystemLoader('app/templates'))
 
 
+# --- Process-level DB pool and PostgREST session ---
+# Both are created lazily on first use, so the prefork parent never opens
+# sockets that its children would inherit.
+_db_pool = None
+_http_session = None
+_inherited_from_parent = []
+# id(pooled connection) -> monotonic time it was last returned to the pool
+_db_conn_released = {}
+
+
+def get_db_pool():
+    global _db_pool
+    if _db_pool is None:
+        _db_pool = psycopg2.pool.ThreadedConnectionPool(1, DB_POOL_MAX, DATABASE_URL)
+    return _db_pool
+
+
+def acquire_db_conn():
+    """
+    Check a live connection out of the pool. Closed connections are dropped,
+    and one idle for over DB_POOL_PING_AFTER seconds must answer SELECT 1
+    first, so a Postgres restart or an idle timeout on the server costs a
+    reconnect instead of failing the task that happens to draw it.
+    """
+    pool = get_db_pool()
+    for _ in range(DB_POOL_MAX + 1):
+        conn = pool.getconn()
+        released = _db_conn_released.pop(id(conn), None)
+        if not conn.closed:
+            if released is None or time.monotonic() - released < DB_POOL_PING_AFTER:
+                return conn
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1;")
+                conn.rollback()
+                return conn
+            except psycopg2.Error as e:
+                print(f"[WARN] Discarding dead pooled connection: {e}")
+        pool.putconn(conn, close=True)
+    raise psycopg2.OperationalError("No live database connection in the pool")
+
+
+def release_db_conn(conn):
+    """Return a connection to the pool; broken ones are closed instead of handed to the next task"""
+    if not conn.closed:
+        _db_conn_released[id(conn)] = time.monotonic()
+    get_db_pool().putconn(conn, close=bool(conn.closed))
+
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled connection; rolled back on error and always returned to the pool"""
+    conn = acquire_db_conn()
+    try:
+        yield conn
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        release_db_conn(conn)
+
+
+def get_http_session():
+    global _http_session
+    if _http_session is None:
+        _http_session = requests.Session()
+        _http_session.headers.update({
+            "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
+            "apikey": SUPABASE_SERVICE_KEY,
+            "Content-Type": "application/json"
+        })
+    return _http_session
+
+
+def _reset_after_fork():
+    """Give a forked child its own pool and session."""
+    global _db_pool, _http_session
+    # Keep the inherited objects referenced: if they were garbage collected
+    # here, libpq would send a terminate message over the parent's sockets.
+    if _db_pool is not None or _http_session is not None:
+        _inherited_from_parent.append((_db_pool, _http_session))
+    _db_pool = None
+    _http_session = None
+    _db_conn_released.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+# --- Dashboard response cache (shared with api.py) ---
+# Cached responses live under a per-workspace generation number. Bumping the
+# generation invalidates every cached response for that workspace at once;
+# the stale keys simply expire.
+RESPONSE_CACHE_PREFIX = "vappler:cache"
+_redis_client = None
+
+
+def get_redis():
+    # redis-py's connection pool notices a fork and reconnects by itself
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(REDIS_URL, socket_timeout=1, socket_connect_timeout=1)
+    return _redis_client
+
+
+def cache_generation_key(workspace_id):
+    return f"{RESPONSE_CACHE_PREFIX}:{workspace_id}:gen"
+
+
+# --- Task progress events (consumed by /results/<task_id>/stream) ---
+TASK_EVENTS_PREFIX = "vappler:events"
+
+
+def task_events_channel(task_id):
+    return f"{TASK_EVENTS_PREFIX}:{task_id}"
+
+
+def publish_task_event(task_id, state, **fields):
+    """Publish a state/progress event for a task's subscribers. Never fails the caller."""
+    if not task_id:
+        return
+    try:
+        get_redis().publish(task_events_channel(task_id), json.dumps({"state": state, **fields}, default=str))
+    except Exception as e:
+        print(f"[WARN] Could not publish event for task {task_id}: {e}")
+
+
+def invalidate_workspace_cache(workspace_id):
+    """Drop all cached dashboard responses for a workspace. Never fails the caller."""
+    try:
+        get_redis().incr(cache_generation_key(workspace_id))
+        print(f"[*] Invalidated dashboard cache for workspace {workspace_id}")
+    except Exception as e:
+        print(f"[WARN] Could not invalidate dashboard cache for workspace {workspace_id}: {e}")
+
 
 def update_scan_status(scan_id, status, error_message=None, graph_data=None): # <-- MODIFIED
-    """Update scan record status in Supabase via PostgREST (requests is fine for this)"""
+    """Update scan record status in Supabase via PostgREST (shared keep-alive session)"""
     if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
         print(f"[WARN] Cannot update scan status: Missing Supabase config")
         return
     
     url = f"{SUPABASE_URL}/rest/v1/scans?id=eq.{scan_id}"
-    headers = {
-        "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-        "apikey": SUPABASE_SERVICE_KEY,
-        "Content-Type": "application/json"
-    }
     
     update_data = {"status": status}
     if error_message:
@@ -66,7 +240,7 @@ def update_scan_status(scan_id, status, error_message=None, graph_data=None): #
         update_data["completed_at"] = "now()"
     
     try:
-        resp = requests.patch(url, json=update_data, headers=headers, timeout=10)
+        resp = get_http_session().patch(url, json=update_data, timeout=10)
         if resp.status_code == 200 or resp.status_code == 204:
             print(f"[*] Updated scan {scan_id} status to '{status}'")
         else:
@@ -85,159 +259,795 @@ def map_severity(severity_str):
     if lower == 'low': return 'Low'
     return 'Info'
 
+def _bump_scan_progress(cursor, scan_id, hosts_completed):
+    """Returns the scan's (hosts_completed, hosts_total) after the bump"""
+    cursor.execute(
+        """
+        UPDATE public.scans SET
+            hosts_completed = hosts_completed + %s,
+            progress = LEAST(100, ((hosts_completed + %s) * 100) / GREATEST(hosts_total, 1))
+        WHERE id = %s
+        RETURNING hosts_completed, hosts_total;
+        """, (hosts_completed, hosts_completed, scan_id)
+    )
+    return cursor.fetchone()
+
+
+def checkpoint_hosts(cursor, scan_id, rows):
+    """
+    Record finished hosts [(hostname, status, scan_seconds)] in scan_host_results,
+    inside the caller's transaction (the one that saves their results).
+    Returns how many hosts were new to this scan; a host finished again on
+    resume (e.g. failed, then rescanned) only has its row updated.
+    """
+    if not rows:
+        return 0
+    inserted = psycopg2.extras.execute_values(cursor, """
+        INSERT INTO public.scan_host_results (scan_id, hostname, status, scan_seconds)
+        VALUES %s
+        ON CONFLICT (scan_id, hostname) DO UPDATE SET
+            status = EXCLUDED.status,
+            scan_seconds = EXCLUDED.scan_seconds,
+            finished_at = now()
+        RETURNING (xmax = 0);
+        """, [(scan_id, host, status, seconds) for host, status, seconds in rows],
+        template="(%s::uuid, %s, %s, %s::real)", page_size=len(rows), fetch=True)
+    return sum(1 for (new,) in inserted if new)
+
+
+# --- Scan checkpoints (scanner.checkpoint), for resuming a redelivered or retried task ---
+def get_checkpoint_store():
+    return checkpoint_store(get_redis())
+
+
+def load_scan_checkpoint(scan_id):
+    """
+    (discovery state or None, {hostname: (status, scan_seconds)}) for what this
+    scan has already done. The checkpoint store answers first; without an
+    entry there (expired, or the store was unavailable) finished hosts come
+    from scan_host_results.
+    """
+    discovery, hosts = None, {}
+    try:
+        discovery, hosts = get_checkpoint_store().load(scan_id)
+    except Exception as e:
+        print(f"[WARN] Could not read checkpoint for scan {scan_id}: {e}")
+    if not hosts:
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT hostname, status, scan_seconds FROM public.scan_host_results WHERE scan_id = %s;",
+                    (scan_id,)
+                )
+                hosts = {host: (status, seconds) for host, status, seconds in cursor.fetchall()}
+    return discovery, {host: (status, seconds or 0) for host, (status, seconds) in hosts.items()}
+
+
+def save_discovery_checkpoint(scan_id, mapper, deadline, dispatched=None):
+    """
+    Checkpoint discovery results and the scan deadline; dispatched is the
+    aggregate task id once the scan is handed to a chord. Never fails the caller.
+    """
+    state = {**mapper.discovery_state(), "deadline": deadline}
+    if dispatched:
+        state["dispatched"] = dispatched
+    try:
+        get_checkpoint_store().save_discovery(scan_id, state)
+    except Exception as e:
+        print(f"[WARN] Could not checkpoint discovery for scan {scan_id}: {e}")
+
+
+def mark_hosts_checkpoint(scan_id, rows):
+    """Mark committed hosts [(hostname, status, scan_seconds)] as finished. Never fails the caller."""
+    try:
+        get_checkpoint_store().mark_hosts(scan_id, rows)
+    except Exception as e:
+        print(f"[WARN] Could not checkpoint hosts for scan {scan_id}: {e}")
+
+
+def clear_scan_checkpoint(scan_id):
+    try:
+        get_checkpoint_store().clear(scan_id)
+    except Exception as e:
+        print(f"[WARN] Could not clear checkpoint for scan {scan_id}: {e}")
+
+
+def update_scan_progress(scan_id, hosts_completed=0, hosts_total=None):
+    """Atomically bump the scan's host counters and derived progress percentage"""
+    try:
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                if hosts_total is not None:
+                    cursor.execute(
+                        "UPDATE public.scans SET hosts_total = %s, hosts_completed = 0, progress = 0 WHERE id = %s;",
+                        (hosts_total, scan_id)
+                    )
+                if hosts_completed:
+                    _bump_scan_progress(cursor, scan_id, hosts_completed)
+            conn.commit()
+    except Exception as e:
+        print(f"[WARN] Could not update progress for scan {scan_id}: {e}")
+
+
+def save_phase_timings(scan_id, phase_timings):
+    """Merge {phase: seconds} into scans.phase_timings (a phase recorded again is overwritten)"""
+    if not phase_timings:
+        return
+    try:
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "UPDATE public.scans SET phase_timings = phase_timings || %s::jsonb WHERE id = %s;",
+                    (json.dumps(phase_timings), scan_id)
+                )
+            conn.commit()
+    except Exception as e:
+        print(f"[WARN] Could not save phase timings for scan {scan_id}: {e}")
+
+
+def bulk_save_hosts(cursor, scan_id, workspace_id, host_list):
+    """
+    Set-based upsert of many hosts inside the caller's transaction.
+    One multi-row statement upserts every asset and returns the ids in bulk;
+    vulnerabilities are then joined to those assets by IP in SQL, so no
+    per-host round trip is needed. Returns (assets_saved, vulns_saved).
+    """
+    # Deduplicate by IP: one statement cannot upsert the same row twice
+    assets = {}
+    for host_data in host_list:
+        ip = host_data.get("ip_address")
+        try:
+            ip = str(ipaddress.ip_address(ip))
+        except ValueError:
+            print(f"[!!!] Skipping host {host_data.get('host')}: '{ip}' is not a valid IP address")
+            continue
+        assets[ip] = host_data
+    if not assets:
+        return 0, 0
+
+    # A host without a fingerprint or discovered ports (failed or legacy scan)
+    # keeps the stored ones
+    sql_upsert_assets = """
+    INSERT INTO public.assets (workspace_id, ip_address, hostname, is_active, last_scan_at,
+                               service_fingerprint, vuln_scan_seconds, open_ports)
+    VALUES %s
+    ON CONFLICT (workspace_id, ip_address) DO UPDATE SET
+        hostname = EXCLUDED.hostname,
+        is_active = EXCLUDED.is_active,
+        last_scan_at = EXCLUDED.last_scan_at,
+        service_fingerprint = COALESCE(EXCLUDED.service_fingerprint, assets.service_fingerprint),
+        vuln_scan_seconds = COALESCE(EXCLUDED.vuln_scan_seconds, assets.vuln_scan_seconds),
+        open_ports = COALESCE(EXCLUDED.open_ports, assets.open_ports)
+    RETURNING id, host(ip_address);
+    """
+    asset_ids = dict((ip, asset_id) for asset_id, ip in psycopg2.extras.execute_values(
+        cursor, sql_upsert_assets,
+        [(workspace_id, ip, h.get("host"), True, h.get("fingerprint"), h.get("scan_seconds"), h.get("open_ports"))
+         for ip, h in assets.items()],
+        template="(%s, %s::inet, %s, %s, now(), %s, %s::real, %s::integer[])",
+        page_size=len(assets),
+        fetch=True
+    ))
+
+    vuln_payloads = []
+    for ip, host_data in assets.items():
+        for vuln in host_data.get("vulnerabilities", []):
+            vuln_payloads.append((
+                asset_ids[ip],
+                vuln.get("cve"),
+                vuln.get("name"),
+                vuln.get("details"),
+                map_severity(vuln.get("severity")),
+                vuln.get("cvss_score"),
+                vuln.get("port"),
+                vuln.get("service"),
+                bool(vuln.get("is_kev"))
+            ))
+
+    if vuln_payloads:
+        # DISTINCT ON guards against duplicate findings within one batch
+        sql_upsert_vulns = """
+        INSERT INTO public.vulnerabilities (
+            workspace_id, asset_id, scan_id, cve_id, title, description,
+            severity, cvss_score, status, port, service, discovered_at, is_kev
+        )
+        SELECT DISTINCT ON (v.asset_id, v.title, v.port)
+            %s::uuid, v.asset_id, %s::uuid, v.cve_id, v.title, v.description,
+            v.severity::public.severity_level, v.cvss_score, 'open'::public.vulnerability_status,
+            v.port, v.service, now(), v.is_kev
+        FROM (VALUES %%s) AS v(asset_id, cve_id, title, description, severity, cvss_score, port, service, is_kev)
+        ON CONFLICT (asset_id, title, port) DO UPDATE SET
+            description = EXCLUDED.description,
+            severity = EXCLUDED.severity,
+            cvss_score = EXCLUDED.cvss_score,
+            status = 'open',
+            discovered_at = EXCLUDED.discovered_at,
+            is_kev = EXCLUDED.is_kev;
+        """
+        sql_upsert_vulns = cursor.mogrify(sql_upsert_vulns, (workspace_id, scan_id)).decode()
+        for i in range(0, len(vuln_payloads), INGEST_PAGE_SIZE):
+            psycopg2.extras.execute_values(
+                cursor, sql_upsert_vulns, vuln_payloads[i:i + INGEST_PAGE_SIZE],
+                template="(%s::uuid, %s, %s, %s, %s, %s::numeric, %s::integer, %s, %s::boolean)",
+                page_size=INGEST_PAGE_SIZE
+            )
+
+    # Duplicates collapse into one row each, as DISTINCT ON does
+    return len(asset_ids), len({(v[0], v[2], v[6]) for v in vuln_payloads})
+
+
+def carry_forward_unchanged_hosts(scan_id, workspace_id, fingerprints):
+    """
+    Incremental rescans: assets whose stored fingerprint matches this scan's
+    are marked as seen, count as completed, and keep their existing findings.
+    Returns {host: seconds its last full vuln scan took} for the skipped hosts.
+    """
+    # Assets are unique per (workspace_id, ip_address): match on the address
+    hosts_by_ip = {}
+    for host in fingerprints:
+        try:
+            hosts_by_ip[str(ipaddress.ip_address(host))] = host
+        except ValueError:
+            continue
+    if not hosts_by_ip:
+        return {}
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            sql_mark_unchanged = cursor.mogrify("""
+            UPDATE public.assets a SET last_scan_at = now(), is_active = true
+            FROM (VALUES %%s) AS f(ip_address, fingerprint)
+            WHERE a.workspace_id = %s
+              AND a.ip_address = f.ip_address::inet
+              AND a.service_fingerprint = f.fingerprint
+            RETURNING host(a.ip_address), COALESCE(a.vuln_scan_seconds, 0);
+            """, (workspace_id,)).decode()
+            unchanged = {hosts_by_ip[ip]: seconds for ip, seconds in psycopg2.extras.execute_values(
+                cursor, sql_mark_unchanged, [(ip, fingerprints[h]) for ip, h in hosts_by_ip.items()],
+                page_size=len(hosts_by_ip), fetch=True
+            )}
+            if unchanged:
+                # Added to, not set: a resumed scan only passes hosts it hasn't finished yet
+                cursor.execute(
+                    "UPDATE public.scans SET hosts_skipped = hosts_skipped + %s, "
+                    "seconds_saved = seconds_saved + %s WHERE id = %s;",
+                    (len(unchanged), sum(unchanged.values()), scan_id)
+                )
+                new = checkpoint_hosts(cursor, scan_id, [(h, 'unchanged', s) for h, s in unchanged.items()])
+                _bump_scan_progress(cursor, scan_id, new)
+        conn.commit()
+    mark_hosts_checkpoint(scan_id, [(h, 'unchanged', s) for h, s in unchanged.items()])
+    if unchanged:
+        print(f"[✓] Incremental: {len(unchanged)} unchanged hosts skipped "
+              f"(~{sum(unchanged.values()):.0f}s of vulnerability scanning saved)")
+    return unchanged
+
+
+class ScanResultStream:
+    """
+    Persists hosts while NetworkMapper is still scanning the rest.
+    Pass write() as find_vulnerabilities(on_host_complete=...). Finished hosts
+    are buffered and flushed every STREAM_BATCH_HOSTS hosts, or at the next
+    host once STREAM_BATCH_SECONDS have passed since the last flush, and on
+    close(). Each flush is one bulk_save_hosts call, one scan_host_results
+    checkpoint and one progress bump, committed together, so a retry never
+    loses or repeats a committed host; a worker killed mid-batch only rescans
+    the buffered hosts. Holds one pooled connection until close(). With a
+    task_id, each flush is also published as a PROGRESS event for that
+    task's stream subscribers.
+    """
+
+    def __init__(self, scan_id, workspace_id, task_id=None, batch_hosts=None, batch_seconds=None):
+        self.scan_id = scan_id
+        self.workspace_id = workspace_id
+        self.task_id = task_id
+        self.batch_hosts = batch_hosts or STREAM_BATCH_HOSTS
+        self.batch_seconds = STREAM_BATCH_SECONDS if batch_seconds is None else batch_seconds
+        self.assets_saved = 0
+        self.vulns_saved = 0
+        self.pending = []
+        self.last_flush = time.monotonic()
+        self.conn = acquire_db_conn()
+
+    def write(self, host_data):
+        self.pending.append(host_data)
+        if (len(self.pending) >= self.batch_hosts
+                or time.monotonic() - self.last_flush >= self.batch_seconds):
+            self.flush()
+
+    def flush(self):
+        batch, self.pending = self.pending, []
+        self.last_flush = time.monotonic()
+        if batch and not self._save(batch) and len(batch) > 1:
+            # One bad host must not cost the rest of the batch
+            print(f"[!] Batch of {len(batch)} hosts failed to save, retrying host by host")
+            for host_data in batch:
+                self._save([host_data])
+
+    def _save(self, batch):
+        try:
+            with self.conn.cursor() as cursor:
+                assets, vulns = bulk_save_hosts(cursor, self.scan_id, self.workspace_id, batch)
+                rows = [(h.get("host"), h.get("status", "completed"), h.get("scan_seconds")) for h in batch]
+                new = checkpoint_hosts(cursor, self.scan_id, rows)
+                progress = _bump_scan_progress(cursor, self.scan_id, new) if new else None
+        except Exception as save_err:
+            self.conn.rollback()
+            print(f"[!!!] Failed to save data for hosts {', '.join(str(h.get('ip_address')) for h in batch)}: "
+                  f"{save_err}")
+            traceback.print_exc()
+            return False
+        self.conn.commit()
+        mark_hosts_checkpoint(self.scan_id, rows)
+        self.assets_saved += assets
+        self.vulns_saved += vulns
+        if progress:
+            publish_task_event(self.task_id, "PROGRESS", scan_id=self.scan_id, host=batch[-1].get("host"),
+                               hosts_completed=progress[0], hosts_total=progress[1])
+        return True
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            release_db_conn(self.conn)
+        print(f"[✓] Streamed {self.assets_saved} assets and {self.vulns_saved} vulnerabilities")
+
+
+def save_risk_scores(cursor, workspace_id, graph, scores):
+    """
+    Write scanner.risk scores back to assets.risk_score in one statement.
+    Rows whose score is unchanged are not touched, so the workspace_stats
+    triggers only see real changes. Returns the number of assets updated.
+    """
+    nodes = graph.nodes
+    rows = [(nodes[h]['asset_id'], risk) for h, risk in zip(scores.hosts, scores.risk_score.tolist())
+            if nodes[h].get('asset_id')]
+    if not rows:
+        return 0
+    sql_update_risk = cursor.mogrify("""
+    UPDATE public.assets a SET risk_score = r.risk_score::numeric(3,1)
+    FROM (VALUES %%s) AS r(id, risk_score)
+    WHERE a.id = r.id::uuid AND a.workspace_id = %s
+      AND a.risk_score IS DISTINCT FROM r.risk_score::numeric(3,1)
+    RETURNING a.id;
+    """, (workspace_id,)).decode()
+    updated = psycopg2.extras.execute_values(cursor, sql_update_risk, rows, page_size=len(rows), fetch=True)
+    print(f"[✓] Risk scores: {len(updated)} of {len(rows)} assets changed")
+    return len(updated)
+
+
+def build_attack_path(cursor, target, workspace_id, hosts, crown_jewels=None):
+    """
+    Attack path analysis over already-stored findings.
+    One aggregate query yields a risk summary per asset, so this is cheap and
+    independent of what was ingested. A single Dijkstra run gives the path to
+    the first crown jewel plus ranked paths to every crown jewel (to every
+    asset if none are configured). Asset risk scores are written back on
+    the same cursor; the caller commits. Returns (mapper, result, tree).
+    """
+    # Assets are unique per (workspace_id, ip_address); scanned hosts are nmap's
+    # address keys, so match on the address rather than the stored hostname
+    ips = {}
+    for host in hosts:
+        try:
+            ips[str(ipaddress.ip_address(host))] = host
+        except ValueError:
+            continue
+    cursor.execute(
+        """
+        SELECT host(a.ip_address) AS ip_address,
+               COALESCE(MAX(v.cvss_score), 0) AS max_cvss,
+               COALESCE(BOOL_OR(v.is_kev), false) AS is_kev,
+               COUNT(v.id) AS vuln_count,
+               a.id
+        FROM public.assets a
+        LEFT JOIN public.vulnerabilities v ON v.asset_id = a.id AND v.status = 'open'
+        WHERE a.workspace_id = %s AND a.ip_address = ANY(%s::inet[])
+        GROUP BY a.id;
+        """, (workspace_id, list(ips))
+    )
+    summaries = {ips[row[0]]: {
+        "host": ips[row[0]],
+        "ip_address": row[0],
+        "max_cvss": float(row[1]),
+        "is_kev": row[2],
+        "vuln_count": row[3],
+        "asset_id": str(row[4])
+    } for row in cursor.fetchall()}
+
+    mapper = NetworkMapper(target)
+    # Keep discovery order; hosts that failed to save still appear as nodes
+    mapper.load_host_results([summaries.get(h, {"host": h}) for h in hosts])
+
+    jewels = [h for h in crown_jewels or [] if h in mapper.graph]
+    tree = mapper.attack_path_tree()
+    save_risk_scores(cursor, workspace_id, mapper.graph, mapper.risk_scores)
+    result = mapper.find_attack_path_for_api(jewels[0] if jewels else hosts[0], tree=tree)
+    if "error" not in result:
+        result["crown_jewels"] = jewels
+        result["ranked_paths"] = mapper.find_attack_paths(jewels or None, ATTACK_PATH_RANK_LIMIT, tree)
+    return mapper, result, tree
+
+
+def finalize_scan(mapper, scan_id, workspace_id, saved, summary=None, crown_jewels=None):
+    """
+    Attack path and graph serialization for a fully scanned mapper whose
+    hosts were already streamed to the database; saved is (assets, vulns).
+    summary is merged into the result; its phase_timings get the analysis
+    time and are saved on the scan. crown_jewels (hosts) default to the
+    first discovered host.
+    """
+    assets_saved, vulns_saved = saved
+
+    print(f"[*] Calculating attack paths to {', '.join(crown_jewels or mapper.hosts_list[:1])}...")
+    summary = dict(summary or {})
+    phase_timings = summary["phase_timings"] = dict(summary.get("phase_timings") or {})
+    start = time.perf_counter()
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            analysis, result, tree = build_attack_path(cursor, mapper.target_range, workspace_id,
+                                                       mapper.hosts_list, crown_jewels)
+        conn.commit()
+    phase_timings["analysis"] = round(time.perf_counter() - start, 3)
+    save_phase_timings(scan_id, phase_timings)
+    # Every host is stored: a redelivery from here on would only redo the analysis
+    clear_scan_checkpoint(scan_id)
+
+    if "error" in result:
+        # Findings are already stored; only the path is missing
+        print(f"[WARN] Attack path analysis failed for scan {scan_id}: {result['error']}")
+        update_scan_status(scan_id, "completed", error_message=result['error'])
+        invalidate_workspace_cache(workspace_id)
+        return {**result, "scan_id": scan_id, "assets_saved": assets_saved, "vulns_saved": vulns_saved,
+                **(summary or {})}
+
+    # Serialize the analysis graph and update the scan record
+    try:
+        # Compact format: interned strings, findings referenced by asset id.
+        # The shortest-path tree goes along so any path can be read back later.
+        graph_data_dict = to_compact(analysis.graph, path=result.get("path"), compress=GRAPH_DATA_COMPRESSION,
+                                     tree=tree, crown_jewels=result.get("crown_jewels"))
+        print(f"[*] Serialized attack path graph for scan {scan_id}")
+    except Exception as graph_err:
+        print(f"[WARN] Could not serialize graph for scan {scan_id}: {graph_err}")
+        graph_data_dict = None
+
+    # A scan cut short by its profile's time budget completes with a note
+    budget_note = None
+    if summary.get("hosts_unscanned"):
+        budget_note = (f"Time budget exceeded: {summary['hosts_unscanned']} hosts "
+                       f"were not vulnerability-scanned")
+    if summary.get("hosts_failed"):
+        failed_note = f"{summary['hosts_failed']} hosts were not scanned: their chunk failed"
+        budget_note = f"{budget_note}; {failed_note}" if budget_note else failed_note
+
+    # Pass dict directly, not JSON string
+    update_scan_status(scan_id, "completed", error_message=budget_note, graph_data=graph_data_dict)
+    invalidate_workspace_cache(workspace_id)
+    
+    return {
+        "scan_id": scan_id,
+        "assets_saved": assets_saved,
+        "vulnerabilities_saved": vulns_saved,
+        "status": "completed",
+        "attack_path": result.get("path", []),
+        "vulnerability_details": result.get("vulnerability_details", []),
+        "ranked_paths": result.get("ranked_paths", []),
+        **(summary or {})
+    }
+
+
 @celery_app.task(bind=True, max_retries=3)
-def run_nmap_scan(self, scan_id, target, workspace_id, scan_type='quick'):
+def run_nmap_scan(self, scan_id, target, workspace_id, scan_type='quick', incremental=True, crown_jewels=None,
+                  deadline=None):
     print(f"[*] Starting scan {scan_id} for target {target}")
-    
+
     if not DATABASE_URL:
         print("[!!!] WORKER ERROR: DATABASE_URL is not set. Cannot connect to PostgreSQL.")
         raise Exception("Worker missing DATABASE_URL environment variable.")
 
-    conn = None
+    task_id = self.request.id
+    profile = get_profile(scan_type)
+    try:
+        # --- VULCAN PERF: Resume from this scan's checkpoint ---
+        # A retried or redelivered (worker died, acks_late) attempt reuses
+        # the checkpointed discovery and only scans the hosts not finished yet;
+        # failed and timed-out hosts get another try.
+        discovery, checkpoint = load_scan_checkpoint(scan_id)
+    except Exception as e:
+        print(f"[WARN] Could not load checkpoint for scan {scan_id}, starting over: {e}")
+        discovery, checkpoint = None, {}
+    # --- VULCAN PERF: Scan profile and its time budget ---
+    # Every attempt of a scan runs against the first attempt's deadline
+    deadline = deadline or (discovery or {}).get("deadline") or time.time() + profile.time_budget
+    if (discovery or {}).get("dispatched"):
+        # Redelivered after handing the scan to a chord: the chord finishes it
+        print(f"[*] Scan {scan_id} was already dispatched as chunks (aggregate {discovery['dispatched']})")
+        return {"scan_id": scan_id, "status": "dispatched", "aggregate_task_id": discovery["dispatched"]}
     try:
         update_scan_status(scan_id, "running")
-        
-        mapper = NetworkMapper(target)
-        print(f"[*] Discovering hosts in {target}...")
-        mapper.discover_hosts()
-        
+        publish_task_event(task_id, "PROGRESS", scan_id=scan_id, status="Discovering hosts...")
+
+        print(f"[*] Profile '{profile.name}': budget {profile.time_budget}s, up to "
+              f"{min(SCAN_HOST_CONCURRENCY, profile.max_workers)} hosts in parallel")
+        mapper = NetworkMapper(target, max_workers=min(SCAN_HOST_CONCURRENCY, profile.max_workers),
+                               profile=profile, deadline=deadline)
+        if discovery:
+            mapper.restore_discovery(discovery)
+            print(f"[*] Resuming scan {scan_id}: discovery checkpointed, {len(mapper.hosts_list)} hosts")
+        else:
+            print(f"[*] Discovering hosts in {target}...")
+            mapper.discover_hosts()
+            if mapper.hosts_list:
+                save_discovery_checkpoint(scan_id, mapper, deadline)
+
         if not mapper.hosts_list:
             print("[!] No hosts found.")
+            save_phase_timings(scan_id, mapper.phase_timings)
             update_scan_status(scan_id, "failed", error_message="No hosts discovered")
-            return {"error": "No hosts found", "scan_id": scan_id, "assets_saved": 0, "vulns_saved": 0}
+            invalidate_workspace_cache(workspace_id)
+            result = {"error": "No hosts found", "scan_id": scan_id, "assets_saved": 0, "vulns_saved": 0}
+            publish_task_event(task_id, "SUCCESS", result=result)
+            return result
         
         print(f"[*] Hosts discovered: {mapper.hosts_list}")
-        print(f"[*] Running vulnerability scan...")
-        mapper.find_vulnerabilities()
-        print(f"[*] Vulnerability scan complete.")
+        update_scan_progress(scan_id, hosts_total=len(mapper.hosts_list))
 
-        crown_jewel = mapper.hosts_list[0]
-        print(f"[*] Calculating attack path to {crown_jewel}...")
-        result = mapper.find_attack_path_for_api(crown_jewel)
-        
-        if "error" in result:
-            update_scan_status(scan_id, "failed", error_message=result['error'])
-            return {**result, "scan_id": scan_id, "assets_saved": 0, "vulns_saved": 0}
+        discovered = set(mapper.hosts_list)
+        checkpoint = {h: c for h, c in checkpoint.items() if h in discovered}
+        finished = {h for h, (status, _) in checkpoint.items() if status in FINISHED_HOST_STATUSES}
+        if checkpoint:
+            update_scan_progress(scan_id, hosts_completed=len(checkpoint))
+            print(f"[*] Resuming scan {scan_id}: {len(finished)} of {len(mapper.hosts_list)} hosts already finished")
+        publish_task_event(task_id, "PROGRESS", scan_id=scan_id, hosts_completed=len(checkpoint),
+                           hosts_total=len(mapper.hosts_list))
 
-        # ... (Database save logic using psycopg2 remains exactly the same) ...
-        
-        assets_saved = 0
-        vulns_saved = 0
-        host_list = result.get("vulnerability_details", [])
-        if not host_list:
-             print("[!] Mapper returned no vulnerability details. Nothing to save.")
-
-        conn = psycopg2.connect(DATABASE_URL)
-        cursor = conn.cursor()
-        for host_data in host_list:
-            try:
-                asset_payload = (
-                    workspace_id,
-                    host_data.get("ip_address"),
-                    host_data.get("host"),
-                    True, # is_active
-                    "now()" # last_scan_at
-                )
-                sql_upsert_asset = """
-                INSERT INTO public.assets (workspace_id, ip_address, hostname, is_active, last_scan_at)
-                VALUES (%s, %s, %s, %s, %s)
-                ON CONFLICT (workspace_id, ip_address) DO UPDATE SET
-                    hostname = EXCLUDED.hostname,
-                    is_active = EXCLUDED.is_active,
-                    last_scan_at = EXCLUDED.last_scan_at
-                RETURNING id;
-                """
-                cursor.execute(sql_upsert_asset, asset_payload)
-                asset_id = cursor.fetchone()[0]
-                assets_saved += 1
-                
-                vuln_list = host_data.get("vulnerabilities", [])
-                if not vuln_list:
-                    continue 
-
-                vuln_payloads = []
-                for vuln in vuln_list:
-                    vuln_payloads.append((
-                        workspace_id,
-                        asset_id,
-                        scan_id,
-                        vuln.get("cve"),
-                        vuln.get("name"),
-                        vuln.get("details"),
-                        map_severity(vuln.get("severity")),
-                        vuln.get("cvss_score"),
-                        "open", # status
-                        vuln.get("port"),
-                        vuln.get("service"),
-                        "now()" # discovered_at
-                    ))
-
-                if vuln_payloads:
-                    from psycopg2.extras import execute_values
-                    sql_upsert_vulns = """
-                    INSERT INTO public.vulnerabilities (
-                        workspace_id, asset_id, scan_id, cve_id, title, description,
-                        severity, cvss_score, status, port, service, discovered_at
-                    )
-                    VALUES %s
-                    ON CONFLICT (asset_id, title, port) DO UPDATE SET
-                        description = EXCLUDED.description,
-                        severity = EXCLUDED.severity,
-                        cvss_score = EXCLUDED.cvss_score,
-                        status = 'open',
-                        discovered_at = EXCLUDED.discovered_at;
-                    """
-                    execute_values(cursor, sql_upsert_vulns, vuln_payloads)
-                    vulns_saved += len(vuln_payloads)
-            except Exception as save_err:
-                conn.rollback()
-                print(f"[!!!] Failed to save data for host {host_data.get('ip_address')}: {save_err}")
-                traceback.print_exc()
-            else:
-                conn.commit()
+        # --- VULCAN PERF: Skip hosts whose services haven't changed ---
+        skipped = {h: seconds for h, (status, seconds) in checkpoint.items() if status == 'unchanged'}
+        if incremental and len(finished) < len(mapper.hosts_list):
+            if not mapper.fingerprints:
+                mapper.fingerprint_hosts()
+                save_discovery_checkpoint(scan_id, mapper, deadline)
+            carried = carry_forward_unchanged_hosts(
+                scan_id, workspace_id, {h: f for h, f in mapper.fingerprints.items() if h not in finished})
+            skipped.update(carried)
+            if carried:
+                publish_task_event(task_id, "PROGRESS", scan_id=scan_id,
+                                   hosts_completed=len(checkpoint) + len(carried),
+                                   hosts_total=len(mapper.hosts_list), hosts_skipped=len(skipped))
+        summary = {"hosts_skipped": len(skipped), "seconds_saved": round(sum(skipped.values()), 1),
+                   "profile": profile.name, "hosts_resumed": len(finished)}
+        to_scan = [h for h in mapper.hosts_list if h not in skipped and h not in finished]
+        print(f"[*] Phase timings so far: {mapper.phase_timings}")
 
-        print(f"[✓] Saved {assets_saved} assets and {vulns_saved} vulnerabilities")
+        # --- VULCAN PERF: Fan large ranges out across workers ---
+        if len(to_scan) > SCAN_CHUNK_SIZE:
+            # Chunks and the aggregate publish to this task's stream via root_id
+            summary["phase_timings"] = dict(mapper.phase_timings)
+            # Marked before dispatching, so a redelivery of this task never dispatches a second chord
+            aggregate_id = str(uuid.uuid4())
+            save_discovery_checkpoint(scan_id, mapper, deadline, dispatched=aggregate_id)
+            try:
+                return dispatch_scan_chunks(scan_id, target, workspace_id, mapper.hosts_list, to_scan,
+                                            mapper.fingerprints, summary, crown_jewels, mapper.open_ports,
+                                            profile.name, deadline, mapper.scheduler.state(), aggregate_id)
+            except Exception:
+                # The chord was not sent (broker down): let the retry dispatch it
+                save_discovery_checkpoint(scan_id, mapper, deadline)
+                raise
 
-        # --- ADDED THIS BLOCK ---
-        # After saving, serialize the graph and update the scan record
-        graph_json = None
+        print(f"[*] Running vulnerability scan on {len(to_scan)} hosts...")
+        stream = ScanResultStream(scan_id, workspace_id, task_id=task_id)
         try:
-            graph_data_dict = nx.node_link_data(mapper.graph)  # Already a dict
-            print(f"[*] Serialized attack path graph for scan {scan_id}")
-        except Exception as graph_err:
-            print(f"[WARN] Could not serialize graph for scan {scan_id}: {graph_err}")
-            graph_data_dict = None
-
-        # Pass dict directly, not JSON string
-        update_scan_status(scan_id, "completed", graph_data=graph_data_dict)
-        # --- END ADDED BLOCK ---
-        
-        return {
-            "scan_id": scan_id,
-            "assets_saved": assets_saved,
-            "vulnerabilities_saved": vulns_saved,
-            "status": "completed",
-            "vulnerability_details": result.get("vulnerability_details", [])
-        }
+            mapper.find_vulnerabilities(on_host_complete=stream.write, skip_hosts=finished | set(skipped))
+        finally:
+            stream.close()
+        print(f"[*] Vulnerability scan complete.")
+        summary["phase_timings"] = dict(mapper.phase_timings)
+        summary["scheduler"] = mapper.scheduler.state()
+        summary["hosts_unscanned"] = len(mapper.unscanned_hosts)
+        summary["hosts_timed_out"] = len(mapper.timed_out_hosts)
+
+        result = finalize_scan(mapper, scan_id, workspace_id, saved=(stream.assets_saved, stream.vulns_saved),
+                               summary=summary, crown_jewels=crown_jewels)
+        publish_task_event(task_id, "SUCCESS", result=result)
+        return result
     
+    except ScanBudgetExceeded as e:
+        # Retrying would only run into the same budget again
+        print(f"[ERROR] Scan {scan_id} failed: {e}")
+        clear_scan_checkpoint(scan_id)
+        update_scan_status(scan_id, "failed", error_message=str(e))
+        invalidate_workspace_cache(workspace_id)
+        result = {"error": str(e), "scan_id": scan_id, "assets_saved": 0, "vulns_saved": 0}
+        publish_task_event(task_id, "SUCCESS", result=result)
+        return result
+
     except Exception as e:
-        if conn:
-            conn.rollback() 
         error_str = str(e)
         print(f"[ERROR] Scan {scan_id} failed: {error_str}")
         print(traceback.format_exc())
         
-        if self.request.retries < self.max_retries:
+        retry_in_budget = time.time() + SCAN_RETRY_COUNTDOWN < deadline
+        if self.request.retries < self.max_retries and retry_in_budget:
             print(f"[*] Retry {self.request.retries + 1}/{self.max_retries}")
             update_scan_status(scan_id, "retrying")
-            raise self.retry(exc=e, countdown=120)
+            publish_task_event(task_id, "RETRY", scan_id=scan_id, status=error_str)
+            # The retry resumes from the checkpoints, against the same deadline
+            raise self.retry(exc=e, countdown=SCAN_RETRY_COUNTDOWN,
+                             kwargs={**(self.request.kwargs or {}), "deadline": deadline})
         else:
+            if not retry_in_budget:
+                error_str += " (no time budget left to retry)"
+            clear_scan_checkpoint(scan_id)
             update_scan_status(scan_id, "failed", error_message=error_str)
-            return {"error": error_str, "scan_id": scan_id, "assets_saved": 0, "vulns_saved": 0}
-    finally:
-        if conn:
-            cursor.close()
-            conn.close()
+            invalidate_workspace_cache(workspace_id)
+            result = {"error": error_str, "scan_id": scan_id, "assets_saved": 0, "vulns_saved": 0}
+            publish_task_event(task_id, "SUCCESS", result=result)
+            return result
+
+
+def dispatch_scan_chunks(scan_id, target, workspace_id, hosts, to_scan=None, fingerprints=None, summary=None,
+                         crown_jewels=None, open_ports=None, scan_type=None, deadline=None, scheduler_state=None,
+                         aggregate_id=None):
+    """
+    Split the hosts to scan into chunks and run them as a chord across workers.
+    hosts is every discovered host (in order); to_scan defaults to all of them.
+    open_ports pins each chunk's vuln scans to the ports found at discovery.
+    Every chunk scans with scan_type's profile, stops starting hosts at
+    deadline (epoch seconds) and starts from the discovery scheduler_state.
+    aggregate_id, if given, becomes the aggregate (chord callback) task id.
+    """
+    to_scan = hosts if to_scan is None else to_scan
+    fingerprints = fingerprints or {}
+    open_ports = open_ports or {}
+    chunks = [to_scan[i:i + SCAN_CHUNK_SIZE] for i in range(0, len(to_scan), SCAN_CHUNK_SIZE)]
+    print(f"[*] Dispatching {len(to_scan)} hosts as {len(chunks)} chunks of up to {SCAN_CHUNK_SIZE}")
+    header = group(
+        scan_host_chunk.s(scan_id, target, workspace_id, chunk,
+                          {h: fingerprints[h] for h in chunk if h in fingerprints},
+                          {h: open_ports[h] for h in chunk if h in open_ports},
+                          scan_type=scan_type, deadline=deadline, scheduler_state=scheduler_state)
+        for chunk in chunks
+    )
+    # The vuln phase is timed from dispatch to aggregation (wall clock, queueing included)
+    callback = aggregate_scan_results.s(scan_id, target, workspace_id, hosts, summary,
+                                        crown_jewels, dispatched_at=time.time())
+    # Anything that still breaks the chord must not leave the scan 'running'
+    callback.link_error(fail_chunked_scan.s(scan_id, workspace_id))
+    aggregate = chord(header)(callback, task_id=aggregate_id)
+    return {
+        "scan_id": scan_id,
+        "status": "dispatched",
+        "chunks": len(chunks),
+        "hosts": len(to_scan),
+        "aggregate_task_id": aggregate.id,
+        **(summary or {})
+    }
+
+
+@celery_app.task(bind=True, max_retries=2)
+def scan_host_chunk(self, scan_id, target, workspace_id, hosts, fingerprints=None, open_ports=None,
+                    scan_type=None, deadline=None, scheduler_state=None):
+    """Vulnerability-scan one chunk of already-discovered hosts, streaming each to the DB"""
+    print(f"[*] Scan {scan_id}: scanning chunk of {len(hosts)} hosts")
+    try:
+        profile = get_profile(scan_type)
+        mapper = NetworkMapper(target, max_workers=min(SCAN_HOST_CONCURRENCY, profile.max_workers),
+                               profile=profile, deadline=deadline, scheduler_state=scheduler_state)
+        mapper.add_hosts(hosts)
+        mapper.fingerprints = fingerprints or {}
+        mapper.open_ports = open_ports or {}
+        # A retried chunk only scans the hosts its earlier attempt didn't finish
+        _, checkpoint = load_scan_checkpoint(scan_id)
+        finished = {h for h in hosts if checkpoint.get(h, (None,))[0] in FINISHED_HOST_STATUSES}
+        if finished:
+            print(f"[*] Scan {scan_id}: resuming chunk, {len(finished)} of {len(hosts)} hosts already finished")
+        stream = ScanResultStream(scan_id, workspace_id, task_id=self.request.root_id or self.request.id)
+        try:
+            mapper.find_vulnerabilities(on_host_complete=stream.write, skip_hosts=finished)
+        finally:
+            stream.close()
+    except Exception as e:
+        print(f"[ERROR] Chunk for scan {scan_id} failed: {e}")
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=30)
+        # Out of retries: a raised error would break the chord and the aggregate
+        # would never run. Report the chunk as failed so the scan finishes with
+        # the hosts every other chunk (and this one, before it failed) committed.
+        print(f"[!] Scan {scan_id}: giving up on a chunk of {len(hosts)} hosts")
+        return {
+            "hosts": [],
+            "assets_saved": 0,
+            "vulns_saved": 0,
+            "hosts_unscanned": 0,
+            "hosts_timed_out": 0,
+            "hosts_failed": len(hosts),
+            "error": str(e)
+        }
+
+    # Only the per-host risk summary travels back through the result backend
+    return {
+        "hosts": mapper.host_results(),
+        "assets_saved": stream.assets_saved,
+        "vulns_saved": stream.vulns_saved,
+        "hosts_unscanned": len(mapper.unscanned_hosts),
+        "hosts_timed_out": len(mapper.timed_out_hosts)
+    }
+
+
+@celery_app.task(bind=True, max_retries=1)
+def aggregate_scan_results(self, chunk_results, scan_id, target, workspace_id, hosts=None, summary=None,
+                           crown_jewels=None, dispatched_at=None):
+    """
+    Chord callback: merge chunk results, build the graph and the attack path.
+    hosts (all discovered hosts, in order) brings back the ones skipped as unchanged.
+    """
+    # Subscribers follow the run_nmap_scan task that dispatched the chord
+    task_id = self.request.root_id or self.request.id
+    try:
+        mapper = NetworkMapper(target)
+        mapper.add_hosts(hosts or [])
+        for chunk in chunk_results:
+            mapper.load_host_results(chunk["hosts"])
+        saved = (sum(c["assets_saved"] for c in chunk_results), sum(c["vulns_saved"] for c in chunk_results))
+        print(f"[*] Scan {scan_id}: aggregated {len(mapper.hosts_list)} hosts from {len(chunk_results)} chunks")
+        summary = dict(summary or {})
+        summary["hosts_unscanned"] = sum(c.get("hosts_unscanned", 0) for c in chunk_results)
+        summary["hosts_timed_out"] = sum(c.get("hosts_timed_out", 0) for c in chunk_results)
+        summary["hosts_failed"] = sum(c.get("hosts_failed", 0) for c in chunk_results)
+        if dispatched_at:
+            summary["phase_timings"] = {**(summary.get("phase_timings") or {}),
+                                        "vuln": round(time.time() - dispatched_at, 3)}
+        result = finalize_scan(mapper, scan_id, workspace_id, saved=saved, summary=summary,
+                               crown_jewels=crown_jewels)
+        publish_task_event(task_id, "SUCCESS", result=result)
+        return result
+    except Exception as e:
+        error_str = str(e)
+        print(f"[ERROR] Aggregation for scan {scan_id} failed: {error_str}")
+        print(traceback.format_exc())
+        clear_scan_checkpoint(scan_id)
+        update_scan_status(scan_id, "failed", error_message=error_str)
+        invalidate_workspace_cache(workspace_id)
+        result = {"error": error_str, "scan_id": scan_id, "assets_saved": 0, "vulns_saved": 0}
+        publish_task_event(task_id, "SUCCESS", result=result)
+        return result
+
+
+@celery_app.task
+def fail_chunked_scan(request, exc, traceback, scan_id, workspace_id):
+    """
+    Chord error callback: the chord broke before aggregate_scan_results could
+    run (e.g. a chunk's worker was lost). Marks the scan failed and drops its
+    checkpoint; subscribers get FAILURE on the dispatching task's channel.
+    """
+    task_id = getattr(request, "root_id", None) or getattr(request, "id", None)
+    print(f"[ERROR] Chunked scan {scan_id} failed: {exc}")
+    clear_scan_checkpoint(scan_id)
+    update_scan_status(scan_id, "failed", error_message=str(exc))
+    invalidate_workspace_cache(workspace_id)
+    publish_task_event(task_id, "FAILURE", status=str(exc))
+
+# --- KEV CATALOG SYNC ---
+@celery_app.task(bind=True, max_retries=3)
+def sync_kev_catalog(self):
+    """
+    Download the CISA KEV feed into KEV_CATALOG_PATH, replacing the file
+    atomically. Workers and the API pick it up on their next catalog check
+    (scanner.kev hot reload); nothing needs a restart.
+    """
+    print(f"[*] Syncing KEV catalog from {KEV_FEED_URL}")
+    try:
+        resp = requests.get(KEV_FEED_URL, timeout=60)
+        resp.raise_for_status()
+        count = write_catalog(resp.content, KEV_CATALOG_PATH)
+    except Exception as e:
+        print(f"[ERROR] KEV catalog sync failed: {e}")
+        raise self.retry(exc=e, countdown=300)
+    catalog = reload_catalog()
+    print(f"[✓] KEV catalog synced: {count} CVEs -> {KEV_CATALOG_PATH}")
+    return {"path": KEV_CATALOG_PATH, "count": count, "version": catalog.version}
 
 # --- REPORT GENERATION TASK ---
 @celery_app.task(bind=True, max_retries=1)
@@ -251,7 +1061,7 @@ def generate_report(self, scan_id, user_id):
     
     conn = None
     try:
-        conn = psycopg2.connect(DATABASE_URL)
+        conn = acquire_db_conn()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
 
         # ===== OPTIMIZATION - REPORT CACHING =====
@@ -261,22 +1071,25 @@ def generate_report(self, scan_id, user_id):
         
         if os.path.exists(pdf_path):
             print(f"[*] Report already exists, skipping regeneration: {pdf_path}")
-            return {
+            result = {
                 "scan_id": scan_id,
                 "status": "report_exists",
                 "report_path": pdf_path,
                 "report_filename": pdf_filename,
                 "cached": True  # Flag to indicate this was cached
             }
+            publish_task_event(self.request.id, "SUCCESS", result=result)
+            return result
         # ===== END REPORT CACHING =====
 
         # Progress updates
         self.update_state(state='PROGRESS', meta={'step': 'Fetching scan data', 'progress': 25})
+        publish_task_event(self.request.id, 'PROGRESS', step='Fetching scan data', progress=25)
         # ... fetch scan data ...
         # 1. Fetch Scan and Workspace data
         cursor.execute(
             """
-            SELECT s.id, s.name, s.graph_data, w.name as workspace_name
+            SELECT s.id, s.name, s.graph_data, s.workspace_id, w.name as workspace_name
             FROM public.scans s
             JOIN public.workspaces w ON s.workspace_id = w.id
             WHERE s.id = %s;
@@ -298,13 +1111,14 @@ def generate_report(self, scan_id, user_id):
         
         # Progress updates
         self.update_state(state='PROGRESS', meta={'step': 'Calculating attack path', 'progress': 50})
+        publish_task_event(self.request.id, 'PROGRESS', step='Calculating attack path', progress=50)
         # ... calculate path ...
         # 3. Parse Graph to find attack path
         if not scan['graph_data']:
             raise Exception("Scan has no attack path graph data to report.")
             
-        graph_dict = json.loads(scan['graph_data']) if isinstance(scan['graph_data'], str) else scan['graph_data']
-        G = nx.node_link_graph(graph_dict)
+        # Compact (optionally compressed) or legacy node-link graph_data
+        G, _ = load_graph(scan['graph_data'])
         
         # Find nodes in graph (all are assets - no 'attacker' node exists)
         nodes = list(G.nodes())
@@ -333,16 +1147,18 @@ def generate_report(self, scan_id, user_id):
         print(f"[*] Full attack path: {' → '.join(path_nodes)}")
 
         # 4. Fetch vulnerabilities *only* on the attack path
-        # Match by IP address only (more reliable):
+        # Compact graphs reference assets by id; legacy graphs only have the IP
+        asset_ids = [G.nodes[n]['asset_id'] for n in real_nodes if G.nodes[n].get('asset_id')]
         cursor.execute(
             """
             SELECT v.title, v.severity, v.cvss_score, v.description, v.port, v.service, 
-                a.hostname, a.ip_address
+                a.hostname, host(a.ip_address) AS ip_address
             FROM public.vulnerabilities v
             JOIN public.assets a ON v.asset_id = a.id
-            WHERE a.ip_address::text = ANY(%s)
+            WHERE a.workspace_id = %s
+              AND (a.id = ANY(%s::uuid[]) OR host(a.ip_address) = ANY(%s))
             ORDER BY v.cvss_score DESC;
-            """, (path_nodes,)
+            """, (scan['workspace_id'], asset_ids, path_nodes)
         )
         vulnerabilities = [dict(row) for row in cursor.fetchall()]
 
@@ -374,6 +1190,7 @@ def generate_report(self, scan_id, user_id):
 
         # Progress updates
         self.update_state(state='PROGRESS', meta={'step': 'Rendering PDF', 'progress': 75})
+        publish_task_event(self.request.id, 'PROGRESS', step='Rendering PDF', progress=75)
         # ... generate PDF ...
         # 7. Convert HTML to PDF
         # We save to a tmp directory; in production, this would go to S3.
@@ -386,13 +1203,15 @@ def generate_report(self, scan_id, user_id):
         print(f"[✓] Report generated successfully: {pdf_path}")
         
         # Return final result with all details
-        return {
+        result = {
             "status": "completed",
             "progress": 100,
             "scan_id": scan_id,
             "report_path": pdf_path,
             "report_filename": pdf_filename
         }
+        publish_task_event(self.request.id, "SUCCESS", result=result)
+        return result
 
     except Exception as e:
         if conn:
@@ -400,13 +1219,28 @@ def generate_report(self, scan_id, user_id):
         error_str = str(e)
         print(f"[ERROR] Report generation for {scan_id} failed: {error_str}")
         print(traceback.format_exc())
+        # retry() re-raises the error itself once retries are exhausted
+        final = self.request.retries >= self.max_retries
+        publish_task_event(self.request.id, "FAILURE" if final else "RETRY", status=error_str)
         raise self.retry(exc=e)
     finally:
         if conn:
             cursor.close()
-            conn.close()
+            release_db_conn(conn)
 # --- END TASK ---
 
+@celery_app.task
+def reconcile_workspace_stats(workspace_id=None):
+    """Rebuild workspace_stats from the base tables (beat runs it for all workspaces, workspace_id=None)"""
+    print(f"[*] Reconciling workspace stats for {workspace_id or 'all workspaces'}...")
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT public.rebuild_workspace_stats(%s);", (workspace_id,))
+            rebuilt = cursor.fetchone()[0]
+        conn.commit()
+    print(f"[✓] Rebuilt stats for {rebuilt} workspaces")
+    return {"status": "reconciled", "workspaces": rebuilt}
+
 @celery_app.task
 def cleanup_old_scans():
     """Clean up old scan records (runs periodically)"""
@@ -0,0 +1,90 @@
+"""Local JWT verification in api.py: JWKS keys, HS256 and forged headers."""
+
+import hmac
+import json
+import time
+import base64
+import hashlib
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+import api
+
+CLAIMS = {"sub": "user-1", "aud": "authenticated"}
+
+
+def public_jwk(private_key, kid, **fields):
+    algorithm = jwt.algorithms.RSAAlgorithm if isinstance(private_key, rsa.RSAPrivateKey) \
+        else jwt.algorithms.ECAlgorithm
+    return {**json.loads(algorithm.to_jwk(private_key.public_key())), "kid": kid, "use": "sig", **fields}
+
+
+@pytest.fixture
+def keys(monkeypatch):
+    """An RSA key advertising alg and an EC key that doesn't, served as the cached JWKS."""
+    rsa_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    ec_key = ec.generate_private_key(ec.SECP256R1())
+    jwks = {"keys": [public_jwk(rsa_key, "rsa-1", alg="RS256"), public_jwk(ec_key, "ec-1")]}
+    monkeypatch.setitem(api._jwks, "keys", api.load_jwks(jwks))
+    monkeypatch.setitem(api._jwks, "fetched_at", time.time())
+    monkeypatch.setattr(api, "SUPABASE_JWT_SECRET", None)
+    monkeypatch.setattr(api, "get_user_client", lambda token, exp: None)
+    api._verified_tokens.clear()
+    return rsa_key, ec_key, jwks
+
+
+def token(key, algorithm, **headers):
+    return jwt.encode({**CLAIMS, "exp": int(time.time()) + 600}, key, algorithm=algorithm, headers=headers)
+
+
+def test_jwks_keys_verify_their_own_algorithm(keys):
+    rsa_key, ec_key, _ = keys
+    assert api.verify_token(token(rsa_key, "RS256", kid="rsa-1"))["sub"] == "user-1"
+    # No 'alg' in the JWK: ES256 is implied by kty EC, crv P-256
+    assert api.verify_token(token(ec_key, "ES256", kid="ec-1"))["sub"] == "user-1"
+
+
+def test_header_cannot_switch_a_jwks_key_to_another_algorithm(keys):
+    rsa_key, _, _ = keys
+    with pytest.raises(jwt.InvalidTokenError):
+        api.verify_token(token(rsa_key, "RS512", kid="rsa-1"))
+
+
+def hs256_token(secret, **headers):
+    """Signed by hand: PyJWT refuses to use a JWK as an HMAC secret, an attacker doesn't."""
+    def b64(data):
+        return base64.urlsafe_b64encode(data).rstrip(b"=")
+    signing_input = b64(json.dumps({"alg": "HS256", "typ": "JWT", **headers}).encode()) + b"." + \
+        b64(json.dumps({**CLAIMS, "exp": int(time.time()) + 600}).encode())
+    return (signing_input + b"." + b64(hmac.new(secret, signing_input, hashlib.sha256).digest())).decode()
+
+
+def test_forged_hs256_token_is_rejected(keys):
+    # HS256 keyed with the published JWK, claiming a valid kid
+    forged = hs256_token(json.dumps(keys[2]["keys"][0]).encode(), kid="rsa-1")
+    with pytest.raises(jwt.InvalidTokenError):
+        api.verify_token(forged)
+
+
+def test_hs256_tokens_use_the_secret(keys, monkeypatch):
+    secret = "local-jwt-secret-with-at-least-32-characters"
+    monkeypatch.setattr(api, "SUPABASE_JWT_SECRET", secret)
+    assert api.verify_token(token(secret, "HS256"))["sub"] == "user-1"
+
+
+@api.app.route("/_test/auth")
+@api.auth_required
+def protected():
+    return "ok"
+
+
+def test_auth_required_maps_bad_tokens_to_401(keys):
+    rsa_key, _, _ = keys
+    client = api.app.test_client()
+    good = token(rsa_key, "RS256", kid="rsa-1")
+    forged = token("not-the-secret-but-long-enough-for-hmac-keys", "HS256", kid="rsa-1")
+    assert client.get("/_test/auth", headers={"Authorization": f"Bearer {good}"}).status_code == 200
+    assert client.get("/_test/auth", headers={"Authorization": f"Bearer {forged}"}).status_code == 401
+    assert client.get("/_test/auth", headers={"Authorization": "Bearer abc.def"}).status_code == 401
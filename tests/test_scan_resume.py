@@ -0,0 +1,157 @@
+"""
+A scan task killed mid-scan and redelivered (acks_late) resumes from its
+checkpoint. nmap.PortScanner is stubbed and the file checkpoint backend is
+used; Postgres and Redis are replaced by no-op stand-ins, so this runs
+without any services.
+"""
+
+import contextlib
+
+import pytest
+
+import scanner.mapper as mapper_module
+import tasks
+from scanner.checkpoint import FileCheckpointStore
+
+HOSTS = [f"10.0.0.{i}" for i in range(1, 9)]
+VULNERS_OUTPUT = """
+  cpe:/a:apache:http_server:2.4.49:
+    CVE-2021-41773  7.5  https://vulners.com/cve/CVE-2021-41773
+"""
+
+
+class WorkerKilled(BaseException):
+    """Stands in for SIGKILL: nothing in the task gets to handle it."""
+
+
+class StubPortScanner:
+    """Every discovered host has port 80 open; the worker dies after kill_after vuln scans."""
+    log = []
+    kill_after = None
+
+    def __init__(self):
+        self._result = {}
+
+    def scan(self, hosts=None, arguments='', timeout=0):
+        if '--script' not in arguments:
+            self.log.append("discovery")
+            self._result = {h: {'addresses': {'ipv4': h}, 'status': {'state': 'up'},
+                                'tcp': {80: {'state': 'open', 'name': 'http'}}} for h in HOSTS}
+            return self._result
+        if self.kill_after is not None and sum(e != "discovery" for e in self.log) >= self.kill_after:
+            raise WorkerKilled()
+        self.log.append(hosts)
+        self._result = {hosts: {'addresses': {'ipv4': hosts},
+                                'tcp': {80: {'state': 'open', 'name': 'http',
+                                             'script': {'vulners': VULNERS_OUTPUT}}}}}
+        return self._result
+
+    def all_hosts(self):
+        return list(self._result)
+
+    def __getitem__(self, host):
+        return self._result[host]
+
+
+class CheckpointingStream:
+    """ScanResultStream without Postgres: a host counts as committed once written."""
+    committed = []
+
+    def __init__(self, scan_id, workspace_id, task_id=None):
+        self.scan_id = scan_id
+        self.assets_saved = self.vulns_saved = 0
+
+    def write(self, host_data):
+        self.committed.append(host_data["host"])
+        tasks.mark_hosts_checkpoint(self.scan_id, [(host_data["host"], host_data["status"], 0.1)])
+        self.assets_saved += 1
+        self.vulns_saved += len(host_data["vulnerabilities"])
+
+    def close(self):
+        pass
+
+
+class NoDatabase:
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, *args):
+        pass
+
+    def fetchall(self):
+        return []
+
+    def commit(self):
+        pass
+
+
+@pytest.fixture
+def scan(monkeypatch, tmp_path):
+    monkeypatch.setattr(mapper_module.nmap, "PortScanner", StubPortScanner)
+    monkeypatch.setattr(mapper_module, "NMAP_BACKEND", "python-nmap")
+    monkeypatch.setattr(StubPortScanner, "log", [])
+    monkeypatch.setattr(StubPortScanner, "kill_after", None)
+    monkeypatch.setattr(CheckpointingStream, "committed", [])
+    monkeypatch.setattr(tasks, "get_checkpoint_store", lambda: FileCheckpointStore(str(tmp_path)))
+    monkeypatch.setattr(tasks, "ScanResultStream", CheckpointingStream)
+    monkeypatch.setattr(tasks, "SCAN_HOST_CONCURRENCY", 1)
+    monkeypatch.setattr(tasks, "db_connection", contextlib.contextmanager(lambda: (yield NoDatabase())))
+    monkeypatch.setattr(tasks, "build_attack_path",
+                        lambda cursor, target, workspace_id, hosts, crown_jewels=None:
+                        (mapper_module.NetworkMapper(target), {"error": "not analysed in tests"}, None))
+    for name in ("update_scan_status", "update_scan_progress", "save_phase_timings",
+                 "publish_task_event", "invalidate_workspace_cache"):
+        monkeypatch.setattr(tasks, name, lambda *args, **kwargs: None)
+    return "scan-1"
+
+
+def run_task(scan_id):
+    return tasks.run_nmap_scan.run(scan_id, "10.0.0.0/28", "workspace-1", incremental=False)
+
+
+def test_killed_scan_resumes_from_checkpoint(scan):
+    StubPortScanner.kill_after = 3
+    with pytest.raises(WorkerKilled):
+        run_task(scan)
+    committed_before_kill = list(CheckpointingStream.committed)
+    assert len(committed_before_kill) == 3
+    discovery, hosts = tasks.get_checkpoint_store().load(scan)
+    assert discovery["hosts"] == HOSTS and set(hosts) == set(committed_before_kill)
+
+    # Redelivery: same arguments, healthy worker
+    StubPortScanner.kill_after = None
+    first_attempt = len(StubPortScanner.log)
+    result = run_task(scan)
+    second_attempt = StubPortScanner.log[first_attempt:]
+
+    assert "discovery" not in second_attempt
+    assert sorted(second_attempt) == sorted(set(HOSTS) - set(committed_before_kill))
+    assert sorted(CheckpointingStream.committed) == sorted(HOSTS)
+    assert result["hosts_resumed"] == 3
+    # finalize_scan cleared the checkpoint
+    assert tasks.get_checkpoint_store().load(scan) == (None, {})
+
+
+def test_redelivered_task_does_not_dispatch_chunks_twice(scan, monkeypatch):
+    dispatched = []
+    monkeypatch.setattr(tasks, "SCAN_CHUNK_SIZE", 2)
+    monkeypatch.setattr(tasks, "dispatch_scan_chunks",
+                        lambda *args, **kwargs: dispatched.append(args[-1]) or {"status": "dispatched"})
+
+    run_task(scan)
+    assert len(dispatched) == 1
+    discovery, _ = tasks.get_checkpoint_store().load(scan)
+    assert discovery["dispatched"] == dispatched[0]
+
+    # Redelivered after the chord went out: neither discovery nor a second chord
+    discoveries = StubPortScanner.log.count("discovery")
+    result = run_task(scan)
+    assert len(dispatched) == 1
+    assert StubPortScanner.log.count("discovery") == discoveries
+    assert result == {"scan_id": scan, "status": "dispatched", "aggregate_task_id": dispatched[0]}